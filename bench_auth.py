@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark de autenticación: latencia en un hilo y throughput con varios
+hilos, en esta máquina, de
+
+  _hash_password / _verify_password   el KDF solo, en el hilo
+  User.verify_password                lectura del usuario + pool de hashing
+  POST /auth/login, /auth/register    la petición completa (cliente de pruebas)
+
+Cada política de contraseñas corre en un proceso aparte (la política y
+el pool se leen del entorno al importar), así se compara el coste de
+distintas iteraciones de PBKDF2. El resto de la configuración se toma
+del entorno: HABITGAIN_HASH_WORKERS / HABITGAIN_HASH_QUEUE para el pool,
+HABITGAIN_PASSWORD_ALGO=scrypt para medir scrypt y HABITGAIN_THROTTLE=1
+para medir con el límite de intentos (por defecto se apaga: todos los
+hilos usan el mismo email e IP). Usa una BD temporal salvo que se defina
+HABITGAIN_DB.
+
+    python bench_auth.py [segundos] [hilos] [iteraciones,...]
+    python bench_auth.py 3 8 100000,200000,600000
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, sys, threading, time, uuid
+from habitgain import create_app, models
+from habitgain.hashpool import HashPoolSaturated
+from habitgain.models import User, _hash_password, _verify_password, hash_pool
+
+samples, seconds, threads = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+app = create_app()
+algo, params = models.PASSWORD_ALGO, models.PASSWORD_PARAMS
+password = "bench-password"
+email = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+User.create_user(email, "Bench", password)
+pack = _hash_password(password)
+hash_pool.warm_up()
+
+def post(path, data):
+    # Cliente nuevo por petición: sin sesión previa ni flashes acumulados
+    return app.test_client().post(path, data=data).status_code == 302
+
+def register():
+    new = f"reg_{uuid.uuid4().hex[:12]}@example.com"
+    return post("/auth/register", {"name": "Bench", "email": new,
+                                   "password": password, "confirm_password": password})
+
+CASES = {
+    "_hash_password": lambda: bool(_hash_password(password, None, algo, params)),
+    "_verify_password": lambda: _verify_password(password, pack["salt"], pack["hash"], pack["algo"], pack["params"]),
+    "User.verify_password": lambda: User.verify_password(email, password) is not None,
+    "POST /auth/login": lambda: post("/auth/login", {"email": email, "password": password}),
+    "POST /auth/register": register,
+}
+
+def call(fn):
+    try:
+        return fn()
+    except HashPoolSaturated:
+        return False
+
+def latency(fn):
+    call(fn)  # calentamiento
+    out = []
+    for _ in range(samples):
+        t = time.perf_counter()
+        call(fn)
+        out.append(time.perf_counter() - t)
+    out.sort()
+    return out
+
+def throughput(fn):
+    stop = threading.Event()
+    counts = {"ok": 0, "rejected": 0}
+    lock = threading.Lock()
+    def loop():
+        while not stop.is_set():
+            ok = call(fn)
+            with lock:
+                counts["ok" if ok else "rejected"] += 1
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    time.sleep(seconds)
+    stop.set()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return counts["ok"] / elapsed, counts["rejected"] / elapsed
+
+results = {}
+for label, fn in CASES.items():
+    lat = latency(fn)
+    ok, rejected = throughput(fn)
+    results[label] = {
+        "p50": lat[len(lat) // 2] * 1000,
+        "p95": lat[min(len(lat) - 1, int(0.95 * len(lat)))] * 1000,
+        "single_per_s": len(lat) / sum(lat),
+        "ops_per_s": ok,
+        "rejected_per_s": rejected,
+    }
+print(json.dumps({"algo": algo, "params": params, "pool": hash_pool.workers, "results": results}))
+"""
+
+
+def run(env_overrides, samples, seconds, threads):
+    env = {**os.environ, **env_overrides}
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(samples), str(seconds), str(threads)],
+        env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    pool = f"pool de {r['pool']} proceso(s)" if r["pool"] else "sin pool"
+    print(f"--- {r['algo']} {r['params']} ({pool}) ---")
+    print(f"{'caso':<24}{'p50':>10}{'p95':>10}{'1 hilo':>10}{f'{threads} hilos':>12}{'rechazos':>10}")
+    for label, m in r["results"].items():
+        print(f"{label:<24}{m['p50']:>8.1f}ms{m['p95']:>8.1f}ms{m['single_per_s']:>8.1f}/s"
+              f"{m['ops_per_s']:>10.1f}/s{m['rejected_per_s']:>8.1f}/s")
+    print()
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    iterations = sys.argv[3].split(",") if len(sys.argv) > 3 else [None]
+    samples = 20
+    if "HABITGAIN_DB" not in os.environ:
+        os.environ["HABITGAIN_DB"] = os.path.join(tempfile.mkdtemp(prefix="habitgain-bench-"), "bench.db")
+    os.environ.setdefault("HABITGAIN_THROTTLE", "0")
+
+    throttle = "con" if os.environ["HABITGAIN_THROTTLE"].lower() in ("1", "true", "yes") else "sin"
+    print(f"=== Autenticación: latencia ({samples} muestras) y throughput con {threads} hilos "
+          f"durante {seconds:.0f}s, {throttle} límite de intentos ({os.cpu_count()} CPUs) ===\n")
+    for iters in iterations:
+        run({"HABITGAIN_PBKDF2_ITER": iters.strip()} if iters else {}, samples, seconds, threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de compresión de respuestas: bytes enviados y CPU de gzip.
+
+Usa una BD temporal (o la de HABITGAIN_DB) con usuarios y hábitos
+sintéticos para que los listados de admin tengan un tamaño realista.
+
+    python bench_compression.py [usuarios] [hábitos]
+"""
+import gzip
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+if "HABITGAIN_DB" not in os.environ:
+    os.environ["HABITGAIN_DB"] = os.path.join(tempfile.mkdtemp(prefix="habitgain-bench-"), "bench.db")
+
+from habitgain import create_app  # noqa: E402
+from habitgain.models import Database, Habit, User  # noqa: E402
+
+LEVELS = (1, 6, 9)
+ROUNDS = 20
+
+
+def seed(users: int, habits: int) -> str:
+    tag = uuid.uuid4().hex[:6]
+    conn = Database().get_connection()
+    try:
+        conn.executemany(
+            "INSERT INTO users (email, name, password_hash, password_salt, role) VALUES (?, ?, 'x', 'x', 'user')",
+            [(f"bench{tag}_{i}@example.com", f"Usuario {i}") for i in range(users)],
+        )
+        conn.executemany(
+            "INSERT INTO habits (name, short_desc, owner_email, category_id, active) VALUES (?, ?, ?, 1, 1)",
+            [(f"Hábito {i}", "Descripción corta del hábito", f"bench{tag}_{i % users}@example.com")
+             for i in range(habits)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    admin = f"bench{tag}_admin@example.com"
+    User.create_user(admin, "Bench Admin", "bench-password", role="admin")
+    for i in range(20):
+        Habit.create(admin, f"Hábito del panel {i}", "Para el panel", 1)
+    return admin
+
+
+def cpu_ms(body: bytes, level: int) -> float:
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        gzip.compress(body, compresslevel=level, mtime=0)
+    return (time.process_time() - start) / ROUNDS * 1000
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    habits = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    app = create_app()
+    admin = seed(users, habits)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"email": admin, "name": "Bench Admin"}
+
+    pages = ["/progress/panel", "/explore/", "/admin/users", "/admin/habits", "/admin/cache-stats"]
+    print(f"=== Compresión ({users} usuarios, {habits} hábitos; CPU = media de {ROUNDS}) ===\n")
+    header = f"{'página':<20}{'sin gzip':>10}" + "".join(f"{f'nivel {lv}':>18}" for lv in LEVELS) + f"{'en el hook':>16}"
+    print(header)
+    for path in pages:
+        body = client.get(path).get_data()
+        wire = client.get(path, headers={"Accept-Encoding": "gzip"})
+        cols = ""
+        for level in LEVELS:
+            size = len(gzip.compress(body, compresslevel=level, mtime=0))
+            cols += f"{size / 1024:>8.1f}KB {cpu_ms(body, level):>5.2f}ms"
+        encoding = wire.headers.get("Content-Encoding", "identity")
+        print(f"{path:<20}{len(body) / 1024:>8.1f}KB{cols}{len(wire.data) / 1024:>9.1f}KB {encoding}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark del hashing de contraseñas: throughput de login y latencia del
+panel mientras hay una ráfaga de logins en el mismo worker.
+
+Cada escenario corre en un proceso aparte (la configuración del pool se
+lee del entorno al importar). Usa una BD temporal salvo que se defina
+HABITGAIN_DB.
+
+    python bench_hashpool.py [segundos] [hilos_login]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, statistics, sys, threading, time, uuid
+from habitgain import create_app
+from habitgain.hashpool import HashPoolSaturated
+from habitgain.models import Habit, User, hash_pool
+
+seconds, login_threads = float(sys.argv[1]), int(sys.argv[2])
+app = create_app()
+email = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+User.create_user(email, "Bench", "bench-password")
+for i in range(10):
+    Habit.create(email, f"Hábito {i}", "", 1)
+hash_pool.warm_up()
+
+stop = threading.Event()
+logins = {"ok": 0, "rejected": 0}
+lock = threading.Lock()
+
+def login_loop():
+    client = app.test_client()
+    while not stop.is_set():
+        r = client.post("/auth/login", data={"email": email, "password": "bench-password"})
+        with lock:
+            logins["ok" if r.status_code == 302 else "rejected"] += 1
+
+def panel_latencies(duration):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"email": email, "name": "Bench"}
+    out, end = [], time.perf_counter() + duration
+    while time.perf_counter() < end:
+        t = time.perf_counter()
+        client.get("/progress/panel")
+        out.append(time.perf_counter() - t)
+        time.sleep(0.01)
+    return out
+
+idle = panel_latencies(1.0)
+threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+start = time.perf_counter()
+for t in threads:
+    t.start()
+busy = panel_latencies(seconds)
+stop.set()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - start
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+print(json.dumps({
+    "logins_per_s": logins["ok"] / elapsed,
+    "rejected_per_s": logins["rejected"] / elapsed,
+    "panel_idle_p50": pct(idle, 0.5),
+    "panel_p50": pct(busy, 0.5),
+    "panel_p95": pct(busy, 0.95),
+    "pool": hash_pool.stats(),
+}))
+"""
+
+
+def run(label, env_overrides, seconds, login_threads):
+    env = {**os.environ, **env_overrides}
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(seconds), str(login_threads)],
+        env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"{label:<26}{r['logins_per_s']:>10.1f}{r['rejected_per_s']:>10.1f}"
+          f"{r['panel_idle_p50']:>12.1f}ms{r['panel_p50']:>8.1f}ms{r['panel_p95']:>8.1f}ms")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    login_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    if "HABITGAIN_DB" not in os.environ:
+        os.environ["HABITGAIN_DB"] = os.path.join(tempfile.mkdtemp(prefix="habitgain-bench-"), "bench.db")
+
+    print(f"=== Logins con {login_threads} hilos durante {seconds:.0f}s ({os.cpu_count()} CPUs) ===\n")
+    print(f"{'escenario':<26}{'login/s':>10}{'503/s':>10}{'panel ocioso':>14}{'p50':>10}{'p95':>10}")
+    run("en el hilo (sin pool)", {"HABITGAIN_HASH_WORKERS": "0", "HABITGAIN_HASH_QUEUE": "1000"}, seconds, login_threads)
+    for workers in (1, 2):
+        run(f"pool de {workers} proceso(s)", {"HABITGAIN_HASH_WORKERS": str(workers)}, seconds, login_threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque en frío de un worker (plantillas Jinja).
+
+Cada escenario corre en un proceso nuevo, como un worker recién creado:
+mide create_app() y la primera petición a páginas que renderizan las
+plantillas más pesadas (base.html, progress/panel.html, admin).
+
+    python bench_templates.py [repeticiones]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import uuid
+
+PAGES = ["/auth/login", "/explore/", "/progress/panel", "/admin/users", "/admin/habits"]
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from habitgain import create_app
+app = create_app()
+boot = time.perf_counter() - t0
+client = app.test_client()
+with client.session_transaction() as sess:
+    sess["user"] = {"email": sys.argv[1], "name": "Bench"}
+first = {}
+for path in sys.argv[2:]:
+    t = time.perf_counter()
+    r = client.get(path)
+    first[path] = (time.perf_counter() - t, r.status_code)
+print(json.dumps({"boot": boot, "first": first}))
+"""
+
+
+def run_worker(env_overrides, email):
+    env = {**os.environ, **env_overrides}
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, email, *PAGES],
+        env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    from habitgain.models import Database, User
+    db = Database()
+    if db.needs_migration():
+        db.init_db()
+        db.seed_data()
+    email = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+    User.create_user(email, "Bench Admin", "bench-password", role="admin")
+
+    cache_dir = tempfile.mkdtemp(prefix="habitgain-jinja-")
+    scenarios = [
+        ("sin caché, sin precalentado", {"HABITGAIN_TEMPLATE_CACHE_DIR": "", "HABITGAIN_TEMPLATE_WARMUP": "0"}),
+        ("bytecode en disco", {"HABITGAIN_TEMPLATE_CACHE_DIR": cache_dir, "HABITGAIN_TEMPLATE_WARMUP": "0"}),
+        ("bytecode + precalentado", {"HABITGAIN_TEMPLATE_CACHE_DIR": cache_dir, "HABITGAIN_TEMPLATE_WARMUP": "1"}),
+        ("precalentado sin bytecode", {"HABITGAIN_TEMPLATE_CACHE_DIR": "", "HABITGAIN_TEMPLATE_WARMUP": "1"}),
+    ]
+    # Llena la caché de bytecode como lo haría el primer worker del deploy
+    run_worker(scenarios[1][1], email)
+
+    print(f"=== Arranque en frío ({repeats} procesos por escenario) ===\n")
+    print(f"{'escenario':<30}{'create_app':>12}{'1ª petición':>14}{'arranque+1ª':>14}")
+    for label, env in scenarios:
+        boots, firsts = [], []
+        per_page = {p: [] for p in PAGES}
+        for _ in range(repeats):
+            result = run_worker(env, email)
+            boots.append(result["boot"])
+            for path, (seconds, status) in result["first"].items():
+                assert status == 200, f"{path} -> {status}"
+                per_page[path].append(seconds)
+            firsts.append(sum(s for s, _ in result["first"].values()))
+        boot = statistics.median(boots) * 1000
+        first = statistics.median(firsts) * 1000
+        print(f"{label:<30}{boot:>10.1f}ms{first:>12.1f}ms{boot + first:>12.1f}ms")
+        print("    " + "  ".join(f"{p} {statistics.median(v) * 1000:.1f}ms" for p, v in per_page.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la migración owner_email -> user_id: tamaño de los índices y
+tiempo de las consultas por rango de fechas antes y después del relleno.
+
+Siempre usa una BD temporal: arma el esquema 7 (sin triggers ni índices
+por user_id), la llena con datos sintéticos, mide, corre el relleno por
+lotes y vuelve a medir.
+
+    python bench_user_ids.py [usuarios] [días]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["HABITGAIN_DB"] = os.path.join(tempfile.mkdtemp(prefix="habitgain-bench-"), "bench.db")
+
+from habitgain.models import USER_ID_MIGRATION, USER_ID_TABLES, Database  # noqa: E402
+from habitgain.user_id_migration import backfill_user_ids  # noqa: E402
+
+HABITS_PER_USER = 4
+SAMPLES = 400
+ROUNDS = 5
+END = "2025-06-30"
+
+QUERIES = {
+    "completados 30 días": "SELECT COUNT(*) FROM habit_completions WHERE {col}=? AND date BETWEEN '2025-06-01' AND ?",
+    "por hábito 90 días": """SELECT habit_id, COUNT(*), MIN(date), MAX(date) FROM habit_completions
+                             WHERE {col}=? AND date BETWEEN '2025-04-01' AND ? GROUP BY habit_id""",
+    "días con completado 1 año": "SELECT DISTINCT date FROM habit_completions WHERE {col}=? AND date BETWEEN '2024-07-01' AND ?",
+    "progreso del día": "SELECT planned_total_max FROM daily_progress WHERE {col}=? AND date=?",
+    "hábitos activos": "SELECT id, name FROM habits WHERE {col}=? AND active=1 AND ? IS NOT NULL",
+}
+
+
+def email(i: int) -> str:
+    return f"nombre.apellido{i:06d}@correo-de-ejemplo.com"
+
+
+def schema_7(conn) -> None:
+    """Deja la BD recién creada como estaba antes de user_id."""
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'").fetchall():
+        conn.execute(f"DROP TRIGGER {name}")
+    for name in ("idx_habits_user_active", "idx_hc_user_day", "idx_dp_user_day", "idx_onboarding_user"):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habits_owner_email ON habits(owner_email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habits_owner_name ON habits(owner_email, name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hc_owner_date ON habit_completions(owner_email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hc_owner_day ON habit_completions(owner_email, date)")
+    conn.execute("DELETE FROM schema_migrations")
+    conn.execute("PRAGMA user_version = 7")
+    conn.commit()
+
+
+def seed(conn, users: int, days: int) -> int:
+    import datetime as _dt
+    end = _dt.date.fromisoformat(END)
+    dates = [(end - _dt.timedelta(days=d)).isoformat() for d in range(days)]
+    rnd = random.Random(7)
+    conn.executemany(
+        "INSERT INTO users (email, name, password_hash, password_salt, role) VALUES (?, ?, 'x', 'x', 'user')",
+        [(email(i), f"Usuario {i}") for i in range(users)],
+    )
+    conn.executemany(
+        "INSERT INTO habits (name, owner_email, category_id, active) VALUES (?, ?, 1, 1)",
+        [(f"Hábito {h}", email(i)) for i in range(users) for h in range(HABITS_PER_USER)],
+    )
+    conn.executemany(
+        "INSERT INTO onboarding_status (user_email, completed) VALUES (?, 1)",
+        [(email(i),) for i in range(users)],
+    )
+    rows = 0
+    for i in range(users):
+        first = i * HABITS_PER_USER + 1
+        batch = [(first + h, email(i), day) for h in range(HABITS_PER_USER) for day in dates if rnd.random() < 0.7]
+        conn.executemany("INSERT INTO habit_completions (habit_id, owner_email, date) VALUES (?, ?, ?)", batch)
+        conn.executemany(
+            "INSERT INTO daily_progress (owner_email, date, planned_total_max) VALUES (?, ?, ?)",
+            [(email(i), day, HABITS_PER_USER) for day in dates],
+        )
+        rows += len(batch)
+    conn.commit()
+    return rows
+
+
+def index_sizes(conn) -> dict:
+    tables = ",".join(f"'{t}'" for t in USER_ID_TABLES)
+    return dict(conn.execute(
+        f"""
+        SELECT s.name, SUM(s.pgsize) FROM dbstat s
+        JOIN sqlite_master m ON m.name = s.name
+        WHERE m.type = 'index' AND m.tbl_name IN ({tables})
+        GROUP BY s.name ORDER BY s.name
+        """
+    ).fetchall())
+
+
+def time_queries(conn, users: int, by_id: bool) -> dict:
+    rnd = random.Random(11)
+    sample = [rnd.randrange(users) for _ in range(SAMPLES)]
+    col = "user_id" if by_id else "owner_email"
+    # Mismo orden que las filas de users: id = i + 1
+    keys = [i + 1 if by_id else email(i) for i in sample]
+    out = {}
+    for label, sql in QUERIES.items():
+        sql = sql.format(col=col)
+        rounds = []
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for key in keys:
+                conn.execute(sql, (key, END)).fetchall()
+            rounds.append((time.perf_counter() - start) / len(keys) * 1e6)
+        out[label] = min(rounds)  # la mejor ronda: menos ruido de la caché del SO
+    return out
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    db = Database()
+    db.init_db()
+    conn = db.get_connection()
+    try:
+        schema_7(conn)
+        t = time.perf_counter()
+        completions = seed(conn, users, days)
+        print(f"=== user_id ({users} usuarios, {users * HABITS_PER_USER} hábitos, "
+              f"{completions} completados; sembrado en {time.perf_counter() - t:.1f}s) ===\n")
+        before_sizes = index_sizes(conn)
+        before = time_queries(conn, users, by_id=False)
+    finally:
+        conn.close()
+
+    db.init_db()  # esquema 8: columnas, índices y triggers; el relleno queda pendiente
+    summary = backfill_user_ids()
+    rate = summary["scanned"] / summary["seconds"] if summary["seconds"] else 0
+    print(f"Relleno: {summary['updated']} filas en {summary['chunks']} lotes, "
+          f"{summary['seconds']}s ({rate:.0f} filas/s)\n")
+    assert db.migration_done(USER_ID_MIGRATION)
+
+    conn = db.get_connection()
+    try:
+        after_sizes = index_sizes(conn)
+        after = time_queries(conn, users, by_id=True)
+    finally:
+        conn.close()
+
+    print(f"{'índice':<38}{'antes':>12}{'después':>12}")
+    for name in sorted(set(before_sizes) | set(after_sizes)):
+        b, a = before_sizes.get(name), after_sizes.get(name)
+        fmt = lambda v: f"{v / 1024:>10.0f}KB" if v else f"{'-':>12}"
+        print(f"{name:<38}{fmt(b)}{fmt(a)}")
+    print(f"{'total':<38}{sum(before_sizes.values()) / 1024:>10.0f}KB{sum(after_sizes.values()) / 1024:>10.0f}KB\n")
+
+    print(f"{f'consulta ({SAMPLES} usuarios)':<30}{'owner_email':>14}{'user_id':>12}")
+    for label in QUERIES:
+        print(f"{label:<30}{before[label]:>12.1f}µs{after[label]:>10.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
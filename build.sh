@@ -3,3 +3,6 @@
 set -o errexit
 
 pip install -r requirements.txt
+
+# Copias con hash + .gz de habitgain/static y su manifest
+python -m habitgain.assets
@@ -9,6 +9,17 @@ Comandos:
   test-login [email]      - Prueba login con un email
   raw-query [sql]         - Ejecuta una consulta SQL directa
   reset-password [email]  - Resetear contraseña de un usuario
+  import-completions [email] [archivo] [--create-missing]
+                          - Importa historial de completados (CSV o NDJSON)
+  revoke-sessions [email] - Cierra las sesiones de servidor de un usuario
+  sweep-sessions          - Borra las sesiones de servidor vencidas
+  migrate-passwords [--workers N] [--chunk-size N]
+                          - Hashea contraseñas legacy/faltantes (por lotes, reanudable)
+  import-users [archivo.csv] [--default-password X] [--onboarding] [--habits id1,id2]
+               [--workers N] [--chunk-size N]
+                          - Alta masiva de usuarios (email,name,password,role)
+  migrate-user-ids [--chunk-size N]
+                          - Rellena user_id en hábitos, completados, progreso y onboarding
 """
 
 import sys
@@ -131,6 +142,171 @@ def raw_query(sql=None):
     finally:
         conn.close()
 
+def import_completions(email=None, path=None, create_missing=False):
+    """Importa historial de completados desde un CSV/NDJSON"""
+    from habitgain.importer import detect_format, iter_rows, import_completions as run_import
+
+    if not email or not path:
+        print("Uso: python3 db_tool.py import-completions [email] [archivo] [--create-missing]")
+        return
+
+    fmt = detect_format(path)
+    if not fmt:
+        print("❌ Formato no soportado (usa .csv, .ndjson o .jsonl)")
+        return
+
+    db = Database()
+    if db.needs_migration():
+        db.init_db()
+
+    print(f"=== Importando {path} para {email} ===\n")
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        summary = run_import(email.strip().lower(), iter_rows(fh, fmt), create_missing=create_missing)
+
+    print(f"Filas leídas:     {summary['rows']}")
+    print(f"Insertadas:       {summary['inserted']}")
+    print(f"Duplicadas:       {summary['duplicates']}")
+    print(f"Rechazadas:       {summary['rejected']}")
+    print(f"Hábitos tocados:  {summary['habits']} ({summary['created_habits']} creados)")
+    print(f"Tiempo:           {summary['seconds']}s")
+    for err in summary["errors"]:
+        print(f"  - {err}")
+
+def import_users(path=None, default_password=None, onboarding=False, habit_ids=None,
+                 workers=None, chunk_size=None):
+    """Alta masiva de usuarios desde un CSV, con hashing en paralelo"""
+    from habitgain.explore import HABIT_CATALOG
+    from habitgain.user_import import IMPORT_USERS_CHUNK_SIZE, import_users as run_import, iter_user_rows
+
+    if not path:
+        print("Uso: python3 db_tool.py import-users [archivo.csv] [--default-password X] "
+              "[--onboarding] [--habits id1,id2] [--workers N] [--chunk-size N]")
+        return
+
+    catalog = {h["id"]: h for habits in HABIT_CATALOG.values() for h in habits}
+    habit_ids = [h.strip() for h in (habit_ids or "").split(",") if h.strip()]
+    unknown = [h for h in habit_ids if h not in catalog]
+    if unknown:
+        print(f"❌ Hábitos no encontrados en el catálogo: {', '.join(unknown)}")
+        return
+
+    db = Database()
+    if db.needs_migration():
+        db.init_db()
+
+    def report(p):
+        rate = p["created"] / p["seconds"] if p["seconds"] else 0
+        print(f"  {p['rows']} filas  {p['created']} creados  {p['existing']} existentes  "
+              f"{p['rejected']} rechazados  {rate:.0f} usuarios/s")
+
+    print(f"=== Importando usuarios de {path} ===\n")
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        summary = run_import(
+            iter_user_rows(fh),
+            default_password=default_password,
+            onboarding=onboarding,
+            starter_habits=[catalog[h] for h in habit_ids],
+            workers=workers,
+            chunk_size=chunk_size or IMPORT_USERS_CHUNK_SIZE,
+            progress=report,
+        )
+
+    print(f"\nFilas leídas:     {summary['rows']}")
+    print(f"Creados:          {summary['created']}")
+    print(f"Ya existían:      {summary['existing']}")
+    print(f"Rechazados:       {summary['rejected']}")
+    print(f"Onboarding:       {summary['onboarding']}")
+    print(f"Hábitos:          {summary['habits']}")
+    print(f"Procesos:         {summary['workers']}")
+    print(f"Tiempo:           {summary['seconds']}s ({summary['per_second']} usuarios/s)")
+    for err in summary["errors"]:
+        print(f"  - {err}")
+
+def revoke_sessions(email=None):
+    """Cierra todas las sesiones de servidor de un usuario"""
+    from habitgain.sessions import revoke_user_sessions
+
+    if not email:
+        email = input("Email: ").strip().lower()
+    count = revoke_user_sessions(email)
+    print(f"✓ Sesiones cerradas para {email}: {count}")
+
+def sweep_sessions():
+    """Borra las sesiones de servidor vencidas"""
+    from habitgain.sessions import sweep_expired
+
+    total = 0
+    while True:
+        removed = sweep_expired()
+        total += removed
+        if not removed:
+            break
+    print(f"✓ Sesiones vencidas borradas: {total}")
+
+def migrate_passwords(workers=None, chunk_size=None):
+    """Hashea en paralelo las contraseñas legacy o faltantes"""
+    from habitgain.password_migration import MIGRATION_CHUNK_SIZE, migrate_passwords as run_migration
+
+    db = Database()
+    if db.needs_migration():
+        db.init_db()
+
+    def report(p):
+        done = p["migrated"] + p["skipped"]
+        pct = 100 * done / p["pending"] if p["pending"] else 100
+        rate = done / p["seconds"] if p["seconds"] else 0
+        print(f"  {done}/{p['pending']} ({pct:.0f}%)  {rate:.0f} filas/s")
+
+    print("=== Migrando contraseñas ===\n")
+    summary = run_migration(
+        workers=workers,
+        chunk_size=chunk_size or MIGRATION_CHUNK_SIZE,
+        progress=report,
+    )
+    if not summary["pending"]:
+        print("✓ No hay contraseñas pendientes")
+        return
+    print(f"\n✓ Migradas: {summary['migrated']}  Omitidas: {summary['skipped']}  "
+          f"Procesos: {summary['workers']}  Tiempo: {summary['seconds']}s")
+
+def migrate_user_ids(chunk_size=None):
+    """Rellena user_id por lotes en las tablas que se unían a users por email"""
+    from habitgain.models import USER_ID_MIGRATION
+    from habitgain.user_id_migration import BACKFILL_CHUNK_SIZE, backfill_user_ids
+
+    db = Database()
+    if db.needs_migration():
+        db.init_db()
+
+    def report(p):
+        rate = p["scanned"] / p["seconds"] if p["seconds"] else 0
+        print(f"  {p['updated']} filas actualizadas (en {p['table']})  {rate:.0f} filas/s")
+
+    print("=== Migrando a user_id ===\n")
+    if db.migration_done(USER_ID_MIGRATION):
+        print("✓ La migración ya estaba hecha")
+        return
+    summary = backfill_user_ids(chunk_size=chunk_size or BACKFILL_CHUNK_SIZE, progress=report)
+    for table, updated in summary["tables"].items():
+        print(f"  {table}: {updated}")
+    print(f"\n✓ Actualizadas: {summary['updated']}  Lotes: {summary['chunks']}  Tiempo: {summary['seconds']}s")
+
+def _option(name, default=None):
+    """Valor entero de una opción --name N"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return int(sys.argv[idx + 1])
+    return default
+
+def _text_option(name, default=None):
+    """Valor de texto de una opción --name X"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return default
+
 def show_help():
     """Muestra ayuda"""
     print(__doc__)
@@ -155,6 +331,34 @@ def main():
     elif command == "raw-query":
         sql = " ".join(sys.argv[2:]) if len(sys.argv) > 2 else None
         raw_query(sql)
+    elif command == "import-completions":
+        args = [a for a in sys.argv[2:] if not a.startswith("--")]
+        import_completions(
+            args[0] if len(args) > 0 else None,
+            args[1] if len(args) > 1 else None,
+            create_missing="--create-missing" in sys.argv,
+        )
+    elif command == "import-users":
+        valued = {"--default-password", "--habits", "--workers", "--chunk-size"}
+        args = [a for i, a in enumerate(sys.argv[2:], start=2)
+                if not a.startswith("--") and sys.argv[i - 1] not in valued]
+        import_users(
+            args[0] if args else None,
+            default_password=_text_option("--default-password"),
+            onboarding="--onboarding" in sys.argv,
+            habit_ids=_text_option("--habits"),
+            workers=_option("--workers"),
+            chunk_size=_option("--chunk-size"),
+        )
+    elif command == "revoke-sessions":
+        email = sys.argv[2] if len(sys.argv) > 2 else None
+        revoke_sessions(email)
+    elif command == "sweep-sessions":
+        sweep_sessions()
+    elif command == "migrate-passwords":
+        migrate_passwords(_option("--workers"), _option("--chunk-size"))
+    elif command == "migrate-user-ids":
+        migrate_user_ids(_option("--chunk-size"))
     elif command in ["help", "-h", "--help"]:
         show_help()
     else:
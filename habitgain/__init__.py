@@ -1,8 +1,8 @@
 # habitgain/__init__.py
 
 import os
-from flask import Flask, url_for
-from werkzeug.routing import BuildError
+from flask import Flask, g, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .core import core_bp
 from .auth import auth_bp
@@ -14,27 +14,58 @@ from .manage import manage_bp
 from .admin import admin_bp
 from .onboarding import onboarding_bp
 from .models import Database
+from .cache import sync_versions
+from .identity import load_identity
+from .remember import init_remember
+from .sessions import SqliteSessionInterface
+from .assets import init_assets
+from .compression import init_compression
+from .templating import configure_templates, warm_templates
 
 # SECRET_KEY configurable por entorno, con fallback dev
 SECRET_KEY = os.environ.get("HABITGAIN_SECRET_KEY", "dev-secret")
 
 
+# Endpoints candidatos para el enlace "Panel", en orden de preferencia
+PANEL_ENDPOINT_CANDIDATES = (
+    "progress.panel",          # panel actual
+    "manage.home", "manage.index",
+    "panel.home", "panel.index",
+    "dashboard.home", "dashboard.index",
+    "explore.home",            # fallback si no hay panel
+)
+
+
+def _resolve_panel_endpoint(app) -> str:
+    for ep in PANEL_ENDPOINT_CANDIDATES:
+        if ep in app.view_functions:
+            return ep
+    return "core.home"
+
+
 def create_app():
     app = Flask(__name__)
     app.config["SECRET_KEY"] = SECRET_KEY  # reemplazar en prod por algo serio
+    app.config["SERVER_SESSIONS"] = os.environ.get("HABITGAIN_SERVER_SESSIONS", "0").lower() in ("1", "true", "yes")
+    # Proxies inversos de confianza delante de la app (0 = conexión directa).
+    # Con N > 0, request.remote_addr es la IP del cliente según X-Forwarded-For:
+    # el límite de intentos por IP (throttle.py) depende de esto.
+    try:
+        app.config["TRUSTED_PROXIES"] = max(0, int(os.environ.get("HABITGAIN_TRUSTED_PROXIES", "0")))
+    except ValueError:
+        app.config["TRUSTED_PROXIES"] = 0
+    if app.config["TRUSTED_PROXIES"]:
+        proxies = app.config["TRUSTED_PROXIES"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+    # Bytecode de Jinja en disco y sin auto-reload (antes de tocar jinja_env)
+    configure_templates(app)
 
     # DB init + seed (solo si es necesario)
     db = Database()
-    # Solo ejecutar init_db si la tabla users no existe
-    # Esto evita locks innecesarios en cada request
+    # Solo ejecutar init_db si falta la tabla users o hay migraciones pendientes
+    # (PRAGMA user_version). Esto evita locks innecesarios en cada arranque
     try:
-        conn = db.get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-        table_exists = cur.fetchone() is not None
-        conn.close()
-
-        if not table_exists:
+        if db.needs_migration():
             db.init_db()
             db.seed_data()
     except Exception:
@@ -42,41 +73,27 @@ def create_app():
         db.init_db()
         db.seed_data()
 
+    # Sesiones en SQLite: la cookie sólo lleva el id
+    if app.config["SERVER_SESSIONS"]:
+        app.session_interface = SqliteSessionInterface()
+
+    # Invalidaciones de caché hechas por otros workers: un chequeo por petición.
+    # Va antes que load_identity, que valida el rol contra esas versiones.
+    app.before_request(sync_versions)
+    # Sesión vencida con cookie "recordarme": se restaura antes de resolver la identidad
+    init_remember(app)
+    app.before_request(load_identity)
+
+    # gzip de HTML/JSON grandes (panel, listados de admin, endpoints JSON)
+    init_compression(app)
+
     # ===== Contexto para plantillas (sin current_app en Jinja, sin BuildError) =====
     @app.context_processor
     def inject_template_vars():
-        from flask import session
-        from .models import User
-
-        # intenta resolver una URL válida para "Panel" entre varios endpoints comunes
-        candidates = [
-            "progress.panel",          # panel actual
-            "manage.home", "manage.index",
-            "panel.home", "panel.index",
-            "dashboard.home", "dashboard.index",
-            "explore.home",            # fallback si no hay panel
-        ]
-        panel_url = url_for("core.home")
-        for ep in candidates:
-            try:
-                panel_url = url_for(ep)
-                break
-            except BuildError:
-                continue
-
-        # Verificar si el usuario actual es admin
-        is_admin = False
-        if "user" in session:
-            user_email = session["user"].get("email")
-            if user_email:
-                user = User.get_by_email(user_email)
-                if user and user.get("role") == "admin":
-                    is_admin = True
-
         return {
             "has_auth": "auth" in app.blueprints,
-            "panel_url": panel_url,
-            "is_admin": is_admin,
+            "panel_url": url_for(app.config["PANEL_ENDPOINT"]),
+            "is_admin": getattr(g, "is_admin", False),
         }
 
     # ===== Blueprints =====
@@ -90,4 +107,14 @@ def create_app():
     app.register_blueprint(admin_bp,       url_prefix="/admin")
     app.register_blueprint(onboarding_bp,  url_prefix="/onboarding")
 
+    # Assets con hash (python -m habitgain.assets): manifest leído una vez
+    init_assets(app)
+
+    # Endpoint del "Panel": se resuelve una vez, no en cada render
+    app.config["PANEL_ENDPOINT"] = _resolve_panel_endpoint(app)
+
+    # Compilar todas las plantillas ahora y no en las primeras peticiones
+    if app.config["TEMPLATE_WARMUP"]:
+        warm_templates(app)
+
     return app
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from ..models import User, Habit
-import secrets
+from flask import Blueprint, g, render_template, request, redirect, url_for, session, flash, jsonify
+from ..models import User, Habit, normalize_email
+from ..cache import cache_stats
+from ..csrf import generate_token, validate_token
+from ..sessions import revoke_user_sessions
+from ..hashpool import hash_pool
+from ..throttle import login_throttle
 from functools import wraps
 import requests
 
@@ -15,10 +19,8 @@ def require_admin(f):
             flash("Debes iniciar sesión primero", "warning")
             return redirect(url_for("auth.login"))
 
-        user_email = session["user"]["email"]
-        user = User.get_by_email(user_email)
-
-        if not user or user.get("role") != "admin":
+        # Rol resuelto una vez por petición (ver identity.load_identity)
+        if not g.get("is_admin"):
             flash("No tienes permisos para acceder a esta sección", "danger")
             return redirect(url_for("progress.panel"))
 
@@ -27,10 +29,7 @@ def require_admin(f):
 
 
 def _get_csrf_token() -> str:
-    token = secrets.token_urlsafe(32)
-    session["csrf_token_admin"] = token
-    session.modified = True
-    return token
+    return generate_token("admin")
 
 
 # ============== PANEL PRINCIPAL ==============
@@ -74,13 +73,11 @@ def users_create():
     """HU-16 CDA2 & CDA3: Crear nuevo usuario con validación"""
     if request.method == "POST":
         # CSRF check
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token_admin", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "admin"):
             flash("Token CSRF inválido", "danger")
             return redirect(url_for("admin.users_create"))
 
-        email = request.form.get("email", "").strip()
+        email = normalize_email(request.form.get("email"))
         name = request.form.get("name", "").strip()
         password = request.form.get("password", "").strip()
         role = request.form.get("role", "user").strip()
@@ -129,13 +126,11 @@ def users_edit(user_id: int):
 
     if request.method == "POST":
         # CSRF check
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token_admin", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "admin"):
             flash("Token CSRF inválido", "danger")
             return redirect(url_for("admin.users_edit", user_id=user_id))
 
-        email = request.form.get("email", "").strip()
+        email = normalize_email(request.form.get("email"))
         name = request.form.get("name", "").strip()
         role = request.form.get("role", "user").strip()
 
@@ -188,14 +183,13 @@ def users_delete(user_id: int):
 
     if request.method == "POST":
         # CSRF check
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token_admin", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "admin"):
             flash("Token CSRF inválido", "danger")
             return redirect(url_for("admin.users_list"))
 
         try:
             User.delete_user(user_id)
+            revoke_user_sessions(user.get("email"))
             flash(f'Usuario "{user.get("email")}" eliminado exitosamente', "success")
             return redirect(url_for("admin.users_list"))
         except Exception as e:
@@ -243,6 +237,22 @@ def onboarding_analytics():
     return render_template("admin/onboarding_analytics.html", stats=stats)
 
 
+# ============== CACHÉ DE LECTURAS ==============
+
+@admin_bp.route("/cache-stats")
+@require_admin
+def cache_stats_json():
+    """Contadores de la caché de lecturas de este worker (para dimensionarla)."""
+    return jsonify({"ok": True, **cache_stats()})
+
+
+@admin_bp.route("/auth-stats")
+@require_admin
+def auth_stats_json():
+    """Contadores del límite de logins y del pool de hashing de este worker."""
+    return jsonify({"ok": True, "throttle": login_throttle.stats(), "hash_pool": hash_pool.stats()})
+
+
 # ============== CRUD HÁBITOS ==============
 
 @admin_bp.route("/habits")
@@ -265,9 +275,7 @@ def habits_edit(habit_id: int):
 
     if request.method == "POST":
         # CSRF check
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token_admin", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "admin"):
             flash("Token CSRF inválido", "danger")
             return redirect(url_for("admin.habits_edit", habit_id=habit_id))
 
@@ -294,7 +302,8 @@ def habits_edit(habit_id: int):
             return redirect(url_for("admin.habits_edit", habit_id=habit_id))
 
         try:
-            Habit.admin_update_habit(habit_id, name, short_desc, owner_email, active)
+            # El email tal como está guardado (la búsqueda no distingue mayúsculas)
+            Habit.admin_update_habit(habit_id, name, short_desc, owner["email"], active)
             flash(f'Hábito "{name}" actualizado exitosamente', "success")
             return redirect(url_for("admin.habits_list"))
         except Exception as e:
@@ -316,9 +325,7 @@ def habits_delete(habit_id: int):
 
     if request.method == "POST":
         # CSRF check
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token_admin", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "admin"):
             flash("Token CSRF inválido", "danger")
             return redirect(url_for("admin.habits_list"))
 
@@ -0,0 +1,112 @@
+"""
+Assets estáticos con huella de contenido y precomprimidos.
+
+`python -m habitgain.assets` (se ejecuta en build.sh) copia cada archivo de
+habitgain/static a static/dist con el hash en el nombre, escribe una
+variante .gz cuando conviene y deja un manifest.json con el mapeo
+original -> versión con hash.
+
+En la app, `static_url('js/main.js')` resuelve la versión con hash
+(servida en /assets con caché de un año e immutable, en gzip si el
+cliente lo acepta). Sin manifest cae a `url_for('static', ...)`.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+from typing import Dict
+
+from flask import current_app, request, send_from_directory, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def build_assets(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """Genera static/dist (copias con hash + .gz) y su manifest. Retorna el manifest."""
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    manifest: Dict[str, str] = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{_file_hash(src)}{ext}"
+            dst = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(src, dst)
+
+            if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+                with open(src, "rb") as fh:
+                    raw = fh.read()
+                packed = gzip.compress(raw, compresslevel=9, mtime=0)
+                if len(packed) < len(raw):
+                    with open(dst + ".gz", "wb") as fh:
+                        fh.write(packed)
+            manifest[rel] = hashed
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    path = os.path.join(static_dir, DIST_DIRNAME, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def static_url(filename: str) -> str:
+    """URL de un asset: versión con hash si está en el manifest, si no la normal."""
+    hashed = current_app.extensions.get("asset_manifest", {}).get(filename)
+    if hashed:
+        return url_for("asset", filename=hashed)
+    return url_for("static", filename=filename)
+
+
+def serve_asset(filename: str):
+    dist_dir = os.path.join(current_app.static_folder, DIST_DIRNAME)
+    if "gzip" in request.accept_encodings and os.path.isfile(os.path.join(dist_dir, filename + ".gz")):
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(dist_dir, filename + ".gz", mimetype=mimetype, max_age=ASSET_MAX_AGE)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = send_from_directory(dist_dir, filename, max_age=ASSET_MAX_AGE)
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_assets(app) -> None:
+    """Carga el manifest una vez y registra /assets y el helper static_url()."""
+    app.extensions["asset_manifest"] = load_manifest(app.static_folder)
+    app.add_url_rule("/assets/<path:filename>", endpoint="asset", view_func=serve_asset)
+    app.jinja_env.globals["static_url"] = static_url
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR
+    result = build_assets(target)
+    print(f"✓ {len(result)} assets en {os.path.join(target, DIST_DIRNAME)}")
@@ -1,6 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, make_response, render_template, request, redirect, url_for, session, flash
 import re
-from ..models import User, OnboardingStatus
+from ..models import DuplicateEmailError, User, normalize_email
+from ..identity import remember_role
+from ..csrf import new_session_id
+from ..hashpool import HashPoolSaturated
+from ..throttle import login_throttle
+from ..remember import clear_remember_cookie, current_selector, remember_login, revoke_token
 
 auth_bp = Blueprint("auth", __name__, template_folder="templates")
 
@@ -14,23 +19,45 @@ def is_valid_password(password):
     """Valida que la contraseña tenga al menos 6 caracteres"""
     return len(password) >= 6
 
-def email_exists(email):
-    """Verifica si el email ya está registrado en la base de datos"""
-    return User.get_by_email(email) is not None
+def _throttled(email=None):
+    """Consume un intento (email + IP). Retorna la respuesta 429 si está bloqueado."""
+    allowed, retry_after = login_throttle.check(email=email, ip=request.remote_addr)
+    if allowed:
+        return None
+    flash(f"Demasiados intentos. Espera {retry_after} segundos antes de volver a intentarlo", "danger")
+    template = "auth/login.html" if request.endpoint == "auth.login" else "auth/register.html"
+    title = "Iniciar sesión" if request.endpoint == "auth.login" else "Crear cuenta"
+    response = make_response(render_template(template, title=title, email=email), 429)
+    response.headers["Retry-After"] = str(retry_after)
+    return response
 
 # Ruta Login
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
-        email = request.form.get("email", "").strip().lower()
+        email = normalize_email(request.form.get("email"))
         pwd = request.form.get("password", "")
 
+        # Límite por email e IP antes de gastar CPU en PBKDF2
+        blocked = _throttled(email)
+        if blocked is not None:
+            return blocked
+
         # Verificar credenciales usando la base de datos
-        user = User.verify_password(email, pwd)
+        try:
+            user = User.verify_password(email, pwd)
+        except HashPoolSaturated:
+            flash("Hay demasiados inicios de sesión en este momento. Intenta de nuevo en unos segundos", "warning")
+            return render_template("auth/login.html", title="Iniciar sesión", email=email), 503
         if user:
             session["user"] = {"email": email, "name": user.get("name", "Usuario")}
+            remember_role(email, user.get("role"))
+            new_session_id()
             flash("¡Bienvenido/a de nuevo!", "success")
-            return redirect(url_for("progress.panel"))
+            response = redirect(url_for("progress.panel"))
+            if request.form.get("remember"):
+                remember_login(response, user["id"])
+            return response
 
         flash("Correo o contraseña incorrectos", "danger")
         return render_template("auth/login.html", title="Iniciar sesión", email=email)
@@ -43,7 +70,7 @@ def register():
     if request.method == "POST":
         # Obtener datos del formulario
         name = request.form.get("name", "").strip()
-        email = request.form.get("email", "").strip().lower()
+        email = normalize_email(request.form.get("email"))
         password = request.form.get("password", "")
         confirm_password = request.form.get("confirm_password", "")
         
@@ -58,15 +85,13 @@ def register():
         if not is_valid_email(email):
             errors.append("El correo electrónico no es válido")
         
-        # Validación 3: Email único
-        if email_exists(email):
-            errors.append("Este correo ya está registrado. Intenta iniciar sesión")
-        
-        # Validación 4: Contraseña longitud
+        # (El email único no se consulta aquí: lo garantiza el UNIQUE de users al insertar)
+
+        # Validación 3: Contraseña longitud
         if not is_valid_password(password):
             errors.append("La contraseña debe tener al menos 6 caracteres")
         
-        # Validación 5: Contraseñas coinciden
+        # Validación 4: Contraseñas coinciden
         if password != confirm_password:
             errors.append("Las contraseñas no coinciden")
         
@@ -81,18 +106,39 @@ def register():
                 email=email
             )
         
+        # Registrar también hashea: mismo límite por IP que el login
+        blocked = _throttled()
+        if blocked is not None:
+            return blocked
+
         # Registrar usuario en la base de datos
+        # (usuario + estado de onboarding HU-18 en la misma transacción)
         try:
-            User.create_user(email, name, password, role="user")
-
-            # HU-18: Crear estado de onboarding para nuevo usuario
-            OnboardingStatus.create_status(email)
+            User.register(email, name, password, role="user")
 
             # Iniciar sesión automáticamente
             session["user"] = {"email": email, "name": name}
+            remember_role(email, "user")
+            new_session_id()
 
             flash("¡Cuenta creada exitosamente! Bienvenido/a a HabitGain.", "success")
             return redirect(url_for("progress.panel"))
+        except DuplicateEmailError:
+            flash("Este correo ya está registrado. Intenta iniciar sesión", "danger")
+            return render_template(
+                "auth/register.html",
+                title="Crear cuenta",
+                name=name,
+                email=email
+            )
+        except HashPoolSaturated:
+            flash("El servidor está ocupado. Intenta crear la cuenta de nuevo en unos segundos", "warning")
+            return render_template(
+                "auth/register.html",
+                title="Crear cuenta",
+                name=name,
+                email=email
+            ), 503
         except Exception as e:
             flash(f"Error al crear la cuenta: {str(e)}", "danger")
             return render_template(
@@ -108,6 +154,10 @@ def register():
 # Ruta logout
 @auth_bp.route("/logout")
 def logout():
+    # El token "recordarme" de este navegador deja de servir
+    selector = current_selector()
+    if selector:
+        revoke_token(selector)
     session.clear()
     flash("Has cerrado sesión correctamente", "info")
-    return redirect(url_for("auth.login"))
\ No newline at end of file
+    return clear_remember_cookie(redirect(url_for("auth.login")))
@@ -0,0 +1,289 @@
+"""
+Caché de lecturas en proceso para los modelos.
+
+- `LRUCache`: LRU acotado con TTL y contadores (hits / misses / evictions).
+- `versions`: versión de escritura por alcance (el email del usuario, o
+  "categories" para el catálogo). Cada método que escribe llama a
+  `invalidate(alcance)` después del commit; como la versión forma
+  parte de la clave, las entradas viejas quedan inalcanzables y salen por
+  LRU/TTL. Las versiones vienen de un contador global y creciente, lo que
+  permite validar lecturas por id (cuyo dueño no se conoce antes de leer).
+- `shared`: publica esas versiones en la tabla `cache_versions` para que
+  los demás workers (procesos gunicorn del mismo host) se enteren. Cada
+  worker valida con una sola consulta `PRAGMA data_version` por petición
+  y sólo lee los cambios cuando otro proceso escribió.
+
+Configuración por entorno:
+  HABITGAIN_CACHE_SIZE  entradas máximas por worker (0 desactiva la caché)
+  HABITGAIN_CACHE_TTL   segundos de vida de cada entrada
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_SIZE = 2048
+DEFAULT_CACHE_TTL = 30.0
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_CACHE_TTL):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class VersionTable:
+    """Versión de escritura por alcance (email); 0 si nunca se escribió."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def get(self, scope: str) -> int:
+        return self._versions.get(scope, 0)
+
+    def current(self) -> int:
+        """Último número de versión emitido (para validar lecturas por id)."""
+        return self._seq
+
+    def bump(self, *scopes: Optional[str]) -> None:
+        with self._lock:
+            for scope in scopes:
+                if scope:
+                    self._seq += 1
+                    self._versions[scope] = self._seq
+
+    def update(self, rows: Iterable[Tuple[str, int]]) -> None:
+        """Aplica versiones leídas de la base de datos (nunca retrocede)."""
+        with self._lock:
+            for scope, version in rows:
+                version = int(version)
+                if version > self._versions.get(scope, 0):
+                    self._versions[scope] = version
+                self._seq = max(self._seq, version)
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+
+def _env_number(name: str, default: float, cast: Callable = float):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+read_cache = LRUCache(
+    maxsize=_env_number("HABITGAIN_CACHE_SIZE", DEFAULT_CACHE_SIZE, int),
+    ttl=_env_number("HABITGAIN_CACHE_TTL", DEFAULT_CACHE_TTL),
+)
+versions = VersionTable()
+
+
+class SharedVersions:
+    """Versiones compartidas entre procesos vía la tabla `cache_versions`.
+
+    Usa una conexión propia por proceso (se reabre tras un fork). Las
+    escrituras de esa conexión no cambian su propio `data_version`, así que
+    sólo las de otros procesos (u otras conexiones) disparan una relectura.
+    """
+
+    def __init__(self):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._path: Optional[str] = None
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.syncs = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        from .models import Database
+        path = Database().db_path
+        if self._conn is None or self._pid != os.getpid() or self._path != path:
+            self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False,
+                                         isolation_level=None)
+            self._pid, self._path, self._data_version = os.getpid(), path, None
+        return self._conn
+
+    def _catch_up(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute(
+            "SELECT scope, version FROM cache_versions WHERE version > ?",
+            (versions.current(),),
+        ).fetchall()
+        if rows:
+            versions.update(rows)
+            self.syncs += 1
+
+    def sync(self) -> None:
+        """Chequeo barato por petición: relee versiones sólo si otro proceso escribió."""
+        with self._lock:
+            try:
+                conn = self._connection()
+                (data_version,) = conn.execute("PRAGMA data_version").fetchone()
+                if data_version == self._data_version:
+                    return
+                self._data_version = data_version
+                self._catch_up(conn)
+            except sqlite3.Error:
+                pass  # BD sin migrar: la caché sigue siendo sólo local
+
+    def publish(self, scopes) -> None:
+        """Asigna versiones nuevas a `scopes` en la BD y las aplica localmente."""
+        scopes = [s for s in dict.fromkeys(scopes) if s]
+        if not scopes:
+            return
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Primero lo que publicaron otros, para no saltarnos versiones
+                    self._catch_up(conn)
+                    (top,) = conn.execute(
+                        "SELECT COALESCE(MAX(version), 0) FROM cache_versions"
+                    ).fetchone()
+                    rows = [(scope, top + i) for i, scope in enumerate(scopes, start=1)]
+                    conn.executemany(
+                        """
+                        INSERT INTO cache_versions (scope, version) VALUES (?, ?)
+                        ON CONFLICT(scope) DO UPDATE SET version = excluded.version
+                        """,
+                        rows,
+                    )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                versions.update(rows)
+            except sqlite3.Error:
+                versions.bump(*scopes)
+
+
+shared = SharedVersions()
+
+
+def invalidate(*scopes: Optional[str]) -> None:
+    """Invalida las lecturas cacheadas de esos alcances (en todos los workers)."""
+    shared.publish(scopes)
+
+
+def sync_versions() -> None:
+    """Hook `before_request`: aplica invalidaciones hechas por otros workers."""
+    shared.sync()
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {**read_cache.stats(), "scopes": len(versions), "syncs": shared.syncs}
+
+
+def _clone(value: Any) -> Any:
+    # Cada llamador recibe su copia: mutar el resultado no debe tocar la caché
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    return value
+
+
+def cached(namespace: str):
+    """Cachea una lectura cuyo primer argumento es el email del dueño."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(email, *args):
+            if not read_cache.enabled:
+                return fn(email, *args)
+            # La versión se lee antes de consultar: una escritura concurrente
+            # deja la entrada bajo una versión ya vieja, nunca bajo la nueva.
+            key = (namespace, email, args, versions.get(email))
+            value = read_cache.get(key)
+            if value is _MISSING:
+                value = fn(email, *args)
+                read_cache.set(key, value)
+            return _clone(value)
+        return wrapper
+    return decorator
+
+
+def cached_by_id(namespace: str, owner_field: str = "owner_email"):
+    """Cachea una lectura por id; la entrada se valida contra la versión de su dueño."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(obj_id):
+            if not read_cache.enabled:
+                return fn(obj_id)
+            key = (namespace, obj_id)
+            entry = read_cache.get(key)
+            if entry is not _MISSING:
+                owner, version, value = entry
+                if versions.get(owner) == version:
+                    return _clone(value)
+            before = versions.current()
+            value = fn(obj_id)
+            if value is not None:
+                owner = value.get(owner_field)
+                version = versions.get(owner)
+                if version <= before:  # sin escrituras del dueño durante la consulta
+                    read_cache.set(key, (owner, version, value))
+            return _clone(value)
+        return wrapper
+    return decorator
@@ -0,0 +1,78 @@
+"""
+Compresión gzip de respuestas HTML / JSON (hook after_request).
+
+Sólo se comprimen respuestas 200 ya armadas en memoria, de un tipo en
+COMPRESSIBLE_MIMETYPES y con al menos HABITGAIN_COMPRESS_MIN_SIZE bytes.
+Quedan fuera los archivos servidos con send_file (direct_passthrough,
+p. ej. /static y los .gz de /assets), las respuestas que ya traen
+Content-Encoding y las de streaming (exportaciones), que se enviarían
+igual a medida que se generan.
+
+Configuración por entorno:
+  HABITGAIN_COMPRESS            1/0, activa la compresión (por defecto 1)
+  HABITGAIN_COMPRESS_MIN_SIZE   bytes mínimos para comprimir (por defecto 1024)
+  HABITGAIN_COMPRESS_LEVEL      nivel gzip 1-9 (por defecto 6)
+"""
+import gzip
+import os
+
+from flask import current_app, request
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_LEVEL = 6
+COMPRESSIBLE_MIMETYPES = frozenset({
+    "text/html",
+    "text/plain",
+    "text/csv",
+    "application/json",
+    "application/x-ndjson",
+})
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def init_compression(app) -> None:
+    app.config["COMPRESS"] = os.environ.get("HABITGAIN_COMPRESS", "1").lower() in ("1", "true", "yes")
+    app.config["COMPRESS_MIN_SIZE"] = _env_int("HABITGAIN_COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)
+    app.config["COMPRESS_LEVEL"] = min(9, max(1, _env_int("HABITGAIN_COMPRESS_LEVEL", DEFAULT_LEVEL)))
+    app.after_request(compress_response)
+
+
+def compress_response(response):
+    config = current_app.config
+    if not config.get("COMPRESS"):
+        return response
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "no-transform" in response.headers.get("Cache-Control", "")
+    ):
+        return response
+
+    # Lo que se comprime depende del cliente: los caches deben distinguirlo
+    response.vary.add("Accept-Encoding")
+    if "gzip" not in request.accept_encodings:
+        return response
+
+    body = response.get_data()
+    if len(body) < config["COMPRESS_MIN_SIZE"]:
+        return response
+    packed = gzip.compress(body, compresslevel=config["COMPRESS_LEVEL"], mtime=0)
+    if len(packed) >= len(body):
+        return response
+
+    response.set_data(packed)
+    response.headers["Content-Encoding"] = "gzip"
+    # El cuerpo cambió de bytes: el ETag sólo puede seguir valiendo como débil
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
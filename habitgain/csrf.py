@@ -0,0 +1,68 @@
+"""
+Tokens CSRF sin estado.
+
+Un token es `<bucket>.<hmac>` donde el HMAC (SECRET_KEY) cubre el id de
+sesión, el propósito del formulario y la franja horaria. Se valida sin
+tocar la sesión: los GET ya no reescriben la cookie y el mismo token sirve
+en varias pestañas abiertas.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from typing import Optional
+
+from flask import current_app, session
+
+CSRF_BUCKET_SECONDS = 3600
+CSRF_MAX_AGE_BUCKETS = 12  # un token vale entre 12 y 13 horas
+
+
+def session_id() -> str:
+    """Id aleatorio de la sesión; se fija en el login (o la primera vez que se pide)."""
+    sid = session.get("sid")
+    if not sid:
+        sid = new_session_id()
+    return sid
+
+
+def new_session_id() -> str:
+    sid = secrets.token_urlsafe(16)
+    session["sid"] = sid
+    return sid
+
+
+def _bucket(now: Optional[float] = None) -> int:
+    return int((time.time() if now is None else now) // CSRF_BUCKET_SECONDS)
+
+
+def _mac(secret_key: str, sid: str, purpose: str, bucket: int) -> str:
+    msg = f"{sid}|{purpose}|{bucket}".encode("utf-8")
+    digest = hmac.new(str(secret_key).encode("utf-8"), msg, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def token_for(secret_key: str, sid: str, purpose: str, now: Optional[float] = None) -> str:
+    bucket = _bucket(now)
+    return f"{bucket}.{_mac(secret_key, sid, purpose, bucket)}"
+
+
+def generate_token(purpose: str) -> str:
+    return token_for(current_app.config["SECRET_KEY"], session_id(), purpose)
+
+
+def validate_token(token: Optional[str], purpose: str) -> bool:
+    sid = session.get("sid")
+    if not token or not sid:
+        return False
+    bucket_str, _, mac = token.partition(".")
+    try:
+        bucket = int(bucket_str)
+    except ValueError:
+        return False
+    now = _bucket()
+    if not (now - CSRF_MAX_AGE_BUCKETS <= bucket <= now):
+        return False
+    expected = _mac(current_app.config["SECRET_KEY"], sid, purpose, bucket)
+    return hmac.compare_digest(mac, expected)
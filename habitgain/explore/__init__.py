@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, session, redirect, url_for, abort, flash, request
+from flask import Blueprint, render_template, session, redirect, url_for, abort, flash, request, current_app, g, make_response
 from jinja2 import TemplateNotFound
 from ..models import Category, Habit
+from ..cache import versions
+
+import hashlib
+import json
 
 explore_bp = Blueprint("explore", __name__, template_folder="templates")
 
@@ -91,26 +95,81 @@ def _require_login():
     return "user" in session
 
 
+# ---------- Caché HTTP del catálogo ----------
+# Las páginas de exploración sólo dependen del catálogo (HABIT_CATALOG, las
+# categorías y las plantillas), de los assets con hash que enlaza base.html y
+# de si el usuario es admin (menú). El ETag se calcula sin renderizar, así un
+# 304 no gasta tiempo del worker.
+CATALOG_TEMPLATES = ("home.html", "category.html", "base.html")
+
+
+def _catalog_base_digest() -> bytes:
+    """Hash de lo que sólo cambia con un deploy (se calcula una vez por manifest)."""
+    manifest = current_app.extensions.get("asset_manifest", {})
+    cached = current_app.extensions.get("catalog_digest")
+    if cached is None or cached[0] is not manifest:
+        h = hashlib.sha256(json.dumps(HABIT_CATALOG, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        env = current_app.jinja_env
+        for name in CATALOG_TEMPLATES:
+            try:
+                source, _, _ = env.loader.get_source(env, name)
+            except TemplateNotFound:
+                continue
+            h.update(source.encode("utf-8"))
+        # Un deploy que sólo cambia CSS/JS también cambia las URLs /assets/*.<hash>.*
+        h.update(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+        cached = (manifest, h.digest())
+        current_app.extensions["catalog_digest"] = cached
+    return cached[1]
+
+
+def _catalog_etag(*parts) -> str:
+    h = hashlib.sha256(_catalog_base_digest())
+    h.update(json.dumps(Category.all(), sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    h.update(repr((bool(g.get("is_admin")),) + parts).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _cached_catalog_page(etag: str, render):
+    """Responde 304 si el navegador ya tiene esta versión; si no, renderiza con ETag."""
+    if session.get("_flashes"):
+        # Hay mensajes pendientes: la página no es la del catálogo "puro"
+        return render()
+    # Comparación débil: la compresión convierte el ETag en W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    # private: detrás de login y con menú de admin; no-cache: revalidar siempre
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @explore_bp.route("/")
 def home():
     if not _require_login():
         return redirect(url_for("auth.login"))
-    categories = Category.all()
 
-    # Todos los sugeridos (para el home)
-    all_suggested_habits = []
-    for _, habits in HABIT_CATALOG.items():
-        all_suggested_habits.extend(habits)
+    def render():
+        categories = Category.all()
 
-    # Hábitos del usuario (vacío para el home de exploración)
-    user_habits = []
+        # Todos los sugeridos (para el home)
+        all_suggested_habits = []
+        for _, habits in HABIT_CATALOG.items():
+            all_suggested_habits.extend(habits)
 
-    return render_template(
-        "home.html",
-        categories=categories,
-        habits=user_habits,
-        suggested_habits=all_suggested_habits,
-    )
+        # Hábitos del usuario (vacío para el home de exploración)
+        user_habits = []
+
+        return render_template(
+            "home.html",
+            categories=categories,
+            habits=user_habits,
+            suggested_habits=all_suggested_habits,
+        )
+
+    return _cached_catalog_page(_catalog_etag("home"), render)
 
 
 
@@ -128,14 +187,19 @@ def category(category_id: int):
     if not cat:
         abort(404)
 
-    user_habits = Habit.list_active_by_owner_and_category(email, category_id)
-    suggested_habits = HABIT_CATALOG.get(category_id, [])
-    return render_template(
-        "category.html",
-        category=cat,
-        habits=user_habits,
-        suggested_habits=suggested_habits,
-    )
+    def render():
+        user_habits = Habit.list_active_by_owner_and_category(email, category_id)
+        suggested_habits = HABIT_CATALOG.get(category_id, [])
+        return render_template(
+            "category.html",
+            category=cat,
+            habits=user_habits,
+            suggested_habits=suggested_habits,
+        )
+
+    # La versión del usuario cubre sus hábitos de la categoría
+    etag = _catalog_etag("category", category_id, versions.get(email))
+    return _cached_catalog_page(etag, render)
 
 
 
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from ..models import Habit, Category, Completion
-import secrets
+from ..csrf import generate_token, validate_token
 
 habits_bp = Blueprint("habits", __name__, template_folder="templates")
 
@@ -70,15 +70,13 @@ def create():
         # Resolver categoría por nombre (crear si no existe)
         category_id = None
         if categoria_nombre:
-            cats = Category.all()
-            match = next((c for c in cats if (c.get("name") or "").strip().casefold() == categoria_nombre.casefold()), None)
-            if match:
-                category_id = match.get("id")
-            else:
+            category_id = Category.id_by_name(categoria_nombre)
+            if category_id is None:
                 try:
                     category_id = Category.create(categoria_nombre, None)
                 except Exception:
                     # fallback a primera categoría existente
+                    cats = Category.all()
                     category_id = (cats[0]["id"] if cats else 1)
         else:
             # predeterminada
@@ -263,10 +261,7 @@ def delete(habit_id: int):
 
 # HU-14: Editar hábito
 def _get_csrf_token_edit() -> str:
-    token = secrets.token_urlsafe(32)
-    session["csrf_token_habits_edit"] = token
-    session.modified = True
-    return token
+    return generate_token("habits_edit")
 
 
 @habits_bp.route("/<int:habit_id>/edit", methods=["GET", "POST"])
@@ -286,9 +281,7 @@ def edit(habit_id: int):
 
     if request.method == "POST":
         # CSRF
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token_habits_edit", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "habits_edit"):
             flash("Token CSRF inválido.", "danger")
             return redirect(url_for("habits.edit", habit_id=habit_id))
 
@@ -0,0 +1,137 @@
+"""
+Pool acotado de procesos para el hashing de contraseñas.
+
+PBKDF2 con 200k iteraciones son decenas de ms de CPU por llamada; hecho
+en el hilo de la petición, una ráfaga de logins deja sin CPU al resto de
+peticiones del worker. Aquí el cálculo va a un ProcessPoolExecutor con
+pocos procesos y una cola limitada: si ya hay demasiados hashes en vuelo
+se rechaza al instante con HashPoolSaturated (la vista responde 503) en
+lugar de encolar sin límite.
+
+El pool se crea al primer uso y por proceso (tras el fork de gunicorn
+cada worker tiene el suyo), con contexto "spawn" para no heredar hilos
+ni conexiones del worker.
+
+Configuración por entorno:
+  HABITGAIN_HASH_WORKERS   procesos del pool (0 = hashing en el hilo, sin pool)
+  HABITGAIN_HASH_QUEUE     hashes que pueden esperar además de los que corren
+  HABITGAIN_HASH_TIMEOUT   segundos máximos esperando un resultado
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+class HashPoolSaturated(Exception):
+    """Hay demasiados hashes en vuelo; reintentar más tarde."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class HashPool:
+    def __init__(self, workers: Optional[int] = None, queue_limit: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        cpus = os.cpu_count() or 1
+        self.workers = max(0, workers if workers is not None else _env_int("HABITGAIN_HASH_WORKERS", min(2, cpus)))
+        self.queue_limit = max(0, queue_limit if queue_limit is not None
+                               else _env_int("HABITGAIN_HASH_QUEUE", 4 * max(1, self.workers)))
+        self.timeout = float(timeout if timeout is not None else _env_int("HABITGAIN_HASH_TIMEOUT", 10))
+        self._slots = threading.BoundedSemaphore(max(1, self.workers) + self.queue_limit)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Ejecuta fn(*args) en el pool; HashPoolSaturated si la cola está llena."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashPoolSaturated("password hashing queue is full")
+        with self._lock:
+            self._in_flight += 1
+        future = None
+        try:
+            if self.workers:
+                try:
+                    future = self._get_executor().submit(fn, *args)
+                except BrokenProcessPool:
+                    self._reset()  # se recrea en la próxima llamada; ésta va en el hilo
+            if future is None:
+                result = fn(*args)
+            else:
+                # El cupo se libera cuando el hash termina de verdad, no al dejar de
+                # esperarlo: uno que venció el timeout sigue ocupando un proceso
+                future.add_done_callback(self._release)
+                try:
+                    result = future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise HashPoolSaturated("password hashing timed out")
+                except BrokenProcessPool:
+                    # Un proceso del pool murió: se recrea y esta llamada va en el hilo
+                    self._reset()
+                    result = fn(*args)
+        finally:
+            if future is None:
+                self._release()
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def warm_up(self) -> None:
+        """Arranca los procesos del pool (evita pagar el spawn en el primer login)."""
+        if self.workers:
+            executor = self._get_executor()
+            for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+hash_pool = HashPool()
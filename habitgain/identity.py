@@ -0,0 +1,49 @@
+"""
+Identidad del usuario resuelta una vez por petición.
+
+El rol se guarda en la sesión firmada junto con la versión del alcance
+"role:<email>" con la que se leyó. Mientras esa versión no cambie (la
+publican User.create_user/update_user/delete_user en todos los workers),
+las peticiones no consultan la tabla users para saber si es admin.
+"""
+from typing import Optional
+
+from flask import g, session
+
+from .cache import versions
+from .models import User
+
+
+def role_scope(email: str) -> str:
+    return f"role:{email}"
+
+
+def _role_version(email: str) -> list:
+    # Incluye el email: un rol guardado nunca vale para otro usuario
+    return [email, versions.get(role_scope(email))]
+
+
+def remember_role(email: str, role: Optional[str]) -> None:
+    """Guarda el rol en la sesión (p. ej. al iniciar sesión con el usuario ya leído)."""
+    session["role"] = role or "user"
+    session["role_v"] = _role_version(email)
+
+
+def load_identity() -> None:
+    """Hook `before_request`: deja g.user_email, g.user_role y g.is_admin."""
+    g.user_email = None
+    g.user_role = None
+    g.is_admin = False
+
+    user = session.get("user")
+    email = user.get("email") if isinstance(user, dict) else None
+    if not email:
+        return
+
+    if session.get("role") is None or session.get("role_v") != _role_version(email):
+        row = User.get_by_email(email)
+        remember_role(email, row.get("role") if row else None)
+
+    g.user_email = email
+    g.user_role = session["role"]
+    g.is_admin = g.user_role == "admin"
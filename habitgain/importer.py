@@ -0,0 +1,168 @@
+"""
+Importación masiva de historial de completados (CSV / NDJSON).
+
+Las filas se leen en streaming, se validan por bloques y se insertan con
+executemany en transacciones cortas (una por bloque) para no retener el
+lock de escritura de SQLite. Las rachas materializadas se recalculan una
+sola vez por hábito al terminar, no por fila.
+"""
+import csv
+import json
+import time
+import datetime as _dt
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .cache import invalidate
+from .models import Database, Habit, Completion, User
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+
+def iter_csv_rows(stream: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Filas de un CSV con cabecera: habit_id o habit/habit_name/name, y date."""
+    for row in csv.DictReader(stream):
+        yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+
+
+def iter_ndjson_rows(stream: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Una fila JSON por línea; las líneas vacías se ignoran."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {"_invalid": line[:80]}
+
+
+def iter_rows(stream: Iterable[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """Filas del stream de texto en el formato indicado ("csv" o "ndjson")."""
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    if fmt in ("ndjson", "jsonl"):
+        return iter_ndjson_rows(stream)
+    raise ValueError(f"Formato no soportado: {fmt}")
+
+
+def detect_format(filename: str) -> Optional[str]:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+class _HabitResolver:
+    """Resuelve (habit_id | nombre) a un hábito del usuario sin consultar por fila."""
+
+    def __init__(self, owner_email: str, create_missing: bool):
+        self.owner_email = owner_email
+        self.create_missing = create_missing
+        habits = Habit.list_by_owner(owner_email)
+        self.ids = {int(h["id"]) for h in habits}
+        self.by_name = {(h.get("name") or "").strip().casefold(): int(h["id"]) for h in habits}
+        self.created = 0
+
+    def resolve(self, row: Dict[str, Any]) -> Optional[int]:
+        raw_id = row.get("habit_id")
+        if raw_id not in (None, ""):
+            try:
+                hid = int(raw_id)
+            except (TypeError, ValueError):
+                hid = None
+            if hid in self.ids:
+                return hid
+        # Sin id propio (p. ej. exportación de otra cuenta) se intenta por nombre
+        name = str(row.get("habit") or row.get("habit_name") or row.get("name") or "").strip()
+        if not name:
+            return None
+        hid = self.by_name.get(name.casefold())
+        if hid is None and self.create_missing:
+            hid = Habit.create(self.owner_email, name, "", None)
+            self.ids.add(hid)
+            self.by_name[name.casefold()] = hid
+            self.created += 1
+        return hid
+
+
+def import_completions(owner_email: str, rows: Iterable[Dict[str, Any]], *,
+                       create_missing: bool = False,
+                       chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+    """Importa completados históricos de `owner_email`.
+
+    Retorna un resumen: rows, inserted, duplicates, rejected, habits,
+    created_habits, seconds y los primeros errores de validación.
+    """
+    started = time.perf_counter()
+    today = _dt.date.today()
+    resolver = _HabitResolver(owner_email, create_missing)
+    owner = User.get_by_email(owner_email)
+    user_id = owner["id"] if owner else None  # explícito: el trigger de user_id no corre por fila
+    touched = set()
+    summary = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+
+    db = Database()
+    conn = db.get_connection()
+    try:
+        cur = conn.cursor()
+
+        def reject(line_no: int, reason: str) -> None:
+            summary["rejected"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append(f"fila {line_no}: {reason}")
+
+        def flush(batch: List[tuple]) -> None:
+            if not batch:
+                return
+            cur.executemany(
+                "INSERT OR IGNORE INTO habit_completions (habit_id, owner_email, user_id, date) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            inserted = cur.rowcount  # sin contar lo que escriben los triggers
+            conn.commit()  # una transacción corta por bloque
+            invalidate(owner_email)
+            summary["inserted"] += inserted
+            summary["duplicates"] += len(batch) - inserted
+
+        batch: List[tuple] = []
+        for line_no, row in enumerate(rows, start=1):
+            if row.get("type") not in (None, "", "completion"):
+                continue  # otros registros de una exportación completa
+            summary["rows"] += 1
+            if "_invalid" in row:
+                reject(line_no, "JSON inválido")
+                continue
+            hid = resolver.resolve(row)
+            if hid is None:
+                reject(line_no, "hábito desconocido")
+                continue
+            try:
+                day = _dt.date.fromisoformat(str(row.get("date") or "").strip()[:10])
+            except ValueError:
+                reject(line_no, "fecha inválida")
+                continue
+            if day > today:
+                reject(line_no, "fecha futura")
+                continue
+            batch.append((hid, owner_email, user_id, day.isoformat()))
+            touched.add(hid)
+            if len(batch) >= chunk_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+
+        # Rachas: un recálculo por hábito tocado, al final
+        if touched:
+            Completion._rebuild_streaks(cur, sorted(touched))
+            conn.commit()
+    finally:
+        conn.close()
+
+    summary["habits"] = len(touched)
+    summary["created_habits"] = resolver.created
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
@@ -4,15 +4,42 @@ import os
 import secrets
 import hashlib
 import hmac
+import logging
+import time
+
+from types import MappingProxyType
+
+from .cache import cached, cached_by_id, invalidate, read_cache, versions
+from .hashpool import HashPoolSaturated, hash_pool
 
 DB_NAME = os.environ.get("HABITGAIN_DB", "habitgain.db")
 
+logger = logging.getLogger(__name__)
+
+# Versión del esquema (PRAGMA user_version). Subirla al añadir migraciones en
+# init_db para que create_app las aplique sobre bases de datos existentes.
+SCHEMA_VERSION = 9
+
+# Tablas hijas de users y su columna de email. Desde el esquema 8 cada una
+# tiene además user_id (entero); ver Database._migrate_user_ids.
+USER_ID_TABLES = {
+    "habits": "owner_email",
+    "habit_completions": "owner_email",
+    "daily_progress": "owner_email",
+    "onboarding_status": "user_email",
+}
+USER_ID_MIGRATION = "user_ids"
+MIGRATION_RECHECK_SECONDS = 5.0
+
 
 class Database:
     _wal_enabled = False  # Flag para configurar WAL solo una vez
+    # "bd:migración" -> True si terminó, o momento de la última consulta negativa
+    _migration_checks: Dict[str, Any] = {}
 
-    def __init__(self, db_name: str = DB_NAME):
-        self.db_name = db_name
+    def __init__(self, db_name: Optional[str] = None):
+        # DB_NAME se lee al instanciar (los tests la apuntan a una BD temporal)
+        self.db_name = db_name or DB_NAME
         self._ensure_wal_mode()
 
     def _ensure_wal_mode(self):
@@ -41,6 +68,56 @@ class Database:
         """Alias para compatibilidad"""
         return self.db_name
 
+    def needs_migration(self) -> bool:
+        """True si falta la tabla users o el esquema es anterior a SCHEMA_VERSION."""
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
+            if cur.fetchone() is None:
+                return True
+            (version,) = cur.execute("PRAGMA user_version").fetchone()
+            return int(version) < SCHEMA_VERSION
+        finally:
+            conn.close()
+
+    def migration_done(self, name: str) -> bool:
+        """True si la migración de datos `name` ya terminó (tabla schema_migrations).
+
+        El resultado positivo se recuerda en el worker; el negativo se vuelve
+        a consultar cada MIGRATION_RECHECK_SECONDS (el job puede terminar en
+        otro proceso).
+        """
+        key = f"{self.db_name}:{name}"
+        checked = Database._migration_checks.get(key)
+        if checked is True:
+            return True
+        now = time.monotonic()
+        if checked is not None and now - checked < MIGRATION_RECHECK_SECONDS:
+            return False
+        conn = self.get_connection()
+        try:
+            done = self._migration_recorded(conn, name)
+        finally:
+            conn.close()
+        Database._migration_checks[key] = True if done else now
+        return done
+
+    def _migration_recorded(self, conn: sqlite3.Connection, name: str) -> bool:
+        try:
+            row = conn.execute("SELECT 1 FROM schema_migrations WHERE name=?", (name,)).fetchone()
+        except sqlite3.Error:
+            return False  # BD sin migrar
+        return row is not None
+
+    def record_migration(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO schema_migrations (name, completed_at) VALUES (?, datetime('now'))",
+            (name,),
+        )
+        conn.commit()
+        Database._migration_checks.pop(f"{self.db_name}:{name}", None)
+
     # ---------------------------
     # Init + migraciones seguras
     # ---------------------------
@@ -59,6 +136,17 @@ class Database:
             """
         )
 
+        # Migraciones de datos ya terminadas (ver migration_done)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                completed_at TEXT NOT NULL
+            )
+            """
+        )
+        user_ids_done = self._migration_recorded(conn, USER_ID_MIGRATION)
+
         # CATEGORIES
         cur.execute(
             """
@@ -85,10 +173,12 @@ class Database:
         self._ensure_column(conn, "users", "name", "TEXT")
         self._ensure_column(conn, "users", "password_hash", "TEXT")
         self._ensure_column(conn, "users", "password_salt", "TEXT")
+        self._ensure_column(conn, "users", "password_algo", "TEXT")
+        self._ensure_column(conn, "users", "password_params", "TEXT")
         self._ensure_column(conn, "users", "role", "TEXT DEFAULT 'user'")
         self._maybe_create_index(conn, "users", "idx_users_email", "email")
+        self._ensure_email_nocase_index(conn)
         self._migrate_users_passwords(conn)
-        self._backfill_missing_user_hashes(conn)
 
         # ---- Migraciones habits ----
         self._ensure_column(conn, "habits", "owner_email", "TEXT")
@@ -105,12 +195,14 @@ class Database:
         self._ensure_column(conn, "habits", "habit_base_id", "INTEGER")
 
         self._migrate_owner_email(conn)
-        self._maybe_create_index(
-            conn, "habits", "idx_habits_owner_email", "owner_email")
         self._maybe_create_index(conn, "habits", "idx_habits_active", "active")
-        # Para validación de duplicados eficiente
-        self._maybe_create_index(
-            conn, "habits", "idx_habits_owner_name", "owner_email, name")
+        # Los índices por email sólo hacen falta hasta terminar el relleno de user_id
+        if not user_ids_done:
+            self._maybe_create_index(
+                conn, "habits", "idx_habits_owner_email", "owner_email")
+            # Para validación de duplicados eficiente
+            self._maybe_create_index(
+                conn, "habits", "idx_habits_owner_name", "owner_email, name")
 
         # ---- Tabla de completados (habit_completions) ----
         cur.execute(
@@ -125,7 +217,41 @@ class Database:
             )
             """
         )
-        self._maybe_create_index(conn, "habit_completions", "idx_hc_owner_date", "owner_email")
+        if not user_ids_done:
+            self._maybe_create_index(conn, "habit_completions", "idx_hc_owner_date", "owner_email")
+            # Consultas por rango de fechas (estadísticas agrupadas por hábito)
+            self._maybe_create_index(
+                conn, "habit_completions", "idx_hc_owner_day", "owner_email, date")
+
+        # ---- Rachas materializadas (se mantienen en mark/unmark) ----
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='habit_streaks'")
+        streaks_missing = cur.fetchone() is None
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS habit_streaks (
+                habit_id INTEGER PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                run_start TEXT,
+                run_end TEXT,
+                best_streak INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Histograma de rachas por longitud: permite conocer la mejor racha
+        # tras borrar un día sin recorrer el historial del hábito
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS habit_streak_runs (
+                habit_id INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                runs INTEGER NOT NULL,
+                PRIMARY KEY (habit_id, length)
+            )
+            """
+        )
+        if streaks_missing:
+            Completion._rebuild_streaks(cur)
+        conn.commit()
 
         # ---- Tabla de progreso diario (max planificado por día) ----
         cur.execute(
@@ -157,8 +283,69 @@ class Database:
         )
         self._maybe_create_index(conn, "onboarding_status", "idx_onboarding_email", "user_email")
 
+        # ---- user_id en las tablas hijas (esquema 8) ----
+        self._migrate_user_ids(conn, user_ids_done)
+
+        # Versiones de caché compartidas entre workers (ver habitgain/cache.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                scope TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_cache_versions_version ON cache_versions(version)")
+
+        # Sesiones del lado del servidor (opcional, ver habitgain/sessions.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                user_email TEXT,
+                expires_at INTEGER NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_email)")
+
+        # Cubos de intentos de login compartidos entre workers (ver habitgain/throttle.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS login_throttle (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+        # Tokens "recordarme" selector/validador (ver habitgain/remember.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS remember_tokens (
+                selector TEXT PRIMARY KEY,
+                validator_hash TEXT NOT NULL,
+                previous_hash TEXT,
+                rotated_at INTEGER,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                user_agent TEXT,
+                created_at INTEGER NOT NULL,
+                last_used_at INTEGER,
+                expires_at INTEGER NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_remember_user ON remember_tokens(user_id)")
+
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
         conn.close()
+        read_cache.clear()  # las migraciones pueden cambiar filas ya cacheadas
+        Database._migration_checks.clear()
+        Category._snapshot = None
 
     # ---------- helpers de migración ----------
     def _get_table_columns(self, conn: sqlite3.Connection, table: str) -> List[str]:
@@ -195,59 +382,118 @@ class Database:
                 f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table}({col})")
             conn.commit()
 
-    def _migrate_users_passwords(self, conn: sqlite3.Connection) -> None:
+    def _ensure_email_nocase_index(self, conn: sqlite3.Connection) -> None:
         """
-        Si existen columnas legacy en users, migra a password_hash/password_salt.
-        Legacy posibles: password (plaintext), passwd (plaintext), pwd_hash (hash sin sal).
+        Índice UNIQUE sobre users.email COLLATE NOCASE: Foo@x y foo@x son el
+        mismo usuario y cada búsqueda por email es una sola sonda al índice.
+        Si ya hay duplicados por mayúsculas se crea sin UNIQUE (hay que
+        resolverlos a mano) y se reintenta en la próxima migración.
         """
-        cols = self._get_table_columns(conn, "users")
-        legacy_cols = [c for c in ["password",
-                                   "passwd", "pwd_hash"] if c in cols]
-        if not legacy_cols:
+        dupes = conn.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM users GROUP BY email COLLATE NOCASE HAVING COUNT(*) > 1)"
+        ).fetchone()[0]
+        unique = {r[1]: r[2] for r in conn.execute("PRAGMA index_list(users)").fetchall()}
+        current = unique.get("idx_users_email_nocase")
+        if current is not None and (current or dupes):
             return
-        cur = conn.cursor()
+        if current is not None:
+            conn.execute("DROP INDEX idx_users_email_nocase")
+        if dupes:
+            logger.warning("%d emails duplicados por mayúsculas en users: índice NOCASE sin UNIQUE", dupes)
+        conn.execute(
+            f"CREATE {'' if dupes else 'UNIQUE '}INDEX idx_users_email_nocase ON users(email COLLATE NOCASE)"
+        )
+        conn.commit()
 
-        source = "pwd_hash" if "pwd_hash" in legacy_cols else (
-            "password" if "password" in legacy_cols else "passwd")
+    def _migrate_users_passwords(self, conn: sqlite3.Connection) -> None:
+        """
+        Hashea las contraseñas legacy (pwd_hash / password / passwd) o faltantes.
+        Con pocas filas se hace aquí; con más se deja para
+        `db_tool.py migrate-passwords` (pool de procesos, por lotes, reanudable)
+        para no bloquear el arranque de cada worker.
+        """
+        from .password_migration import INLINE_MIGRATION_LIMIT, migrate_passwords, pending_count
 
-        cur.execute(
-            f"SELECT id, {source} FROM users WHERE (password_hash IS NULL OR password_hash = '')"
-        )
-        rows = cur.fetchall()
-        for r in rows:
-            uid = r["id"]
-            legacy_val = r[source] or ""
-            if not legacy_val:
-                continue
-            pack = _hash_password(legacy_val)
-            cur.execute(
-                "UPDATE users SET password_hash=?, password_salt=? WHERE id=?",
-                (pack["hash"], pack["salt"], uid),
+        pending = pending_count(conn)
+        if not pending:
+            return
+        if pending > INLINE_MIGRATION_LIMIT:
+            logger.warning(
+                "%d usuarios sin hash de contraseña: ejecutar `python db_tool.py migrate-passwords`", pending
             )
-        conn.commit()
+            return
+        migrate_passwords(conn=conn, workers=0)
 
-    def _backfill_missing_user_hashes(self, conn: sqlite3.Connection) -> None:
+    def _migrate_user_ids(self, conn: sqlite3.Connection, done: bool) -> None:
         """
-        A cualquier fila que siga sin password_hash/password_salt le asigna un hash de 'changeme'.
+        Columna user_id (entero) en las tablas de USER_ID_TABLES, que antes
+        sólo se unían a users por el email en texto. Los triggers la
+        mantienen sin tocar el código que inserta, y un cambio de email en
+        users se propaga a las filas del usuario en lugar de dejarlas
+        huérfanas. Las filas existentes se rellenan por lotes: aquí si son
+        pocas, si no con `db_tool.py migrate-user-ids`. Hasta que el relleno
+        termina las consultas siguen filtrando por email (ver _owner_filter).
         """
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id FROM users
-            WHERE (password_hash IS NULL OR password_hash = '')
-               OR (password_salt IS NULL OR password_salt = '')
-            """
-        )
-        rows = cur.fetchall()
-        if not rows:
+        from .user_id_migration import INLINE_BACKFILL_LIMIT, backfill_user_ids, pending_count
+
+        for table in USER_ID_TABLES:
+            self._ensure_column(conn, table, "user_id", "INTEGER REFERENCES users(id)")
+        self._maybe_create_index(conn, "habits", "idx_habits_user_active", "user_id, active")
+        self._maybe_create_index(conn, "habit_completions", "idx_hc_user_day", "user_id, date")
+        self._maybe_create_index(conn, "daily_progress", "idx_dp_user_day", "user_id, date")
+        self._maybe_create_index(conn, "onboarding_status", "idx_onboarding_user", "user_id")
+        self._ensure_user_id_triggers(conn)
+        if done:
             return
-        for r in rows:
-            uid = r["id"]
-            pack = _hash_password("changeme")
-            cur.execute(
-                "UPDATE users SET password_hash=?, password_salt=? WHERE id=?",
-                (pack["hash"], pack["salt"], uid),
+
+        pending = pending_count(conn)
+        if pending > INLINE_BACKFILL_LIMIT:
+            logger.warning(
+                "%d filas sin user_id: ejecutar `python db_tool.py migrate-user-ids`", pending
             )
+            return
+        backfill_user_ids(conn=conn)
+
+    def _ensure_user_id_triggers(self, conn: sqlite3.Connection) -> None:
+        adopt, cascade, detach = [], [], []
+        for table, email_col in USER_ID_TABLES.items():
+            lookup = f"(SELECT id FROM users WHERE email = NEW.{email_col} COLLATE NOCASE)"
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_user_id AFTER INSERT ON {table}
+                WHEN NEW.user_id IS NULL
+                BEGIN
+                    UPDATE {table} SET user_id = {lookup} WHERE id = NEW.id;
+                END
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_owner_change AFTER UPDATE OF {email_col} ON {table}
+                BEGIN
+                    UPDATE {table} SET user_id = {lookup} WHERE id = NEW.id;
+                END
+                """
+            )
+            # Igualdad exacta (los emails se guardan normalizados) para usar el índice por email
+            adopt.append(f"UPDATE {table} SET user_id = NEW.id WHERE user_id IS NULL AND {email_col} = NEW.email;")
+            # OR IGNORE: si ya hay una fila UNIQUE con el email nuevo, la vieja sigue unida por user_id
+            cascade.append(f"UPDATE OR IGNORE {table} SET {email_col} = NEW.email WHERE user_id = NEW.id;")
+            detach.append(f"UPDATE {table} SET user_id = NULL WHERE user_id = OLD.id;")
+        nl = "\n"
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_users_adopt AFTER INSERT ON users BEGIN {nl.join(adopt)} END"
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_users_email_change AFTER UPDATE OF email ON users
+            WHEN NEW.email IS NOT OLD.email
+            BEGIN {nl.join(cascade)} END
+            """
+        )
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_users_detach AFTER DELETE ON users BEGIN {nl.join(detach)} END"
+        )
         conn.commit()
 
     def _migrate_owner_email(self, conn: sqlite3.Connection) -> None:
@@ -305,26 +551,29 @@ class Database:
             cols_users = self._get_table_columns(conn, "users")
             demo_email = "demo@habitgain.local"
 
-            cur.execute("SELECT id FROM users WHERE email = ?", (demo_email,))
+            cur.execute("SELECT id FROM users WHERE email = ? COLLATE NOCASE", (demo_email,))
             row = cur.fetchone()
             if row is None:
                 pack = _hash_password("demo123")
                 if "password" in cols_users:
                     cur.execute(
                         """
-                        INSERT INTO users (email, name, password, password_hash, password_salt, role)
-                        VALUES (?, ?, ?, ?, ?, ?)
+                        INSERT INTO users (email, name, password, password_hash, password_salt,
+                                           password_algo, password_params, role)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                         """,
                         (demo_email, "Usuario Demo", "changeme",
-                         pack["hash"], pack["salt"], "user"),
+                         pack["hash"], pack["salt"], pack["algo"], pack["params"], "user"),
                     )
                 else:
                     cur.execute(
                         """
-                        INSERT INTO users (email, name, password_hash, password_salt, role)
-                        VALUES (?, ?, ?, ?, ?)
+                        INSERT INTO users (email, name, password_hash, password_salt,
+                                           password_algo, password_params, role)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
                         """,
-                        (demo_email, "Usuario Demo", pack["hash"], pack["salt"], "user"),
+                        (demo_email, "Usuario Demo", pack["hash"], pack["salt"],
+                         pack["algo"], pack["params"], "user"),
                     )
                 conn.commit()
         finally:
@@ -380,48 +629,144 @@ class Database:
                 conn.commit()
         finally:
             conn.close()
+        read_cache.clear()
+        Category._snapshot = None
 
 
 # -----------------------
-# Password hashing helpers (PBKDF2+salt)
+# Password hashing helpers (PBKDF2 / scrypt + salt)
 # -----------------------
+# Cada fila de users guarda su algoritmo y parámetros (password_algo /
+# password_params), así el coste se puede subir sin invalidar contraseñas:
+# las filas con parámetros viejos se rehashean al iniciar sesión. Las filas
+# sin metadatos son PBKDF2-SHA256 con _LEGACY_PBKDF_ITER.
 
 _PBKDF_ITER = 200_000
-_ALGO = "sha256"
+_LEGACY_PBKDF_ITER = 200_000
+PBKDF2_ALGO = "pbkdf2_sha256"
+SCRYPT_ALGO = "scrypt"
+_SCRYPT_MAXMEM = 64 * 1024 * 1024
+
+
+def _format_params(params: Dict[str, int]) -> str:
+    return ",".join(f"{k}={v}" for k, v in params.items())
+
+
+def _parse_params(raw: Optional[str]) -> Dict[str, int]:
+    params = {}
+    for part in (raw or "").split(","):
+        key, _, value = part.partition("=")
+        if key and value.isdigit():
+            params[key.strip()] = int(value)
+    return params
+
+
+def _password_policy() -> tuple:
+    """(algoritmo, parámetros) con los que se hashean las contraseñas nuevas."""
+    algo = os.environ.get("HABITGAIN_PASSWORD_ALGO", PBKDF2_ALGO)
+    if algo == SCRYPT_ALGO:
+        return SCRYPT_ALGO, _format_params({
+            "n": int(os.environ.get("HABITGAIN_SCRYPT_N", 2 ** 14)),
+            "r": int(os.environ.get("HABITGAIN_SCRYPT_R", 8)),
+            "p": int(os.environ.get("HABITGAIN_SCRYPT_P", 1)),
+        })
+    return PBKDF2_ALGO, _format_params({"i": int(os.environ.get("HABITGAIN_PBKDF2_ITER", _PBKDF_ITER))})
+
+
+PASSWORD_ALGO, PASSWORD_PARAMS = _password_policy()
+
 
+def _derive(pwd: bytes, salt: bytes, algo: Optional[str], params: Optional[str]) -> bytes:
+    if algo == SCRYPT_ALGO:
+        p = _parse_params(params)
+        return hashlib.scrypt(pwd, salt=salt, n=p["n"], r=p["r"], p=p["p"],
+                              maxmem=_SCRYPT_MAXMEM, dklen=32)
+    if algo in (None, "", PBKDF2_ALGO):
+        iterations = _parse_params(params).get("i", _LEGACY_PBKDF_ITER)
+        return hashlib.pbkdf2_hmac("sha256", pwd, salt, iterations)
+    raise ValueError(f"unknown password algorithm: {algo}")
 
-def _hash_password(password: str, salt: Optional[bytes] = None) -> Dict[str, str]:
+
+def _hash_password(password: str, salt: Optional[bytes] = None,
+                   algo: Optional[str] = None, params: Optional[str] = None) -> Dict[str, str]:
     if salt is None:
         salt = secrets.token_bytes(16)
-    pwd = password.encode("utf-8")
-    dk = hashlib.pbkdf2_hmac(_ALGO, pwd, salt, _PBKDF_ITER)
+    if algo is None:
+        algo, params = PASSWORD_ALGO, PASSWORD_PARAMS
+    dk = _derive(password.encode("utf-8"), salt, algo, params)
     return {
         "salt": salt.hex(),
         "hash": dk.hex(),
-        "algo": _ALGO,
-        "iter": str(_PBKDF_ITER),
+        "algo": algo,
+        "params": params,
     }
 
 
-def _verify_password(password: str, salt_hex: str, expected_hash_hex: str) -> bool:
+def _verify_password(password: str, salt_hex: str, expected_hash_hex: str,
+                     algo: Optional[str] = None, params: Optional[str] = None) -> bool:
     salt = bytes.fromhex(salt_hex)
-    pwd = password.encode("utf-8")
-    dk = hashlib.pbkdf2_hmac(_ALGO, pwd, salt, _PBKDF_ITER)
+    dk = _derive(password.encode("utf-8"), salt, algo, params)
     return hmac.compare_digest(dk.hex(), expected_hash_hex)
 
 
+def _needs_rehash(algo: Optional[str], params: Optional[str]) -> bool:
+    """True si la fila no usa el algoritmo/parámetros actuales."""
+    return (algo or PBKDF2_ALGO) != PASSWORD_ALGO or \
+        _parse_params(params or f"i={_LEGACY_PBKDF_ITER}") != _parse_params(PASSWORD_PARAMS)
+
+
+# Variantes para peticiones web: el cálculo va al pool acotado de procesos
+# (puede lanzar HashPoolSaturated). init_db y los scripts usan las de arriba.
+def _pooled_hash_password(password: str) -> Dict[str, str]:
+    return hash_pool.run(_hash_password, password, None, PASSWORD_ALGO, PASSWORD_PARAMS)
+
+
+def _pooled_verify_password(password: str, user: Dict[str, Any]) -> bool:
+    return hash_pool.run(
+        _verify_password, password, user["password_salt"], user["password_hash"],
+        user.get("password_algo"), user.get("password_params"),
+    )
+
+
 # -----------------------
 # User: helper CRUD
 # -----------------------
 
+def normalize_email(email: Optional[str]) -> str:
+    """Forma canónica de un email (se guarda así; las búsquedas usan COLLATE NOCASE)."""
+    return (email or "").strip().lower()
+
+
+class DuplicateEmailError(Exception):
+    """El email ya está registrado (violación del UNIQUE de users.email)."""
+
+    def __init__(self, email: str):
+        super().__init__(f"email already registered: {email}")
+        self.email = email
+        self.field = "email"
+        self.code = "duplicate_email"
+
+
+USER_FIELDS = ("id", "email", "name", "password_hash", "password_salt",
+               "password_algo", "password_params", "role")
+
+
+def _user_email(cur: sqlite3.Cursor, user_id: int) -> Optional[str]:
+    """Email actual de un usuario (para invalidar su caché al escribir por id)."""
+    cur.execute("SELECT email FROM users WHERE id=?", (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
 class User:
     @staticmethod
     def ensure_exists(email: str, name: str, provisional_password: str = "changeme") -> None:
+        email = normalize_email(email)
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
-            cur.execute("SELECT id FROM users WHERE email=?", (email,))
+            cur.execute("SELECT id FROM users WHERE email=? COLLATE NOCASE", (email,))
             row = cur.fetchone()
             if row is None:
                 pack = _hash_password(provisional_password)
@@ -430,31 +775,43 @@ class User:
                 if "password" in cols_users:
                     cur.execute(
                         """
-                        INSERT INTO users (email, name, password, password_hash, password_salt, role)
-                        VALUES (?, ?, ?, ?, ?, ?)
+                        INSERT INTO users (email, name, password, password_hash, password_salt,
+                                           password_algo, password_params, role)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                         """,
-                        (email, name, "changeme", pack["hash"], pack["salt"], "user"),
+                        (email, name, "changeme", pack["hash"], pack["salt"], pack["algo"], pack["params"], "user"),
                     )
                 else:
                     cur.execute(
-                        "INSERT INTO users (email, name, password_hash, password_salt, role) VALUES (?, ?, ?, ?, ?)",
-                        (email, name, pack["hash"], pack["salt"], "user"),
+                        """
+                        INSERT INTO users (email, name, password_hash, password_salt, password_algo, password_params, role)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (email, name, pack["hash"], pack["salt"], pack["algo"], pack["params"], "user"),
                     )
                 conn.commit()
+                invalidate(email, f"role:{email}")
         finally:
             conn.close()
 
 
     @staticmethod
     def get_by_email(email: str) -> Optional[Dict[str, Any]]:
+        return User._get_by_email(normalize_email(email))
+
+    @staticmethod
+    @cached("users.by_email")
+    def _get_by_email(email: str) -> Optional[Dict[str, Any]]:
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
-            cur.execute(
-                "SELECT id, email, name, password_hash, password_salt, role FROM users WHERE email=?", (email,))
+            # SELECT *: tolera bases aún sin las columnas password_algo/params
+            cur.execute("SELECT * FROM users WHERE email=? COLLATE NOCASE", (email,))
             row = cur.fetchone()
-            return dict(row) if row else None
+            if row is None:
+                return None
+            return {k: row[k] for k in row.keys() if k in USER_FIELDS}
         finally:
             conn.close()
 
@@ -487,41 +844,98 @@ class User:
     @staticmethod
     def create_user(email: str, name: str, password: str, role: str = "user") -> int:
         """HU-16: Crear usuario desde panel admin"""
+        email = normalize_email(email)
+        # Hash antes de abrir la conexión: no retener la BD mientras se calcula
+        pack = _pooled_hash_password(password)
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
-            pack = _hash_password(password)
             cols_users = db._get_table_columns(conn, "users")
 
             if "password" in cols_users:
                 cur.execute(
-                    "INSERT INTO users (email, name, password, password_hash, password_salt, role) VALUES (?, ?, ?, ?, ?, ?)",
-                    (email, name, "changeme", pack["hash"], pack["salt"], role),
+                    """
+                    INSERT INTO users (email, name, password, password_hash, password_salt,
+                                       password_algo, password_params, role)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (email, name, "changeme", pack["hash"], pack["salt"], pack["algo"], pack["params"], role),
                 )
             else:
                 cur.execute(
-                    "INSERT INTO users (email, name, password_hash, password_salt, role) VALUES (?, ?, ?, ?, ?)",
-                    (email, name, pack["hash"], pack["salt"], role),
+                    """
+                    INSERT INTO users (email, name, password_hash, password_salt, password_algo, password_params, role)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (email, name, pack["hash"], pack["salt"], pack["algo"], pack["params"], role),
                 )
             conn.commit()
+            invalidate(email, f"role:{email}")
             new_id = cur.lastrowid
             return int(new_id)
         finally:
             conn.close()
 
+    @staticmethod
+    def register(email: str, name: str, password: str, role: str = "user") -> int:
+        """
+        Alta de usuario en una sola transacción: fila en users + onboarding_status.
+        Sin chequeo previo: el UNIQUE de users.email decide, así dos altas
+        simultáneas del mismo email no pueden pasar las dos. Lanza
+        DuplicateEmailError si el email ya existe (sin importar mayúsculas).
+        """
+        email = normalize_email(email)
+        pack = _pooled_hash_password(password)
+        db = Database()
+        conn = db.get_connection()
+        try:
+            cur = conn.cursor()
+            legacy = "password" in db._get_table_columns(conn, "users")
+            try:
+                cur.execute(
+                    f"""
+                    INSERT INTO users (email, name, {"password, " if legacy else ""}password_hash, password_salt,
+                                       password_algo, password_params, role)
+                    VALUES (?, ?, {"'changeme', " if legacy else ""}?, ?, ?, ?, ?)
+                    """,
+                    (email, name, pack["hash"], pack["salt"], pack["algo"], pack["params"], role),
+                )
+            except sqlite3.IntegrityError as e:
+                conn.rollback()
+                if "UNIQUE" in str(e):
+                    raise DuplicateEmailError(email) from e
+                raise
+            user_id = int(cur.lastrowid)
+            cur.execute(
+                """
+                INSERT OR IGNORE INTO onboarding_status
+                (user_email, completed, current_step, skipped, steps_completed)
+                VALUES (?, 0, 0, 0, '')
+                """,
+                (email,),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        invalidate(email, f"role:{email}")
+        return user_id
+
     @staticmethod
     def update_user(user_id: int, email: str, name: str, role: str) -> None:
         """HU-16: Actualizar usuario desde panel admin"""
+        email = normalize_email(email)
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            old_email = normalize_email(_user_email(cur, user_id))
             cur.execute(
                 "UPDATE users SET email=?, name=?, role=? WHERE id=?",
                 (email, name, role, user_id),
             )
             conn.commit()
+            invalidate(old_email, email, f"role:{old_email}", f"role:{email}")
         finally:
             conn.close()
 
@@ -532,8 +946,11 @@ class User:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            email = normalize_email(_user_email(cur, user_id))
+            cur.execute("DELETE FROM remember_tokens WHERE user_id=?", (user_id,))
             cur.execute("DELETE FROM users WHERE id=?", (user_id,))
             conn.commit()
+            invalidate(email, f"role:{email}")
         finally:
             conn.close()
 
@@ -543,74 +960,150 @@ class User:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
-            cur.execute("UPDATE users SET name=? WHERE email=?", (new_name, email))
+            cur.execute("UPDATE users SET name=? WHERE email=? COLLATE NOCASE", (new_name, email))
             conn.commit()
+            invalidate(normalize_email(email))
         finally:
             conn.close()
 
     @staticmethod
     def update_password(email: str, new_password: str) -> None:
-        pack = _hash_password(new_password)
+        pack = _pooled_hash_password(new_password)
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
             cur.execute(
-                "UPDATE users SET password_hash=?, password_salt=? WHERE email=?",
-                (pack["hash"], pack["salt"], email),
+                """
+                UPDATE users SET password_hash=?, password_salt=?, password_algo=?, password_params=?
+                WHERE email=? COLLATE NOCASE
+                """,
+                (pack["hash"], pack["salt"], pack["algo"], pack["params"], email),
             )
             conn.commit()
+            invalidate(normalize_email(email))
         finally:
             conn.close()
 
     @staticmethod
     def check_password(email: str, password: str) -> bool:
         user = User.get_by_email(email)
-        if not user:
+        if not user or not user.get("password_hash") or not user.get("password_salt"):
             return False
-        return _verify_password(password, user["password_salt"], user["password_hash"])
+        return _pooled_verify_password(password, user)
 
     @staticmethod
     def verify_password(email: str, password: str) -> Optional[Dict[str, Any]]:
         """Verifica credenciales y retorna el usuario si son correctas, None si no"""
         user = User.get_by_email(email)
-        if not user:
+        # Sin hash todavía (migración legacy pendiente): no puede iniciar sesión
+        if not user or not user.get("password_hash") or not user.get("password_salt"):
             return None
-        if _verify_password(password, user["password_salt"], user["password_hash"]):
+        if _pooled_verify_password(password, user):
+            if _needs_rehash(user.get("password_algo"), user.get("password_params")):
+                User._rehash(user, password)
             return user
         return None
 
+    @staticmethod
+    def _rehash(user: Dict[str, Any], password: str) -> bool:
+        """Re-hashea con la política actual (sólo si nadie cambió el hash mientras tanto)."""
+        try:
+            pack = _pooled_hash_password(password)
+        except HashPoolSaturated:
+            return False  # se reintenta en el próximo login
+        db = Database()
+        conn = db.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE users SET password_hash=?, password_salt=?, password_algo=?, password_params=?
+                WHERE id=? AND password_hash=?
+                """,
+                (pack["hash"], pack["salt"], pack["algo"], pack["params"], user["id"], user["password_hash"]),
+            )
+            conn.commit()
+            updated = cur.rowcount == 1
+        finally:
+            conn.close()
+        if updated:
+            invalidate(normalize_email(user["email"]))
+        return updated
+
+
+def _owner_filter(email: str, email_column: str = "owner_email", alias: str = "",
+                  param: str = "?") -> tuple:
+    """
+    (condición SQL, valor) para filtrar las filas de un usuario en las tablas hijas.
+
+    Con el relleno de user_id terminado se filtra por el entero (índices más
+    chicos y estables ante cambios de email); las filas de un email sin
+    cuenta tienen user_id NULL y se buscan dentro de ese grupo, también por
+    el índice de user_id. Antes del relleno se filtra por email.
+    """
+    if Database().migration_done(USER_ID_MIGRATION):
+        user = User.get_by_email(email)
+        if user is not None:
+            return f"{alias}user_id = {param}", user["id"]
+        return f"{alias}user_id IS NULL AND {alias}{email_column} = {param}", email
+    return f"{alias}{email_column} = {param}", email
+
 
 # -----------------------
 # Category: helper CRUD
 # -----------------------
 
 class Category:
+    """Catálogo de categorías servido desde una foto inmutable en memoria.
+
+    Las categorías casi nunca cambian: se cargan una vez por worker y la
+    foto se descarta cuando cambia la versión del alcance "categories"
+    (create/delete la publican para todos los workers).
+    """
+
+    _SCOPE = "categories"
+    _snapshot: Optional[Dict[str, Any]] = None
+
     @staticmethod
-    def all() -> List[Dict[str, Any]]:
+    def _catalog() -> Dict[str, Any]:
+        snap = Category._snapshot
+        version = versions.get(Category._SCOPE)
+        if snap is not None and snap["version"] == version:
+            return snap
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
             cur.execute("SELECT id, name, icon FROM categories ORDER BY name ASC")
-            rows = cur.fetchall()
-            return [dict(r) for r in rows]
+            rows = tuple(MappingProxyType(dict(r)) for r in cur.fetchall())
         finally:
             conn.close()
+        snap = {
+            "version": version,
+            "rows": rows,
+            "by_id": MappingProxyType({int(r["id"]): r for r in rows}),
+            "by_name": MappingProxyType({(r["name"] or "").strip().casefold(): int(r["id"]) for r in rows}),
+        }
+        Category._snapshot = snap
+        return snap
 
+    @staticmethod
+    def all() -> List[Dict[str, Any]]:
+        return [dict(r) for r in Category._catalog()["rows"]]
 
     @staticmethod
     def get_by_id(category_id: int) -> Optional[Dict[str, Any]]:
-        db = Database()
-        conn = db.get_connection()
         try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, name, icon FROM categories WHERE id=?", (category_id,))
-            row = cur.fetchone()
-            return dict(row) if row else None
-        finally:
-            conn.close()
+            row = Category._catalog()["by_id"].get(int(category_id))
+        except (TypeError, ValueError):
+            return None
+        return dict(row) if row else None
+
+    @staticmethod
+    def id_by_name(name: str) -> Optional[int]:
+        """Id de la categoría con ese nombre (case/espacios-insensible), sin consultar la BD."""
+        return Category._catalog()["by_name"].get((name or "").strip().casefold())
 
     @staticmethod
     def create(name: str, icon: Optional[str] = None) -> int:
@@ -621,6 +1114,7 @@ class Category:
             cur.execute(
                 "INSERT INTO categories (name, icon) VALUES (?, ?)", (name, icon))
             conn.commit()
+            invalidate(Category._SCOPE)
             new_id = cur.lastrowid
             return int(new_id)
         finally:
@@ -634,6 +1128,7 @@ class Category:
             cur = conn.cursor()
             cur.execute("DELETE FROM categories WHERE id=?", (category_id,))
             conn.commit()
+            invalidate(Category._SCOPE)
         finally:
             conn.close()
 
@@ -642,21 +1137,30 @@ class Category:
 # Habit: helper CRUD
 # -----------------------
 
+def _habit_owner(cur: sqlite3.Cursor, habit_id: int) -> Optional[str]:
+    """Dueño actual de un hábito (para invalidar su caché al escribir por id)."""
+    cur.execute("SELECT owner_email FROM habits WHERE id=?", (habit_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
 class Habit:
     @staticmethod
+    @cached("habits.by_owner")
     def list_by_owner(email: str) -> List[Dict[str, Any]]:
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(email)
             cur.execute(
-                """
+                f"""
                 SELECT id, owner_email, name, active, short_desc, category_id, frequency, habit_base_id
                 FROM habits
-                WHERE owner_email=?
+                WHERE {owner}
                 ORDER BY id DESC
                 """,
-                (email,),
+                (key,),
             )
             rows = cur.fetchall()
             return [dict(r) for r in rows]
@@ -664,19 +1168,21 @@ class Habit:
             conn.close()
 
     @staticmethod
+    @cached("habits.active_by_owner")
     def list_active_by_owner(email: str) -> List[Dict[str, Any]]:
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(email)
             cur.execute(
-                """
+                f"""
                 SELECT id, owner_email, name, active, short_desc, category_id, frequency, habit_base_id
                 FROM habits
-                WHERE owner_email=? AND active=1
+                WHERE {owner} AND active=1
                 ORDER BY id DESC
                 """,
-                (email,),
+                (key,),
             )
             rows = cur.fetchall()
             return [dict(r) for r in rows]
@@ -684,6 +1190,7 @@ class Habit:
             conn.close()
 
     @staticmethod
+    @cached_by_id("habits.by_id")
     def get_by_id(habit_id: int) -> Optional[Dict[str, Any]]:
         db = Database()
         conn = db.get_connection()
@@ -708,8 +1215,9 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(email)
             cur.execute(
-                "SELECT COUNT(*) AS c FROM habits WHERE owner_email=? AND active=1", (email,))
+                f"SELECT COUNT(*) AS c FROM habits WHERE {owner} AND active=1", (key,))
             row = cur.fetchone()
             return int(row["c"] if row else 0)
         finally:
@@ -722,15 +1230,16 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(email)
             cur.execute(
-                """
+                f"""
                 SELECT 1
                   FROM habits
-                 WHERE owner_email = ?
+                 WHERE {owner}
                    AND lower(trim(name)) = lower(trim(?))
                  LIMIT 1
                 """,
-                (email, name),
+                (key, name),
             )
             return cur.fetchone() is not None
         finally:
@@ -749,6 +1258,7 @@ class Habit:
                 (email, name, short_desc or "", category_id or 1, frequency or "daily", frequency_detail or "", "", "", icon or "🎯", habit_base_id),
             )
             conn.commit()
+            invalidate(email)
             # Forzar un checkpoint ligero para liberar el WAL y evitar locks
             try:
                 conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
@@ -765,9 +1275,11 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner = _habit_owner(cur, habit_id)
             cur.execute("UPDATE habits SET active=? WHERE id=?",
                         (1 if active else 0, habit_id))
             conn.commit()
+            invalidate(owner)
         finally:
             conn.close()
 
@@ -777,8 +1289,12 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner = _habit_owner(cur, habit_id)
             cur.execute("DELETE FROM habits WHERE id=?", (habit_id,))
+            cur.execute("DELETE FROM habit_streaks WHERE habit_id=?", (habit_id,))
+            cur.execute("DELETE FROM habit_streak_runs WHERE habit_id=?", (habit_id,))
             conn.commit()
+            invalidate(owner)
         finally:
             conn.close()
 
@@ -788,15 +1304,17 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 UPDATE habits
                    SET name=?, short_desc=?, frequency=?, category_id=?, habit_base_id=?
-                 WHERE id=? AND owner_email=?
+                 WHERE id=? AND {owner}
                 """,
-                (name, short_desc, frequency, category_id, habit_base_id, habit_id, owner_email),
+                (name, short_desc, frequency, category_id, habit_base_id, habit_id, key),
             )
             conn.commit()
+            invalidate(owner_email)
             return int(cur.rowcount or 0)
         finally:
             conn.close()
@@ -807,14 +1325,15 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(email)
             cur.execute(
-                """
+                f"""
                 SELECT id, owner_email, name, active, short_desc, category_id
                 FROM habits
-                WHERE owner_email=? AND active=1 AND (category_id = ?)
+                WHERE {owner} AND active=1 AND (category_id = ?)
                 ORDER BY id DESC
                 """,
-                (email, category_id),
+                (key, category_id),
             )
             rows = cur.fetchall()
             return [dict(r) for r in rows]
@@ -847,6 +1366,7 @@ class Habit:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            old_owner = _habit_owner(cur, habit_id)
             cur.execute(
                 """
                 UPDATE habits
@@ -856,6 +1376,7 @@ class Habit:
                 (name, short_desc, owner_email, 1 if active else 0, habit_id),
             )
             conn.commit()
+            invalidate(old_owner, owner_email)
             return int(cur.rowcount or 0)
         finally:
             conn.close()
@@ -877,9 +1398,10 @@ class DailyProgress:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                "SELECT planned_total_max FROM daily_progress WHERE owner_email=? AND date=?",
-                (owner_email, date_str),
+                f"SELECT planned_total_max FROM daily_progress WHERE {owner} AND date=?",
+                (key, date_str),
             )
             row = cur.fetchone()
             if row is None:
@@ -894,8 +1416,8 @@ class DailyProgress:
             if current_active_total > planned:
                 planned = int(current_active_total)
                 cur.execute(
-                    "UPDATE daily_progress SET planned_total_max=? WHERE owner_email=? AND date=?",
-                    (planned, owner_email, date_str),
+                    f"UPDATE daily_progress SET planned_total_max=? WHERE {owner} AND date=?",
+                    (planned, key, date_str),
                 )
                 conn.commit()
             return planned
@@ -919,7 +1441,8 @@ def count_active_habits_from_db(email: str) -> int:
 
 class Completion:
     @staticmethod
-    def mark_completed(habit_id: int, owner_email: str, date_str: Optional[str] = None) -> None:
+    def mark_completed(habit_id: int, owner_email: str, date_str: Optional[str] = None) -> bool:
+        """Marca el hábito como completado. Retorna False si no es de owner_email."""
         import datetime as _dt
         db = Database()
         conn = db.get_connection()
@@ -927,6 +1450,10 @@ class Completion:
             if not date_str:
                 date_str = _dt.date.today().isoformat()
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
+            cur.execute(f"SELECT 1 FROM habits WHERE id=? AND {owner}", (habit_id, key))
+            if cur.fetchone() is None:
+                return False
             cur.execute(
                 """
                 INSERT OR IGNORE INTO habit_completions (habit_id, owner_email, date)
@@ -934,24 +1461,67 @@ class Completion:
                 """,
                 (habit_id, owner_email, date_str),
             )
+            if cur.rowcount == 1:
+                Completion._streak_after_mark(cur, habit_id, date_str)
             conn.commit()
+            invalidate(owner_email)
+            return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def unmark(habit_id: int, owner_email: str, date_str: Optional[str] = None) -> bool:
+        """Deshace un completado (por defecto el de hoy).
+
+        Borra la fila y ajusta la racha materializada en la misma transacción,
+        sin recorrer el historial. Retorna False si no había nada que deshacer.
+        """
+        import datetime as _dt
+        if not date_str:
+            date_str = _dt.date.today().isoformat()
+        db = Database()
+        conn = db.get_connection()
+        try:
+            cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
+            cur.execute(
+                f"SELECT 1 FROM habit_completions WHERE habit_id=? AND {owner} AND date=?",
+                (habit_id, key, date_str),
+            )
+            if cur.fetchone() is None:
+                return False
+            # Límites de la racha antes de borrar el día
+            run_start, run_end = Completion._run_bounds(cur, habit_id, date_str)
+            cur.execute(
+                "DELETE FROM habit_completions WHERE habit_id=? AND date=?",
+                (habit_id, date_str),
+            )
+            Completion._streak_after_unmark(cur, habit_id, date_str, run_start, run_end)
+            conn.commit()
+            invalidate(owner_email)
+            return True
         finally:
             conn.close()
 
     @staticmethod
     def completed_today_ids(owner_email: str) -> List[int]:
         import datetime as _dt
+        return Completion.completed_ids_on(owner_email, _dt.date.today().isoformat())
+
+    @staticmethod
+    @cached("completions.ids_on")
+    def completed_ids_on(owner_email: str, date_str: str) -> List[int]:
         db = Database()
         conn = db.get_connection()
         try:
             cur = conn.cursor()
-            today = _dt.date.today().isoformat()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 SELECT habit_id FROM habit_completions
-                WHERE owner_email=? AND date=?
+                WHERE {owner} AND date=?
                 """,
-                (owner_email, today),
+                (key, date_str),
             )
             rows = cur.fetchall()
             return [int(r[0]) for r in rows]
@@ -964,12 +1534,13 @@ class Completion:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 SELECT COUNT(*) AS c FROM habit_completions
-                WHERE owner_email=? AND date BETWEEN ? AND ?
+                WHERE {owner} AND date BETWEEN ? AND ?
                 """,
-                (owner_email, start_date, end_date),
+                (key, start_date, end_date),
             )
             (c,) = cur.fetchone()
             return int(c or 0)
@@ -982,12 +1553,13 @@ class Completion:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 SELECT COUNT(DISTINCT date) AS c FROM habit_completions
-                WHERE owner_email=? AND date BETWEEN ? AND ?
+                WHERE {owner} AND date BETWEEN ? AND ?
                 """,
-                (owner_email, start_date, end_date),
+                (key, start_date, end_date),
             )
             (c,) = cur.fetchone()
             return int(c or 0)
@@ -1004,14 +1576,15 @@ class Completion:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 SELECT DISTINCT date
                 FROM habit_completions
-                WHERE owner_email=? AND date BETWEEN ? AND ?
+                WHERE {owner} AND date BETWEEN ? AND ?
                 ORDER BY date ASC
                 """,
-                (owner_email, start_date, end_date),
+                (key, start_date, end_date),
             )
             rows = cur.fetchall()
             return [r["date"] for r in rows]
@@ -1032,13 +1605,14 @@ class Completion:
             cur = conn.cursor()
 
             # Obtener todas las fechas de completado para este hábito, ordenadas descendentemente
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 SELECT date FROM habit_completions
-                WHERE habit_id=? AND owner_email=?
+                WHERE habit_id=? AND {owner}
                 ORDER BY date DESC
                 """,
-                (habit_id, owner_email),
+                (habit_id, key),
             )
             rows = cur.fetchall()
 
@@ -1076,13 +1650,14 @@ class Completion:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
             cur.execute(
-                """
+                f"""
                 SELECT date FROM habit_completions
-                WHERE habit_id=? AND owner_email=?
+                WHERE habit_id=? AND {owner}
                 ORDER BY date ASC
                 """,
-                (habit_id, owner_email),
+                (habit_id, key),
             )
             rows = cur.fetchall()
             if not rows:
@@ -1103,18 +1678,317 @@ class Completion:
             conn.close()
 
     @staticmethod
-    def calculate_strength(habit_id: int, owner_email: str) -> Dict[str, Any]:
+    def streaks_by_owner(owner_email: str, today: Optional[str] = None) -> Dict[int, Dict[str, int]]:
+        """Racha actual y mejor racha de todos los hábitos del usuario en una sola consulta.
+
+        Lee la tabla habit_streaks (mantenida en mark/unmark) y devuelve
+        {habit_id: {"current": int, "best": int}}. Mismo criterio que
+        get_current_streak: la racha actual cuenta desde hoy hacia atrás.
         """
-        Calcula la fortaleza de un hábito basado en la racha de cumplimiento.
+        import datetime as _dt
+        if not today:
+            today = _dt.date.today().isoformat()
+        db = Database()
+        conn = db.get_connection()
+        try:
+            cur = conn.cursor()
+            owner, key = _owner_filter(owner_email, alias="h.", param=":owner")
+            cur.execute(
+                f"""
+                SELECT s.habit_id, s.best_streak,
+                       CASE WHEN s.run_start <= :today AND s.run_end >= :today
+                            THEN CAST(julianday(:today) - julianday(s.run_start) AS INTEGER) + 1
+                            ELSE 0 END AS current
+                FROM habit_streaks s
+                JOIN habits h ON h.id = s.habit_id
+                WHERE {owner}
+                """,
+                {"owner": key, "today": today},
+            )
+            return {
+                int(r["habit_id"]): {"current": int(r["current"] or 0), "best": int(r["best_streak"] or 0)}
+                for r in cur.fetchall()
+            }
+        finally:
+            conn.close()
 
-        Retorna:
-            - streak: racha actual (días consecutivos)
-            - strength: nivel de fortaleza (0-100)
-            - level: nivel descriptivo (débil, en desarrollo, fuerte, inquebrantable)
-            - color: color para representación visual
+    # ---------- rachas materializadas (habit_streaks / habit_streak_runs) ----------
+    @staticmethod
+    def _run_bounds(cur: sqlite3.Cursor, habit_id: int, date_str: str) -> tuple:
+        """(inicio, fin) de la racha que contiene date_str.
+
+        Recorre solo los días contiguos usando el índice UNIQUE(habit_id, date).
+        """
+        cur.execute(
+            """
+            WITH RECURSIVE back(d) AS (
+                SELECT :d
+                UNION ALL
+                SELECT date(d, '-1 day') FROM back
+                WHERE EXISTS (SELECT 1 FROM habit_completions
+                              WHERE habit_id = :h AND date = date(back.d, '-1 day'))
+            ), fwd(d) AS (
+                SELECT :d
+                UNION ALL
+                SELECT date(d, '+1 day') FROM fwd
+                WHERE EXISTS (SELECT 1 FROM habit_completions
+                              WHERE habit_id = :h AND date = date(fwd.d, '+1 day'))
+            )
+            SELECT (SELECT MIN(d) FROM back), (SELECT MAX(d) FROM fwd)
+            """,
+            {"h": habit_id, "d": date_str},
+        )
+        start, end = cur.fetchone()
+        return start, end
+
+    @staticmethod
+    def _days_between(start: str, end: str) -> int:
+        import datetime as _dt
+        return (_dt.date.fromisoformat(end) - _dt.date.fromisoformat(start)).days
+
+    @staticmethod
+    def _bump_run_length(cur: sqlite3.Cursor, habit_id: int, length: int, delta: int) -> None:
+        if length <= 0:
+            return
+        cur.execute(
+            """
+            INSERT INTO habit_streak_runs (habit_id, length, runs) VALUES (?, ?, ?)
+            ON CONFLICT(habit_id, length) DO UPDATE SET runs = runs + excluded.runs
+            """,
+            (habit_id, length, delta),
+        )
+        if delta < 0:
+            cur.execute(
+                "DELETE FROM habit_streak_runs WHERE habit_id=? AND length=? AND runs <= 0",
+                (habit_id, length),
+            )
+
+    @staticmethod
+    def _best_run_length(cur: sqlite3.Cursor, habit_id: int) -> int:
+        cur.execute("SELECT MAX(length) FROM habit_streak_runs WHERE habit_id=?", (habit_id,))
+        (best,) = cur.fetchone()
+        return int(best or 0)
+
+    @staticmethod
+    def _streak_after_mark(cur: sqlite3.Cursor, habit_id: int, date_str: str) -> None:
+        """Actualiza la racha materializada tras insertar date_str."""
+        cur.execute("SELECT run_end FROM habit_streaks WHERE habit_id=?", (habit_id,))
+        row = cur.fetchone()
+        if row is None:
+            Completion._rebuild_streaks(cur, [habit_id])
+            return
+        run_start, run_end = Completion._run_bounds(cur, habit_id, date_str)
+        # El nuevo día une (o alarga) las rachas vecinas
+        Completion._bump_run_length(cur, habit_id, Completion._days_between(run_start, date_str), -1)
+        Completion._bump_run_length(cur, habit_id, Completion._days_between(date_str, run_end), -1)
+        Completion._bump_run_length(cur, habit_id, Completion._days_between(run_start, run_end) + 1, 1)
+        latest_end = row["run_end"]
+        if latest_end is None or run_end >= latest_end:
+            cur.execute(
+                "UPDATE habit_streaks SET run_start=?, run_end=? WHERE habit_id=?",
+                (run_start, run_end, habit_id),
+            )
+        cur.execute(
+            "UPDATE habit_streaks SET total = total + 1, best_streak=? WHERE habit_id=?",
+            (Completion._best_run_length(cur, habit_id), habit_id),
+        )
+
+    @staticmethod
+    def _streak_after_unmark(cur: sqlite3.Cursor, habit_id: int, date_str: str, run_start: str, run_end: str) -> None:
+        """Actualiza la racha materializada tras borrar date_str de la racha [run_start, run_end]."""
+        import datetime as _dt
+        cur.execute("SELECT run_start, run_end FROM habit_streaks WHERE habit_id=?", (habit_id,))
+        row = cur.fetchone()
+        if row is None:
+            Completion._rebuild_streaks(cur, [habit_id])
+            return
+        # La racha se parte en dos trozos (que pueden quedar vacíos)
+        Completion._bump_run_length(cur, habit_id, Completion._days_between(run_start, run_end) + 1, -1)
+        Completion._bump_run_length(cur, habit_id, Completion._days_between(run_start, date_str), 1)
+        Completion._bump_run_length(cur, habit_id, Completion._days_between(date_str, run_end), 1)
+
+        latest_start, latest_end = row["run_start"], row["run_end"]
+        if run_end == latest_end:
+            day = _dt.date.fromisoformat(date_str)
+            if date_str < run_end:
+                latest_start = (day + _dt.timedelta(days=1)).isoformat()
+            elif date_str > run_start:
+                latest_end = (day - _dt.timedelta(days=1)).isoformat()
+            else:
+                # Era una racha de un día: la última pasa a ser la anterior
+                cur.execute(
+                    "SELECT MAX(date) FROM habit_completions WHERE habit_id=? AND date < ?",
+                    (habit_id, date_str),
+                )
+                (prev,) = cur.fetchone()
+                if prev is None:
+                    latest_start = latest_end = None
+                else:
+                    latest_start, latest_end = Completion._run_bounds(cur, habit_id, prev)
+        cur.execute(
+            """
+            UPDATE habit_streaks
+               SET total = MAX(0, total - 1), run_start=?, run_end=?, best_streak=?
+             WHERE habit_id=?
+            """,
+            (latest_start, latest_end, Completion._best_run_length(cur, habit_id), habit_id),
+        )
+
+    @staticmethod
+    def _rebuild_streaks(cur: sqlite3.Cursor, habit_ids: Optional[List[int]] = None) -> None:
+        """Recalcula desde habit_completions las rachas de los hábitos indicados (o de todos).
+
+        Se usa al crear las tablas y tras importaciones masivas (una vez por
+        hábito, no por fila); el camino normal es incremental.
         """
-        streak = Completion.get_current_streak(habit_id, owner_email)
+        if habit_ids is None:
+            chunks = [None]
+        else:
+            ids = list(dict.fromkeys(int(h) for h in habit_ids))
+            chunks = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+        for chunk in chunks:
+            if chunk is None:
+                where, params = "", ()
+                cur.execute("DELETE FROM habit_streaks")
+                cur.execute("DELETE FROM habit_streak_runs")
+            else:
+                if not chunk:
+                    continue
+                where = f"WHERE habit_id IN ({','.join('?' for _ in chunk)})"
+                params = tuple(chunk)
+                cur.execute(f"DELETE FROM habit_streaks {where}", params)
+                cur.execute(f"DELETE FROM habit_streak_runs {where}", params)
+            islands = f"""
+                WITH numbered AS (
+                    SELECT habit_id, date,
+                           julianday(date) - ROW_NUMBER() OVER (
+                               PARTITION BY habit_id ORDER BY date) AS grp
+                    FROM habit_completions
+                    {where}
+                ), islands AS (
+                    SELECT habit_id, MIN(date) AS run_start, MAX(date) AS run_end,
+                           COUNT(*) AS len
+                    FROM numbered
+                    GROUP BY habit_id, grp
+                )
+            """
+            cur.execute(
+                f"""
+                {islands}
+                INSERT INTO habit_streak_runs (habit_id, length, runs)
+                SELECT habit_id, len, COUNT(*) FROM islands GROUP BY habit_id, len
+                """,
+                params,
+            )
+            cur.execute(
+                f"""
+                {islands}
+                INSERT INTO habit_streaks (habit_id, total, run_start, run_end, best_streak)
+                SELECT i.habit_id, SUM(i.len),
+                       (SELECT l.run_start FROM islands l
+                         WHERE l.habit_id = i.habit_id ORDER BY l.run_end DESC LIMIT 1),
+                       MAX(i.run_end), MAX(i.len)
+                FROM islands i
+                GROUP BY i.habit_id
+                """,
+                params,
+            )
+        if habit_ids is not None:
+            # Hábitos sin completados conservan una fila vacía
+            cur.executemany(
+                "INSERT OR IGNORE INTO habit_streaks (habit_id, total, best_streak) VALUES (?, 0, 0)",
+                [(int(h),) for h in habit_ids],
+            )
+
+    @staticmethod
+    def stats_by_habit(owner_email: str, start_date: str, end_date: str) -> Dict[int, Dict[str, Any]]:
+        """Completados por hábito en el rango con distribución por día de la semana.
+
+        Una única consulta GROUP BY habit_id sobre idx_hc_user_day. Los días
+        se devuelven de lunes (0) a domingo (6), igual que el calendario.
+        """
+        db = Database()
+        conn = db.get_connection()
+        try:
+            cur = conn.cursor()
+            owner, key = _owner_filter(owner_email)
+            # strftime('%w') usa 0=domingo; se reordena a lunes primero
+            weekday_cols = ",\n".join(
+                f"SUM(CASE strftime('%w', date) WHEN '{(i + 1) % 7}' THEN 1 ELSE 0 END) AS wd{i}"
+                for i in range(7)
+            )
+            cur.execute(
+                f"""
+                SELECT habit_id, COUNT(*) AS completions,
+                       MIN(date) AS first_date, MAX(date) AS last_date,
+                       {weekday_cols}
+                FROM habit_completions
+                WHERE {owner} AND date BETWEEN ? AND ?
+                GROUP BY habit_id
+                """,
+                (key, start_date, end_date),
+            )
+            return {
+                int(r["habit_id"]): {
+                    "completions": int(r["completions"]),
+                    "first_date": r["first_date"],
+                    "last_date": r["last_date"],
+                    "weekdays": [int(r[f"wd{i}"] or 0) for i in range(7)],
+                }
+                for r in cur.fetchall()
+            }
+        finally:
+            conn.close()
+
+    @staticmethod
+    def mark_completed_many(owner_email: str, items: List[tuple]) -> List[int]:
+        """Marca varios (habit_id, fecha) en una sola transacción.
+
+        Valida la propiedad de todos los hábitos con una consulta y descarta
+        los ajenos. Retorna los habit_id aceptados (sin repetir, en orden).
+        """
+        import datetime as _dt
+        if not items:
+            return []
+        today = _dt.date.today().isoformat()
+        requested = list(dict.fromkeys(int(hid) for hid, _ in items))
+        db = Database()
+        conn = db.get_connection()
+        try:
+            cur = conn.cursor()
+            placeholders = ",".join("?" for _ in requested)
+            owner, key = _owner_filter(owner_email)
+            cur.execute(
+                f"SELECT id FROM habits WHERE {owner} AND id IN ({placeholders})",
+                (key, *requested),
+            )
+            owned = {int(r[0]) for r in cur.fetchall()}
+            rows = list(dict.fromkeys(
+                (int(hid), owner_email, date_str or today)
+                for hid, date_str in items
+                if int(hid) in owned
+            ))
+            # Fila por fila en orden de fecha: cada racha se actualiza viendo sólo
+            # los días ya insertados, como con mark_completed
+            for hid, email, date_str in sorted(rows, key=lambda r: (r[0], r[2])):
+                cur.execute(
+                    """
+                    INSERT OR IGNORE INTO habit_completions (habit_id, owner_email, date)
+                    VALUES (?, ?, ?)
+                    """,
+                    (hid, email, date_str),
+                )
+                if cur.rowcount:  # 0: ya estaba registrado, la racha no cambia
+                    Completion._streak_after_mark(cur, hid, date_str)
+            conn.commit()
+            invalidate(owner_email)
+            return [hid for hid in requested if hid in owned]
+        finally:
+            conn.close()
 
+    @staticmethod
+    def strength_from_streak(streak: int) -> Dict[str, Any]:
+        """Traduce una racha (días) a fortaleza 0-100, nivel y color."""
         # Calcular fortaleza en escala 0-100
         # Fórmula: fortaleza crece logarítmicamente con la racha
         # 0 días = 0%, 7 días = 50%, 21 días = 75%, 66 días = 90%, 100+ días = 100%
@@ -1150,6 +2024,28 @@ class Completion:
             "color": color
         }
 
+    @staticmethod
+    def calculate_strength(habit_id: int, owner_email: str) -> Dict[str, Any]:
+        """
+        Calcula la fortaleza de un hábito basado en la racha de cumplimiento.
+
+        Retorna:
+            - streak: racha actual (días consecutivos)
+            - strength: nivel de fortaleza (0-100)
+            - level: nivel descriptivo (débil, en desarrollo, fuerte, inquebrantable)
+            - color: color para representación visual
+        """
+        return Completion.calculate_strengths([habit_id], owner_email)[int(habit_id)]
+
+    @staticmethod
+    def calculate_strengths(habit_ids: List[int], owner_email: str) -> Dict[int, Dict[str, Any]]:
+        """Fortaleza de varios hábitos a partir de una sola consulta de rachas."""
+        streaks = Completion.streaks_by_owner(owner_email)
+        return {
+            int(hid): Completion.strength_from_streak(streaks.get(int(hid), {}).get("current", 0))
+            for hid in habit_ids
+        }
+
 
 # ===========================
 # OnboardingStatus Model
@@ -1161,6 +2057,7 @@ class OnboardingStatus:
     """
 
     @staticmethod
+    @cached("onboarding.status")
     def get_status(user_email: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene el estado del onboarding para un usuario.
@@ -1174,14 +2071,15 @@ class OnboardingStatus:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(user_email, "user_email")
             cur.execute(
-                """
+                f"""
                 SELECT user_email, completed, current_step, skipped,
                        completed_at, steps_completed
                 FROM onboarding_status
-                WHERE user_email = ?
+                WHERE {owner}
                 """,
-                (user_email,)
+                (key,)
             )
             row = cur.fetchone()
             if row:
@@ -1219,15 +2117,19 @@ class OnboardingStatus:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            # Sin duplicar la fila de un usuario que la tiene con otro email
+            owner, key = _owner_filter(user_email, "user_email")
             cur.execute(
-                """
+                f"""
                 INSERT OR IGNORE INTO onboarding_status
                 (user_email, completed, current_step, skipped, steps_completed)
-                VALUES (?, 0, 0, 0, '')
+                SELECT ?, 0, 0, 0, ''
+                WHERE NOT EXISTS (SELECT 1 FROM onboarding_status WHERE {owner})
                 """,
-                (user_email,)
+                (user_email, key)
             )
             conn.commit()
+            invalidate(user_email)
         finally:
             conn.close()
 
@@ -1262,29 +2164,31 @@ class OnboardingStatus:
             is_completed = len(steps_completed) >= 5
 
             cur = conn.cursor()
+            owner, key = _owner_filter(user_email, "user_email")
             if is_completed:
                 from datetime import datetime
                 completed_at = datetime.now().isoformat()
                 cur.execute(
-                    """
+                    f"""
                     UPDATE onboarding_status
                     SET current_step = ?, steps_completed = ?,
                         completed = 1, completed_at = ?
-                    WHERE user_email = ?
+                    WHERE {owner}
                     """,
-                    (new_current_step, steps_completed_str, completed_at, user_email)
+                    (new_current_step, steps_completed_str, completed_at, key)
                 )
             else:
                 cur.execute(
-                    """
+                    f"""
                     UPDATE onboarding_status
                     SET current_step = ?, steps_completed = ?
-                    WHERE user_email = ?
+                    WHERE {owner}
                     """,
-                    (new_current_step, steps_completed_str, user_email)
+                    (new_current_step, steps_completed_str, key)
                 )
 
             conn.commit()
+            invalidate(user_email)
         finally:
             conn.close()
 
@@ -1299,15 +2203,27 @@ class OnboardingStatus:
         try:
             cur = conn.cursor()
             completed_at = _dt.datetime.now().isoformat()
+            owner, key = _owner_filter(user_email, "user_email")
             cur.execute(
-                """
-                INSERT OR REPLACE INTO onboarding_status
-                (user_email, completed, current_step, skipped, completed_at, steps_completed)
-                VALUES (?, 1, 5, 0, ?, '0,1,2,3,4')
+                f"""
+                UPDATE onboarding_status
+                SET completed = 1, current_step = 5, skipped = 0, completed_at = ?,
+                    steps_completed = '0,1,2,3,4'
+                WHERE {owner}
                 """,
-                (user_email, completed_at)
+                (completed_at, key)
             )
+            if cur.rowcount == 0:
+                cur.execute(
+                    """
+                    INSERT OR REPLACE INTO onboarding_status
+                    (user_email, completed, current_step, skipped, completed_at, steps_completed)
+                    VALUES (?, 1, 5, 0, ?, '0,1,2,3,4')
+                    """,
+                    (user_email, completed_at)
+                )
             conn.commit()
+            invalidate(user_email)
         finally:
             conn.close()
 
@@ -1320,15 +2236,26 @@ class OnboardingStatus:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(user_email, "user_email")
             cur.execute(
-                """
-                INSERT OR REPLACE INTO onboarding_status
-                (user_email, completed, current_step, skipped, steps_completed)
-                VALUES (?, 0, 0, 1, '')
+                f"""
+                UPDATE onboarding_status
+                SET completed = 0, current_step = 0, skipped = 1, completed_at = NULL, steps_completed = ''
+                WHERE {owner}
                 """,
-                (user_email,)
+                (key,)
             )
+            if cur.rowcount == 0:
+                cur.execute(
+                    """
+                    INSERT OR REPLACE INTO onboarding_status
+                    (user_email, completed, current_step, skipped, steps_completed)
+                    VALUES (?, 0, 0, 1, '')
+                    """,
+                    (user_email,)
+                )
             conn.commit()
+            invalidate(user_email)
         finally:
             conn.close()
 
@@ -1341,14 +2268,16 @@ class OnboardingStatus:
         conn = db.get_connection()
         try:
             cur = conn.cursor()
+            owner, key = _owner_filter(user_email, "user_email")
             cur.execute(
-                """
+                f"""
                 DELETE FROM onboarding_status
-                WHERE user_email = ?
+                WHERE {owner}
                 """,
-                (user_email,)
+                (key,)
             )
             conn.commit()
+            invalidate(user_email)
         finally:
             conn.close()
 
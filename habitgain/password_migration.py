@@ -0,0 +1,118 @@
+"""
+Migración de contraseñas legacy como job explícito y reanudable.
+
+Las filas de users sin password_hash/password_salt (bases importadas con
+columnas legacy `pwd_hash` / `password` / `passwd`, o sin contraseña)
+se hashean por lotes: el hashing se reparte en un pool de procesos y
+cada lote se escribe en su propia transacción. Si el job se corta, lo
+ya escrito queda hecho y la siguiente ejecución sigue con lo pendiente.
+
+init_db sólo lo corre en línea cuando hay pocas filas pendientes
+(INLINE_MIGRATION_LIMIT); con más, hay que lanzar
+`python db_tool.py migrate-passwords` para no bloquear el arranque.
+"""
+import functools
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache import invalidate
+from . import models
+from .models import Database, _hash_password, normalize_email
+
+LEGACY_PASSWORD_COLUMNS = ("pwd_hash", "password", "passwd")  # en orden de preferencia
+DEFAULT_PASSWORD = "changeme"
+INLINE_MIGRATION_LIMIT = 50
+MIGRATION_CHUNK_SIZE = 500
+
+_MISSING_HASH = "(password_hash IS NULL OR password_hash = '')"
+_MISSING = f"({_MISSING_HASH} OR password_salt IS NULL OR password_salt = '')"
+
+
+def _legacy_column(conn: sqlite3.Connection) -> Optional[str]:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(users)").fetchall()}
+    return next((c for c in LEGACY_PASSWORD_COLUMNS if c in cols), None)
+
+
+def pending_count(conn: sqlite3.Connection) -> int:
+    (count,) = conn.execute(f"SELECT COUNT(*) FROM users WHERE {_MISSING}").fetchone()
+    return int(count)
+
+
+def _next_chunk(conn: sqlite3.Connection, legacy: Optional[str], after_id: int, limit: int) -> List[tuple]:
+    legacy_expr = legacy or "NULL"
+    rows = conn.execute(
+        f"""
+        SELECT id, email, {legacy_expr} AS legacy, {_MISSING_HASH} AS missing_hash
+        FROM users WHERE id > ? AND {_MISSING}
+        ORDER BY id LIMIT ?
+        """,
+        (after_id, limit),
+    ).fetchall()
+    # Con hash pero sin sal no hay nada recuperable: contraseña provisional
+    return [(r[0], r[1], r[2] if r[3] and r[2] else DEFAULT_PASSWORD) for r in rows]
+
+
+def migrate_passwords(
+    *,
+    workers: Optional[int] = None,
+    chunk_size: int = MIGRATION_CHUNK_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Dict[str, Any]:
+    """Hashea todas las filas pendientes. workers=0 hashea en este proceso."""
+    start = time.perf_counter()
+    own_conn = conn is None
+    if own_conn:
+        conn = Database().get_connection()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Política fijada aquí: los procesos del pool no dependen de su propio entorno
+    hash_one = functools.partial(_hash_password, algo=models.PASSWORD_ALGO, params=models.PASSWORD_PARAMS)
+    executor = None
+    summary = {"pending": 0, "migrated": 0, "skipped": 0, "chunks": 0, "workers": workers, "seconds": 0.0}
+    try:
+        legacy = _legacy_column(conn)
+        summary["pending"] = pending_count(conn)
+        if summary["pending"] and workers > 0:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        after_id = 0
+        while True:
+            rows = _next_chunk(conn, legacy, after_id, chunk_size)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            secrets_ = [r[2] for r in rows]
+            if executor is not None:
+                packs = list(executor.map(hash_one, secrets_,
+                                          chunksize=max(1, len(rows) // (workers * 4))))
+            else:
+                packs = [hash_one(s) for s in secrets_]
+
+            cur = conn.cursor()
+            # Sólo filas que siguen pendientes: no pisar un cambio hecho mientras tanto
+            cur.executemany(
+                f"""
+                UPDATE users SET password_hash=?, password_salt=?, password_algo=?, password_params=?
+                WHERE id=? AND {_MISSING}
+                """,
+                [(p["hash"], p["salt"], p["algo"], p["params"], r[0]) for p, r in zip(packs, rows)],
+            )
+            conn.commit()
+            summary["migrated"] += cur.rowcount
+            summary["skipped"] += len(rows) - cur.rowcount
+            summary["chunks"] += 1
+            invalidate(*(normalize_email(r[1]) for r in rows))
+
+            if progress is not None:
+                summary["seconds"] = round(time.perf_counter() - start, 3)
+                progress(dict(summary))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if own_conn:
+            conn.close()
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
@@ -1,7 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, Response, render_template, request, redirect, url_for, session, flash
 from ..models import User, Database, count_active_habits_from_db
+from ..importer import detect_format, iter_rows, import_completions
+from ..exporter import iter_csv, iter_ndjson
+from ..csrf import generate_token, validate_token
+from ..hashpool import HashPoolSaturated
+from ..remember import current_selector, list_tokens, revoke_token, revoke_user_tokens
 
-import secrets
+import csv
+import datetime as _dt
+import io
 
 profile_bp = Blueprint("profile", __name__, template_folder="templates")
 
@@ -14,10 +21,7 @@ def _require_login():
 
 
 def _get_csrf_token() -> str:
-    token = secrets.token_urlsafe(32)
-    session["csrf_token"] = token
-    session.modified = True
-    return token
+    return generate_token("profile")
 
 
 @profile_bp.route("/edit", methods=["GET", "POST"])
@@ -36,9 +40,7 @@ def edit():
 
     if request.method == "POST":
         # CSRF check
-        form_token = request.form.get("csrf_token", "")
-        sess_token = session.pop("csrf_token", None)
-        if not sess_token or form_token != sess_token:
+        if not validate_token(request.form.get("csrf_token"), "profile"):
             flash("Invalid or missing CSRF token.", "danger")
             return redirect(url_for("profile.edit"))
 
@@ -65,7 +67,15 @@ def edit():
         # Persistencia
         User.update_name(user_email, new_name)
         if new_password:
-            User.update_password(user_email, new_password)
+            try:
+                User.update_password(user_email, new_password)
+            except HashPoolSaturated:
+                flash("Server is busy; your password was not changed. Please try again.", "warning")
+                return redirect(url_for("profile.edit"))
+            # Otra contraseña: los demás dispositivos recordados dejan de entrar
+            user = User.get_by_email(user_email)
+            if user:
+                revoke_user_tokens(user["id"], keep_selector=current_selector())
 
         # Reflejar en sesión
         session["user"]["name"] = new_name
@@ -83,10 +93,128 @@ def edit():
     # Conteo de hábitos basado en BD para coherencia
     habits_count = count_active_habits_from_db(user_email)
 
+    # Dispositivos con "Remember me"
+    devices = [_device_row(t) for t in list_tokens(user_data["id"])] if user_data.get("id") else []
+
     csrf_token = _get_csrf_token()
     return render_template(
         "profile/edit.html",
         user=user_data,
         habits_count=habits_count,
+        devices=devices,
+        current_device=current_selector(),
         csrf_token=csrf_token,
     )
+
+
+def _format_ts(ts):
+    return _dt.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "—"
+
+
+def _device_row(token):
+    return {
+        "selector": token["selector"],
+        "user_agent": token["user_agent"] or "Unknown device",
+        "created": _format_ts(token["created_at"]),
+        "last_used": _format_ts(token["last_used_at"]),
+        "expires": _format_ts(token["expires_at"]),
+    }
+
+
+@profile_bp.route("/devices/<selector>/revoke", methods=["POST"])
+def revoke_device(selector):
+    """Olvida un dispositivo recordado del usuario."""
+    if not _require_login():
+        return redirect(url_for("auth.login"))
+    if not validate_token(request.form.get("csrf_token"), "profile"):
+        flash("Invalid or missing CSRF token.", "danger")
+        return redirect(url_for("profile.edit"))
+
+    user = User.get_by_email(session["user"]["email"])
+    if user and revoke_token(selector, user["id"]):
+        flash("Device signed out.", "success")
+    else:
+        flash("That device was already signed out.", "info")
+    return redirect(url_for("profile.edit"))
+
+
+@profile_bp.route("/devices/revoke-all", methods=["POST"])
+def revoke_all_devices():
+    """Olvida todos los dispositivos recordados (también este)."""
+    if not _require_login():
+        return redirect(url_for("auth.login"))
+    if not validate_token(request.form.get("csrf_token"), "profile"):
+        flash("Invalid or missing CSRF token.", "danger")
+        return redirect(url_for("profile.edit"))
+
+    user = User.get_by_email(session["user"]["email"])
+    removed = revoke_user_tokens(user["id"]) if user else 0
+    flash(f"Signed out {removed} remembered device(s).", "success")
+    return redirect(url_for("profile.edit"))
+
+
+EXPORT_FORMATS = {
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+    "csv": (iter_csv, "text/csv; charset=utf-8"),
+}
+
+
+@profile_bp.route("/export")
+def export_data():
+    """Descarga en streaming de todos los datos del usuario."""
+    if not _require_login():
+        return redirect(url_for("auth.login"))
+
+    fmt = (request.args.get("format") or "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        flash("Unsupported export format. Use ndjson or csv.", "danger")
+        return redirect(url_for("profile.edit"))
+
+    # El generador sólo recibe el email: no retiene el contexto de la petición
+    generate, mimetype = EXPORT_FORMATS[fmt]
+    response = Response(generate(session["user"]["email"]), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="habitgain-export.{fmt}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@profile_bp.route("/import", methods=["POST"])
+def import_history():
+    """Importa historial de completados (CSV/NDJSON) subido desde el perfil."""
+    if not _require_login():
+        return redirect(url_for("auth.login"))
+
+    if not validate_token(request.form.get("csrf_token"), "profile"):
+        flash("Invalid or missing CSRF token.", "danger")
+        return redirect(url_for("profile.edit"))
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Please choose a file to import.", "warning")
+        return redirect(url_for("profile.edit"))
+
+    fmt = request.form.get("format") or detect_format(upload.filename)
+    if fmt not in ("csv", "ndjson"):
+        flash("Unsupported file format. Use .csv or .ndjson.", "danger")
+        return redirect(url_for("profile.edit"))
+
+    # Se lee en streaming desde el archivo temporal de la subida
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    try:
+        summary = import_completions(
+            session["user"]["email"],
+            iter_rows(stream, fmt),
+            create_missing=bool(request.form.get("create_missing")),
+        )
+    except (UnicodeDecodeError, ValueError, csv.Error):
+        flash("The file could not be read. Check its encoding and format.", "danger")
+        return redirect(url_for("profile.edit"))
+
+    flash(
+        f"Imported {summary['inserted']} completions across {summary['habits']} habits "
+        f"({summary['duplicates']} duplicates, {summary['rejected']} rejected).",
+        "success" if summary["inserted"] else "info",
+    )
+    for err in summary["errors"][:5]:
+        flash(err, "warning")
+    return redirect(url_for("profile.edit"))
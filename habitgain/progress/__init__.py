@@ -1,8 +1,8 @@
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request
+from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request, flash
 import datetime as _dt
 import calendar as _cal
-import secrets
 from ..models import Habit, Completion, DailyProgress, Category, OnboardingStatus
+from ..csrf import generate_token, validate_token
 from ..behavioral_science import MotivationalMessages, calculate_user_motivation_stats
 
 progress_bp = Blueprint("progress", __name__, template_folder="templates")
@@ -43,8 +43,9 @@ def panel():
             h["category_name"] = cats.get(cid)
 
     # HU-8: Calcular fortaleza de cada hábito basado en racha de cumplimiento
+    strengths = Completion.calculate_strengths([h["id"] for h in habits], user)
     for h in habits:
-        strength_data = Completion.calculate_strength(h["id"], user)
+        strength_data = strengths[h["id"]]
         h["strength"] = strength_data["strength"]
         h["strength_level"] = strength_data["level"]
         h["strength_color"] = strength_data["color"]
@@ -90,9 +91,7 @@ def panel():
             target.setdefault(base["id"], []).append(child)
 
     # CSRF token para acciones POST del panel
-    csrf_token = secrets.token_urlsafe(32)
-    session["csrf_token_progress"] = csrf_token
-    session.modified = True
+    csrf_token = generate_token("progress")
 
     # HU-17 CDA3: Calcular mensaje motivacional
     motivation_stats = calculate_user_motivation_stats(
@@ -145,11 +144,70 @@ def panel():
     )
 
 
+# Rango máximo admitido por /stats (varios años de historial)
+MAX_STATS_RANGE_DAYS = 366 * 5
+WEEKDAY_LABELS = ["L", "M", "X", "J", "V", "S", "D"]
+
+
+def _parse_stats_range(today: _dt.date):
+    """Lee ?from=YYYY-MM-DD&to=YYYY-MM-DD. Por defecto, los últimos 30 días.
+
+    Retorna (start, end, error); error es None si el rango es válido.
+    """
+    raw_from = (request.args.get("from") or "").strip()
+    raw_to = (request.args.get("to") or "").strip()
+    try:
+        end = _dt.date.fromisoformat(raw_to) if raw_to else today
+        start = _dt.date.fromisoformat(raw_from) if raw_from else end - _dt.timedelta(days=29)
+    except ValueError:
+        return None, None, "invalid_date"
+    if start > end:
+        return None, None, "invalid_range"
+    if (end - start).days + 1 > MAX_STATS_RANGE_DAYS:
+        return None, None, "range_too_large"
+    return start, end, None
+
+
+def _expected_occurrences(frequency: str, days: int) -> int:
+    """Veces que un hábito debería cumplirse en `days` días según su frecuencia."""
+    if frequency == "weekly":
+        return max(1, -(-days // 7))
+    if frequency == "monthly":
+        return max(1, -(-days // 30))
+    return max(1, days)
+
+
+def _habit_range_stats(user: str, habits, start: _dt.date, end: _dt.date):
+    """Desglose por hábito del rango: una consulta agrupada + una de rachas."""
+    days = (end - start).days + 1
+    grouped = Completion.stats_by_habit(user, start.isoformat(), end.isoformat())
+    streaks = Completion.streaks_by_owner(user)
+    rows = []
+    for h in habits:
+        g = grouped.get(h["id"], {})
+        completions = g.get("completions", 0)
+        expected = _expected_occurrences(h.get("frequency") or "daily", days)
+        streak = streaks.get(h["id"], {})
+        rows.append({
+            "habit_id": h["id"],
+            "name": h.get("name"),
+            "frequency": h.get("frequency") or "daily",
+            "completions": completions,
+            "expected": expected,
+            "compliance": min(100, int(round(completions / expected * 100))),
+            "weekdays": g.get("weekdays", [0] * 7),
+            "last_date": g.get("last_date"),
+            "current_streak": streak.get("current", 0),
+            "best_streak": streak.get("best", 0),
+        })
+    return rows, streaks
+
+
 @progress_bp.route("/stats")
 def stats():
     """Pantalla de estadísticas: calendario mensual + métricas de rendimiento.
 
-    Implementa TT-12 CDA3 y CDA4.
+    Implementa TT-12 CDA3 y CDA4. Acepta ?from/?to para el desglose por hábito.
     """
     user = (session.get("user") or {}).get("email")
     if not user:
@@ -160,36 +218,38 @@ def stats():
     year = request.args.get("year", type=int) or today.year
     month = request.args.get("month", type=int) or today.month
 
+    range_start, range_end, range_error = _parse_stats_range(today)
+    if range_error:
+        flash("Rango de fechas inválido (máximo 5 años). Se muestran los últimos 30 días.", "warning")
+        range_end = today
+        range_start = today - _dt.timedelta(days=29)
+
     # Hábitos del usuario (para calcular rachas)
     habits = Habit.list_active_by_owner(user)
 
+    # Rachas y desglose por hábito (consultas agrupadas, no una por hábito)
+    habit_stats, streaks = _habit_range_stats(user, habits, range_start, range_end)
+
     # Racha actual (máximo entre hábitos activos)
     current_streak = 0
     current_streak_habit_name = None
     for h in habits:
-        s = Completion.get_current_streak(h["id"], user)
+        s = streaks.get(h["id"], {}).get("current", 0)
         if s > current_streak:
             current_streak = s
             current_streak_habit_name = h.get("name")
 
     # Mejor racha histórica (máximo best_streak entre hábitos)
-    best_streak = 0
-    for h in habits:
-        bs = Completion.get_best_streak(h["id"], user)
-        if bs > best_streak:
-            best_streak = bs
+    best_streak = max((streaks.get(h["id"], {}).get("best", 0) for h in habits), default=0)
 
     # Tasa de cumplimiento últimos 30 días
     window_days = 30
     start_30 = today - _dt.timedelta(days=window_days - 1)
-    completion_dates_30 = set(
-        Completion.get_completion_dates_in_range(
-            user,
-            start_30.isoformat(),
-            today.isoformat(),
-        )
+    success_days_30 = Completion.count_days_with_completion(
+        user,
+        start_30.isoformat(),
+        today.isoformat(),
     )
-    success_days_30 = len(completion_dates_30)
     compliance_rate_30 = int(round((success_days_30 / window_days) * 100)) if window_days > 0 else 0
 
     # Calendario mensual (heatmap)
@@ -248,7 +308,41 @@ def stats():
         compliance_rate_30=compliance_rate_30,
         success_days_30=success_days_30,
         window_days_30=window_days,
+        range_start=range_start,
+        range_end=range_end,
+        habit_stats=habit_stats,
+        weekday_labels=WEEKDAY_LABELS,
+    )
+
+
+@progress_bp.route("/stats.json")
+def stats_json():
+    """Variante JSON de /stats para gráficas: desglose por hábito del rango ?from/?to."""
+    user = (session.get("user") or {}).get("email")
+    if not user:
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    today = _dt.date.today()
+    range_start, range_end, range_error = _parse_stats_range(today)
+    if range_error:
+        return jsonify({"ok": False, "error": range_error}), 400
+
+    habits = Habit.list_active_by_owner(user)
+    habit_stats, _ = _habit_range_stats(user, habits, range_start, range_end)
+    days_with_completion = Completion.count_days_with_completion(
+        user, range_start.isoformat(), range_end.isoformat()
     )
+    total_days = (range_end - range_start).days + 1
+    return jsonify({
+        "ok": True,
+        "from": range_start.isoformat(),
+        "to": range_end.isoformat(),
+        "days": total_days,
+        "days_with_completion": days_with_completion,
+        "compliance": int(round(days_with_completion / total_days * 100)),
+        "weekday_labels": WEEKDAY_LABELS,
+        "habits": habit_stats,
+    })
 
 
 @progress_bp.route("/complete/<int:habit_id>", methods=["POST"])
@@ -257,12 +351,11 @@ def complete(habit_id: int):
     if not user:
         return jsonify({"ok": False, "error": "unauthorized"}), 401
     # CSRF check
-    header_token = request.headers.get("X-CSRF-Token", "")
-    sess_token = session.get("csrf_token_progress")
-    if not sess_token or header_token != sess_token:
+    if not validate_token(request.headers.get("X-CSRF-Token"), "progress"):
         return jsonify({"ok": False, "error": "invalid_csrf"}), 400
     try:
-        Completion.mark_completed(habit_id, user)
+        if not Completion.mark_completed(habit_id, user):
+            return jsonify({"ok": False, "error": "not_found"}), 404
         # HU-8 CDA3: Calcular fortaleza actualizada en tiempo real
         strength_data = Completion.calculate_strength(habit_id, user)
         return jsonify({
@@ -274,3 +367,111 @@ def complete(habit_id: int):
         })
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
+
+
+@progress_bp.route("/uncomplete/<int:habit_id>", methods=["POST"])
+def uncomplete(habit_id: int):
+    """Deshace el completado de hoy (o de ?date=YYYY-MM-DD) de un hábito."""
+    user = (session.get("user") or {}).get("email")
+    if not user:
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+    # CSRF check
+    if not validate_token(request.headers.get("X-CSRF-Token"), "progress"):
+        return jsonify({"ok": False, "error": "invalid_csrf"}), 400
+
+    date_str = request.args.get("date") or None
+    if date_str:
+        try:
+            date_str = _dt.date.fromisoformat(date_str).isoformat()
+        except ValueError:
+            return jsonify({"ok": False, "error": "invalid_date"}), 400
+    try:
+        removed = Completion.unmark(habit_id, user, date_str)
+        if not removed:
+            return jsonify({"ok": False, "error": "not_completed"}), 404
+        strength_data = Completion.calculate_strength(habit_id, user)
+        return jsonify({
+            "ok": True,
+            "strength": strength_data["strength"],
+            "strength_level": strength_data["level"],
+            "strength_color": strength_data["color"],
+            "streak": strength_data["streak"]
+        })
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+
+# Máximo de hábitos por lote (rutinas matutinas típicas: 5-10)
+MAX_BATCH_ITEMS = 50
+
+
+def _parse_batch_items(payload, today: _dt.date):
+    """Normaliza el cuerpo de /complete-batch a [(habit_id, fecha_iso)].
+
+    Acepta {"habit_ids": [1, 2], "date": "YYYY-MM-DD"} o
+    {"items": [{"habit_id": 1, "date": "YYYY-MM-DD"}, ...]}; la fecha es
+    opcional (hoy por defecto) y no puede ser futura.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("invalid_payload")
+    default_date = payload.get("date")
+    raw_items = payload.get("items")
+    if raw_items is None:
+        raw_items = [{"habit_id": hid, "date": default_date} for hid in (payload.get("habit_ids") or [])]
+    if not isinstance(raw_items, list) or not raw_items:
+        raise ValueError("empty_batch")
+    if len(raw_items) > MAX_BATCH_ITEMS:
+        raise ValueError("batch_too_large")
+
+    items = []
+    for item in raw_items:
+        if not isinstance(item, dict):
+            raise ValueError("invalid_item")
+        try:
+            habit_id = int(item.get("habit_id"))
+            day = _dt.date.fromisoformat(item.get("date") or default_date or today.isoformat())
+        except (TypeError, ValueError):
+            raise ValueError("invalid_item")
+        if day > today:
+            raise ValueError("future_date")
+        items.append((habit_id, day.isoformat()))
+    return items
+
+
+@progress_bp.route("/complete-batch", methods=["POST"])
+def complete_batch():
+    """Marca varios hábitos de una vez: un CSRF check, una transacción y
+    una consulta de rachas para devolver la fortaleza de todos."""
+    user = (session.get("user") or {}).get("email")
+    if not user:
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+    # CSRF check
+    if not validate_token(request.headers.get("X-CSRF-Token"), "progress"):
+        return jsonify({"ok": False, "error": "invalid_csrf"}), 400
+
+    try:
+        items = _parse_batch_items(request.get_json(silent=True), _dt.date.today())
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    try:
+        completed = Completion.mark_completed_many(user, items)
+        strengths = Completion.calculate_strengths(completed, user)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    rejected = [hid for hid in dict.fromkeys(hid for hid, _ in items) if hid not in set(completed)]
+    return jsonify({
+        "ok": True,
+        "completed": completed,
+        "rejected": rejected,
+        "strengths": {
+            str(hid): {
+                "strength": data["strength"],
+                "strength_level": data["level"],
+                "strength_color": data["color"],
+                "streak": data["streak"],
+            }
+            for hid, data in strengths.items()
+        },
+    })
@@ -0,0 +1,259 @@
+"""
+"Recordarme": volver a entrar sin contraseña con tokens selector/validador.
+
+La cookie lleva `<selector>.<validador>`. La tabla remember_tokens guarda
+el selector (clave primaria) y sólo el SHA-256 del validador: quien lea la
+tabla no puede armar una cookie válida, y como el validador son 256 bits
+aleatorios no hace falta un hash lento. Restaurar una sesión cuesta una
+búsqueda por clave primaria (con el usuario en el mismo JOIN), un SHA-256
+y un compare_digest, en vez de un PBKDF2 del pool.
+
+- Cada uso rota el validador; la cookie anterior sigue valiendo
+  ROTATION_GRACE_SECONDS para las peticiones paralelas que salieron con ella.
+- Un validador que no coincide con ninguno de los dos indica una cookie
+  copiada y ya usada por otro: se borra el token.
+- Se revocan desde el perfil, al cambiar la contraseña (los de los otros
+  dispositivos), al cerrar sesión (el de ese navegador) y al borrar el usuario.
+
+Configuración por entorno:
+  HABITGAIN_REMEMBER_DAYS   vida de un token en días (por defecto 30; 0 desactiva)
+"""
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import after_this_request, current_app, request, session
+
+from .csrf import new_session_id
+from .identity import remember_role
+from .models import Database
+
+logger = logging.getLogger(__name__)
+
+REMEMBER_COOKIE = "remember_token"
+DEFAULT_REMEMBER_DAYS = 30
+ROTATION_GRACE_SECONDS = 60
+USER_AGENT_MAX_LENGTH = 200
+
+# Endpoints que no usan la sesión: no gastan (ni rotan) el token. Los assets
+# se piden en paralelo al cargar cada página y correrían contra el período de gracia.
+SESSIONLESS_ENDPOINTS = frozenset({"static", "asset", "core.healthz"})
+
+
+def _digest(validator: str) -> str:
+    return hashlib.sha256(validator.encode("utf-8")).hexdigest()
+
+
+def _split(cookie: Optional[str]) -> Optional[Tuple[str, str]]:
+    # token_urlsafe no usa ".": sirve de separador
+    selector, sep, validator = (cookie or "").partition(".")
+    if not (sep and selector and validator):
+        return None
+    return selector, validator
+
+
+def _delete(conn, selector: str) -> None:
+    conn.execute("DELETE FROM remember_tokens WHERE selector=?", (selector,))
+    conn.commit()
+
+
+# ---------- tokens ----------
+def issue_token(user_id: int, user_agent: str = "", days: int = DEFAULT_REMEMBER_DAYS) -> str:
+    """Crea un token para user_id y retorna el valor de la cookie."""
+    selector, validator = secrets.token_urlsafe(12), secrets.token_urlsafe(32)
+    now = int(time.time())
+    conn = Database().get_connection()
+    try:
+        # Los vencidos del mismo usuario se limpian al emitir uno nuevo
+        conn.execute("DELETE FROM remember_tokens WHERE user_id=? AND expires_at <= ?", (user_id, now))
+        conn.execute(
+            """
+            INSERT INTO remember_tokens
+            (selector, validator_hash, user_id, user_agent, created_at, last_used_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (selector, _digest(validator), user_id, (user_agent or "")[:USER_AGENT_MAX_LENGTH],
+             now, now, now + days * 86400),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return f"{selector}.{validator}"
+
+
+def consume_token(cookie: Optional[str]) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+    """Valida la cookie. Retorna (usuario, cookie rotada) o None si no sirve.
+
+    La cookie rotada es None cuando se aceptó la anterior dentro del
+    período de gracia: el navegador ya recibió (o va a recibir) la nueva.
+    """
+    parts = _split(cookie)
+    if parts is None:
+        return None
+    selector, validator = parts
+    digest = _digest(validator)
+    now = int(time.time())
+
+    conn = Database().get_connection()
+    try:
+        row = conn.execute(
+            """
+            SELECT t.validator_hash, t.previous_hash, t.rotated_at, t.expires_at,
+                   u.id, u.email, u.name, u.role
+            FROM remember_tokens t LEFT JOIN users u ON u.id = t.user_id
+            WHERE t.selector = ?
+            """,
+            (selector,),
+        ).fetchone()
+        if row is None:
+            return None
+        if row["expires_at"] <= now or row["email"] is None:
+            _delete(conn, selector)
+            return None
+        user = {"id": row["id"], "email": row["email"], "name": row["name"], "role": row["role"]}
+
+        if hmac.compare_digest(row["validator_hash"], digest):
+            fresh = secrets.token_urlsafe(32)
+            cur = conn.execute(
+                """
+                UPDATE remember_tokens
+                   SET validator_hash=?, previous_hash=?, rotated_at=?, last_used_at=?
+                 WHERE selector=? AND validator_hash=?
+                """,
+                (_digest(fresh), digest, now, now, selector, digest),
+            )
+            conn.commit()
+            # rowcount 0: otra petición con la misma cookie rotó primero
+            return user, (f"{selector}.{fresh}" if cur.rowcount == 1 else None)
+
+        if (
+            row["previous_hash"]
+            and hmac.compare_digest(row["previous_hash"], digest)
+            and now - (row["rotated_at"] or 0) <= ROTATION_GRACE_SECONDS
+        ):
+            return user, None
+
+        # Validador viejo fuera de plazo o desconocido: la cookie se copió
+        logger.warning("Token recordarme reutilizado para el usuario %s; se revoca", user["id"])
+        _delete(conn, selector)
+        return None
+    finally:
+        conn.close()
+
+
+def list_tokens(user_id: int) -> List[Dict[str, Any]]:
+    """Tokens vigentes del usuario, el último usado primero."""
+    conn = Database().get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT selector, user_agent, created_at, last_used_at, expires_at
+            FROM remember_tokens WHERE user_id=? AND expires_at > ?
+            ORDER BY last_used_at DESC
+            """,
+            (user_id, int(time.time())),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def revoke_token(selector: str, user_id: Optional[int] = None) -> bool:
+    """Borra un token; con user_id sólo si es de ese usuario."""
+    conn = Database().get_connection()
+    try:
+        if user_id is None:
+            cur = conn.execute("DELETE FROM remember_tokens WHERE selector=?", (selector,))
+        else:
+            cur = conn.execute("DELETE FROM remember_tokens WHERE selector=? AND user_id=?", (selector, user_id))
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def revoke_user_tokens(user_id: int, keep_selector: Optional[str] = None) -> int:
+    """Borra todos los tokens del usuario (menos keep_selector, si se indica)."""
+    conn = Database().get_connection()
+    try:
+        cur = conn.execute(
+            "DELETE FROM remember_tokens WHERE user_id=? AND selector IS NOT ?",
+            (user_id, keep_selector),
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+# ---------- cookie ----------
+def current_selector() -> Optional[str]:
+    """Selector de la cookie de esta petición (sin validarla)."""
+    parts = _split(request.cookies.get(REMEMBER_COOKIE))
+    return parts[0] if parts else None
+
+
+def set_remember_cookie(response, value: str):
+    config = current_app.config
+    response.set_cookie(
+        REMEMBER_COOKIE,
+        value,
+        max_age=config["REMEMBER_DAYS"] * 86400,
+        httponly=True,
+        secure=config.get("SESSION_COOKIE_SECURE", False),
+        samesite=config.get("SESSION_COOKIE_SAMESITE") or "Lax",
+    )
+    return response
+
+
+def clear_remember_cookie(response):
+    response.delete_cookie(REMEMBER_COOKIE)
+    return response
+
+
+def remember_login(response, user_id: int):
+    """Tras un login con "Remember me": emite el token y deja la cookie."""
+    if current_app.config.get("REMEMBER_DAYS", 0) > 0:
+        token = issue_token(user_id, request.user_agent.string, days=current_app.config["REMEMBER_DAYS"])
+        set_remember_cookie(response, token)
+    return response
+
+
+def restore_session() -> None:
+    """Hook `before_request`: sesión vencida + cookie válida -> sesión restaurada."""
+    cookie = request.cookies.get(REMEMBER_COOKIE)
+    if not cookie or "user" in session:
+        return
+    # Sin endpoint (404) o sin sesión: no gastar el token
+    if request.endpoint is None or request.endpoint in SESSIONLESS_ENDPOINTS:
+        return
+
+    result = consume_token(cookie)
+    if result is None:
+        # Cookie que ya no sirve: no volver a buscarla en cada petición
+        after_this_request(clear_remember_cookie)
+        return
+
+    user, rotated = result
+    session["user"] = {"email": user["email"], "name": user["name"] or "Usuario"}
+    remember_role(user["email"], user["role"])
+    new_session_id()
+    if rotated:
+        after_this_request(lambda response: set_remember_cookie(response, rotated))
+
+
+def _env_days() -> int:
+    try:
+        return max(0, int(os.environ.get("HABITGAIN_REMEMBER_DAYS", DEFAULT_REMEMBER_DAYS)))
+    except (TypeError, ValueError):
+        return DEFAULT_REMEMBER_DAYS
+
+
+def init_remember(app) -> None:
+    app.config["REMEMBER_DAYS"] = _env_days()
+    if app.config["REMEMBER_DAYS"] > 0:
+        app.before_request(restore_session)
@@ -0,0 +1,216 @@
+"""
+Sesiones del lado del servidor (opcional) guardadas en SQLite.
+
+La cookie sólo lleva un id aleatorio; los datos viven en la tabla
+`sessions`. Las lecturas pasan por un LRU en proceso validado con la
+versión del alcance "session:<id>" (ver habitgain/cache.py), así que una
+revocación hecha en un worker se respeta en todos. Las sesiones vencidas
+se borran por lotes, como mucho una vez cada SWEEP_INTERVAL por worker.
+
+Se activa con HABITGAIN_SERVER_SESSIONS=1.
+"""
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from .cache import LRUCache, invalidate, sync_versions, versions
+from .models import Database
+
+SESSION_CACHE_SIZE = 1024
+SESSION_CACHE_TTL = 60.0
+SWEEP_INTERVAL = 300
+SWEEP_BATCH_SIZE = 500
+SWEEP_MAX_BATCHES = 20
+
+
+def _scope(sid: str) -> str:
+    return f"session:{sid}"
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial: Optional[Dict[str, Any]] = None, sid: str = "",
+                 new: bool = False, expires_at: int = 0):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.opened_as = _user_email(self)
+        self.modified = False
+
+
+def _user_email(session) -> Optional[str]:
+    user = session.get("user")
+    return user.get("email") if isinstance(user, dict) else None
+
+
+class SqliteSessionInterface(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, cache_size: int = SESSION_CACHE_SIZE, cache_ttl: float = SESSION_CACHE_TTL):
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    # ---------- almacenamiento ----------
+    def _load(self, sid: str) -> Optional[tuple]:
+        entry = self.cache.get(sid, None)
+        if entry is not None:
+            version, data, expires_at = entry
+            if version == versions.get(_scope(sid)) and expires_at > time.time():
+                return data, expires_at
+        version = versions.get(_scope(sid))
+        db = Database()
+        conn = db.get_connection()
+        try:
+            row = conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE id=? AND expires_at > ?",
+                (sid, int(time.time())),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        data = self.serializer.loads(row["data"])
+        self.cache.set(sid, (version, data, int(row["expires_at"])))
+        return data, int(row["expires_at"])
+
+    def _store(self, session: ServerSession, expires_at: int) -> None:
+        email = _user_email(session)
+        db = Database()
+        conn = db.get_connection()
+        try:
+            conn.execute(
+                """
+                INSERT INTO sessions (id, data, user_email, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    data=excluded.data, user_email=excluded.user_email, expires_at=excluded.expires_at
+                """,
+                (session.sid, self.serializer.dumps(dict(session)), email, expires_at),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        invalidate(_scope(session.sid))
+
+    def _delete(self, sid: str) -> None:
+        db = Database()
+        conn = db.get_connection()
+        try:
+            conn.execute("DELETE FROM sessions WHERE id=?", (sid,))
+            conn.commit()
+        finally:
+            conn.close()
+        invalidate(_scope(sid))
+
+    # ---------- SessionInterface ----------
+    def open_session(self, app, request) -> ServerSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            # La sesión se abre antes de before_request: validar versiones aquí
+            sync_versions()
+            loaded = self._load(sid)
+            if loaded is not None:
+                data, expires_at = loaded
+                return ServerSession(data, sid=sid, expires_at=expires_at)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # Login/logout: id nuevo para que el anterior no sirva (fijación de sesión)
+        if not session.new and _user_email(session) != session.opened_as:
+            self._delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        if not session:
+            if session.modified:  # vaciada en esta petición
+                if not session.new:
+                    self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        # Sin cambios: sólo se extiende el vencimiento pasada la mitad de la vida
+        refresh = session.expires_at - now < lifetime / 2
+        if not (session.modified or session.new or refresh):
+            return
+
+        self._store(session, int(now + lifetime))
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        self.maybe_sweep()
+
+    # ---------- mantenimiento ----------
+    def maybe_sweep(self) -> None:
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            sweep_expired()
+        finally:
+            self._sweep_lock.release()
+
+
+def sweep_expired(batch_size: int = SWEEP_BATCH_SIZE, max_batches: int = SWEEP_MAX_BATCHES) -> int:
+    """Borra sesiones vencidas en lotes cortos (una transacción por lote)."""
+    removed = 0
+    db = Database()
+    conn = db.get_connection()
+    try:
+        for _ in range(max_batches):
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?",
+                (int(time.time()), batch_size),
+            ).fetchall()]
+            if not ids:
+                break
+            placeholders = ",".join("?" for _ in ids)
+            conn.execute(f"DELETE FROM sessions WHERE id IN ({placeholders})", ids)
+            # Sus versiones de caché ya no sirven: nadie puede volver a abrirlas
+            conn.execute(
+                f"DELETE FROM cache_versions WHERE scope IN ({placeholders})",
+                [_scope(sid) for sid in ids],
+            )
+            conn.commit()
+            removed += len(ids)
+            if len(ids) < batch_size:
+                break
+    finally:
+        conn.close()
+    return removed
+
+
+def revoke_user_sessions(email: str) -> int:
+    """Cierra todas las sesiones de un usuario en todos los workers."""
+    db = Database()
+    conn = db.get_connection()
+    try:
+        sids: List[str] = [r[0] for r in conn.execute(
+            "SELECT id FROM sessions WHERE user_email=?", (email,)
+        ).fetchall()]
+        conn.execute("DELETE FROM sessions WHERE user_email=?", (email,))
+        conn.commit()
+    finally:
+        conn.close()
+    if sids:
+        invalidate(*(_scope(sid) for sid in sids))
+    return len(sids)
@@ -105,6 +105,61 @@
         return !str || str.trim().length === 0;
     }
 
+    /**
+     * Cola de completados (HU-8): agrupa toques rápidos en un solo
+     * POST /progress/complete-batch. Cada llamada devuelve una promesa
+     * con la respuesta de su hábito ({ ok, strength, ... } o { ok:false }).
+     */
+    const completionQueue = { pending: new Map(), timer: null, csrf: "" };
+
+    function csrfToken() {
+        const meta = document.querySelector('meta[name="csrf-token"]');
+        return meta ? meta.content : "";
+    }
+
+    async function flushCompletions() {
+        const batch = completionQueue.pending;
+        completionQueue.pending = new Map();
+        completionQueue.timer = null;
+        if (batch.size === 0) return;
+
+        let data;
+        try {
+            const res = await fetch(`${window.location.origin}/progress/complete-batch`, {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                    "X-Requested-With": "fetch",
+                    "X-CSRF-Token": completionQueue.csrf || csrfToken(),
+                },
+                body: JSON.stringify({ habit_ids: [...batch.keys()].map(Number) }),
+            });
+            data = await res.json();
+        } catch (e) {
+            batch.forEach(waiters => waiters.forEach(w => w.reject(e)));
+            return;
+        }
+
+        batch.forEach((waiters, habitId) => {
+            const strength = data.ok && data.strengths ? data.strengths[habitId] : null;
+            const result = strength
+                ? { ok: true, ...strength }
+                : { ok: false, error: data.error || "No se pudo completar el hábito" };
+            waiters.forEach(w => w.resolve(result));
+        });
+    }
+
+    function queueCompletion(habitId, { csrf = "", wait = 350 } = {}) {
+        if (csrf) completionQueue.csrf = csrf;
+        return new Promise((resolve, reject) => {
+            const key = String(habitId);
+            if (!completionQueue.pending.has(key)) completionQueue.pending.set(key, []);
+            completionQueue.pending.get(key).push({ resolve, reject });
+            clearTimeout(completionQueue.timer);
+            completionQueue.timer = setTimeout(flushCompletions, wait);
+        });
+    }
+
     // Expose in a single namespace
     window.appUtils = {
         debounce,
@@ -114,6 +169,7 @@
         formatDate,
         isEmpty,
         showToast,      // por si lo quieres usar directo
+        queueCompletion,
     };
 
     // ==================================================
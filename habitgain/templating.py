@@ -0,0 +1,58 @@
+"""
+Arranque rápido de plantillas en cada worker.
+
+- Caché de bytecode en disco (FileSystemBytecodeCache): un worker nuevo
+  carga las plantillas ya compiladas por otro en vez de volver a parsearlas.
+  La entrada se invalida sola si cambia el fuente (checksum de Jinja).
+- Precalentado opcional al final de create_app: compila todas las
+  plantillas de la app y de los blueprints antes de la primera petición.
+- Sin auto-reload salvo que se pida: en producción Jinja no vuelve a
+  mirar el mtime de cada plantilla en cada render.
+
+Configuración por entorno:
+  HABITGAIN_TEMPLATE_CACHE_DIR     carpeta del bytecode ("" lo desactiva;
+                                   por defecto una carpeta temporal del usuario)
+  HABITGAIN_TEMPLATE_WARMUP        1/0, precompilar al arrancar (por defecto 1)
+  HABITGAIN_TEMPLATES_AUTO_RELOAD  1/0 (sin definir: sólo con debug)
+"""
+import os
+import time
+from typing import Optional
+
+from jinja2 import FileSystemBytecodeCache
+
+TEMPLATE_EXTENSIONS = ("html", "txt", "xml")
+
+
+def _env_flag(name: str, default: Optional[bool]) -> Optional[bool]:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+def configure_templates(app) -> None:
+    """Opciones del entorno Jinja; debe llamarse antes de usar app.jinja_env."""
+    cache_dir = os.environ.get("HABITGAIN_TEMPLATE_CACHE_DIR")
+    if cache_dir != "":
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options = {
+            **app.jinja_options,
+            "bytecode_cache": FileSystemBytecodeCache(cache_dir or None, "habitgain-%s.cache"),
+        }
+    # None = sigue a app.debug (run.py recarga, gunicorn no)
+    app.config["TEMPLATES_AUTO_RELOAD"] = _env_flag("HABITGAIN_TEMPLATES_AUTO_RELOAD", None)
+    app.config["TEMPLATE_WARMUP"] = _env_flag("HABITGAIN_TEMPLATE_WARMUP", True)
+
+
+def warm_templates(app) -> dict:
+    """Compila todas las plantillas (app + blueprints). Retorna cuántas y cuánto tardó."""
+    start = time.perf_counter()
+    env = app.jinja_env
+    names = env.list_templates(extensions=TEMPLATE_EXTENSIONS)
+    for name in names:
+        env.get_template(name)
+    stats = {"templates": len(names), "seconds": round(time.perf_counter() - start, 4)}
+    app.extensions["template_warmup"] = stats
+    return stats
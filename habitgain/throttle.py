@@ -0,0 +1,166 @@
+"""
+Límite de intentos de login (token bucket por email y por IP).
+
+Cada intento fallido o no cuesta un PBKDF2 completo, así que una ráfaga
+de credential stuffing es, en la práctica, un DoS de CPU. El límite se
+aplica antes de hashear nada:
+
+- Los cubos viven en la tabla `login_throttle` (una fila por clave), así
+  que todos los workers comparten el mismo saldo. Consultar y consumir es
+  una sola transacción BEGIN IMMEDIATE.
+- Cada worker recuerda en memoria hasta cuándo está bloqueada una clave:
+  los reintentos durante ese tiempo se rechazan sin tocar la BD.
+- Si la tabla no existe (BD sin migrar) el login no se bloquea.
+
+La IP es request.remote_addr. Detrás de un proxy inverso hay que definir
+HABITGAIN_TRUSTED_PROXIES (ver create_app): si no, todas las peticiones
+llegan con la IP del proxy y comparten un único cubo, y un solo atacante
+bloquea el login de todos. Sólo se confía en X-Forwarded-For con ese
+ajuste, para que un cliente directo no pueda elegir su propia IP.
+
+Configuración por entorno (capacidad/segundos para rellenar el cubo):
+  HABITGAIN_THROTTLE          1/0, activa el límite (por defecto 1)
+  HABITGAIN_THROTTLE_EMAIL    por defecto 10/300 (10 intentos, +1 cada 30s)
+  HABITGAIN_THROTTLE_IP       por defecto 50/60
+  HABITGAIN_TRUSTED_PROXIES   proxies inversos de confianza (por defecto 0)
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import Database
+
+DEFAULT_EMAIL_LIMIT = "10/300"
+DEFAULT_IP_LIMIT = "50/60"
+PRUNE_EVERY = 500  # intentos entre limpiezas de cubos llenos
+
+
+def _parse_limit(raw: str, default: str) -> Tuple[float, float]:
+    """'capacidad/segundos' -> (capacidad, tokens por segundo)."""
+    for value in (raw, default):
+        try:
+            capacity, _, seconds = value.partition("/")
+            capacity, seconds = float(capacity), float(seconds)
+            if capacity > 0 and seconds > 0:
+                return capacity, capacity / seconds
+        except (AttributeError, ValueError):
+            continue
+    raise ValueError(f"invalid throttle limit: {default}")
+
+
+class LoginThrottle:
+    def __init__(self, email_limit: Optional[str] = None, ip_limit: Optional[str] = None,
+                 enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else \
+            os.environ.get("HABITGAIN_THROTTLE", "1").lower() in ("1", "true", "yes")
+        self.limits = {
+            "email": _parse_limit(email_limit or os.environ.get("HABITGAIN_THROTTLE_EMAIL", ""), DEFAULT_EMAIL_LIMIT),
+            "ip": _parse_limit(ip_limit or os.environ.get("HABITGAIN_THROTTLE_IP", ""), DEFAULT_IP_LIMIT),
+        }
+        self._blocked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._attempts = 0
+        self.counters = {"allowed": 0, "blocked_email": 0, "blocked_ip": 0, "local_blocks": 0, "db_errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def check(self, email: Optional[str] = None, ip: Optional[str] = None) -> Tuple[bool, int]:
+        """Consume un intento para email e IP. Retorna (permitido, segundos para reintentar)."""
+        if not self.enabled:
+            return True, 0
+        keys = [(kind, f"{kind}:{value}") for kind, value in (("email", email), ("ip", ip)) if value]
+        if not keys:
+            return True, 0
+
+        now = time.time()
+        with self._lock:
+            wait = max((self._blocked_until.get(key, 0) - now for _, key in keys), default=0)
+        if wait > 0:
+            self._count("local_blocks")
+            return False, int(wait) + 1
+
+        try:
+            allowed, blocked_kind, wait = self._consume(keys, now)
+        except sqlite3.Error:
+            self._count("db_errors")
+            return True, 0  # sin tabla / BD ocupada: no bloquear el login
+
+        if allowed:
+            self._count("allowed")
+            self._maybe_prune(now)
+            return True, 0
+        self._count(f"blocked_{blocked_kind}")
+        return False, int(wait) + 1
+
+    def _consume(self, keys: List[Tuple[str, str]], now: float) -> Tuple[bool, Optional[str], float]:
+        conn = Database().get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = {r["key"]: (r["tokens"], r["updated_at"]) for r in conn.execute(
+                f"SELECT key, tokens, updated_at FROM login_throttle WHERE key IN ({','.join('?' for _ in keys)})",
+                [key for _, key in keys],
+            )}
+            balances = []
+            for kind, key in keys:
+                capacity, rate = self.limits[kind]
+                tokens, updated_at = rows.get(key, (capacity, now))
+                balances.append((kind, key, min(capacity, tokens + (now - updated_at) * rate), rate))
+
+            short = [(kind, key, (1 - tokens) / rate) for kind, key, tokens, rate in balances if tokens < 1]
+            if short:
+                conn.rollback()
+                kind, key, wait = max(short, key=lambda s: s[2])
+                with self._lock:
+                    for _, k, w in short:
+                        self._blocked_until[k] = now + w
+                return False, kind, wait
+
+            conn.executemany(
+                """
+                INSERT INTO login_throttle (key, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET tokens=excluded.tokens, updated_at=excluded.updated_at
+                """,
+                [(key, tokens - 1, now) for _, key, tokens, _ in balances],
+            )
+            conn.commit()
+            return True, None, 0.0
+        finally:
+            conn.close()
+
+    def _maybe_prune(self, now: float) -> None:
+        """Borra cubos que ya se rellenaron del todo (equivalen a no tener fila)."""
+        with self._lock:
+            self._attempts += 1
+            if self._attempts % PRUNE_EVERY:
+                return
+            self._blocked_until = {k: t for k, t in self._blocked_until.items() if t > now}
+        horizon = max(capacity / rate for capacity, rate in self.limits.values())
+        conn = Database().get_connection()
+        try:
+            conn.execute("DELETE FROM login_throttle WHERE updated_at < ?", (now - horizon,))
+            conn.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+    def reset(self, *keys: str) -> None:
+        """Olvida el bloqueo local (p. ej. en tests o tras desbloquear a mano)."""
+        with self._lock:
+            for key in keys or list(self._blocked_until):
+                self._blocked_until.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self.counters,
+                "locally_blocked_keys": sum(1 for t in self._blocked_until.values() if t > time.time()),
+            }
+
+
+login_throttle = LoginThrottle()
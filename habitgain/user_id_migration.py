@@ -0,0 +1,87 @@
+"""
+Relleno de user_id en las tablas hijas de users (esquema 8) como job
+explícito y reanudable.
+
+Las filas nuevas ya traen user_id gracias a los triggers; este job resuelve
+las existentes recorriendo cada tabla por rangos de id, un lote por
+transacción, para que la aplicación siga leyendo y escribiendo mientras
+tanto (WAL). Las filas cuyo email no tiene cuenta quedan con user_id NULL
+y se siguen consultando por email. Al terminar se registra la migración en
+schema_migrations y se borran los índices por email que quedaron sin uso.
+
+init_db sólo lo corre en línea cuando hay pocas filas pendientes
+(INLINE_BACKFILL_LIMIT); con más, hay que lanzar
+`python db_tool.py migrate-user-ids` para no bloquear el arranque.
+"""
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .models import USER_ID_MIGRATION, USER_ID_TABLES, Database
+
+INLINE_BACKFILL_LIMIT = 20_000
+BACKFILL_CHUNK_SIZE = 5_000
+
+# Índices por email que los de user_id dejan sin uso (también para los emails
+# sin cuenta: se buscan con user_id IS NULL, ver models._owner_filter)
+SUPERSEDED_INDEXES = ("idx_habits_owner_email", "idx_habits_owner_name", "idx_hc_owner_date", "idx_hc_owner_day")
+
+
+def _has_owner(table: str, email_col: str) -> str:
+    return f"EXISTS (SELECT 1 FROM users u WHERE u.email = {table}.{email_col} COLLATE NOCASE)"
+
+
+def pending_count(conn: sqlite3.Connection) -> int:
+    """Filas sin user_id cuyo email sí corresponde a un usuario."""
+    total = 0
+    for table, email_col in USER_ID_TABLES.items():
+        (count,) = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE user_id IS NULL AND {_has_owner(table, email_col)}"
+        ).fetchone()
+        total += int(count)
+    return total
+
+
+def backfill_user_ids(
+    *,
+    chunk_size: int = BACKFILL_CHUNK_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Dict[str, Any]:
+    """Rellena user_id por lotes de ids y registra la migración al terminar."""
+    start = time.perf_counter()
+    own_conn = conn is None
+    if own_conn:
+        conn = Database().get_connection()
+    summary = {"updated": 0, "scanned": 0, "chunks": 0, "tables": {}, "seconds": 0.0}
+    try:
+        for table, email_col in USER_ID_TABLES.items():
+            (max_id,) = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+            updated = 0
+            for low in range(0, int(max_id), chunk_size):
+                cur = conn.execute(
+                    f"""
+                    UPDATE {table}
+                       SET user_id = (SELECT u.id FROM users u WHERE u.email = {table}.{email_col} COLLATE NOCASE)
+                     WHERE id > ? AND id <= ? AND user_id IS NULL
+                    """,
+                    (low, low + chunk_size),
+                )
+                conn.commit()
+                updated += max(cur.rowcount, 0)
+                summary["scanned"] += min(chunk_size, int(max_id) - low)
+                summary["chunks"] += 1
+                if progress is not None:
+                    summary["seconds"] = round(time.perf_counter() - start, 3)
+                    progress({**summary, "table": table, "updated": summary["updated"] + updated})
+            summary["tables"][table] = updated
+            summary["updated"] += updated
+
+        for index in SUPERSEDED_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+        Database().record_migration(conn, USER_ID_MIGRATION)
+    finally:
+        if own_conn:
+            conn.close()
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
@@ -0,0 +1,176 @@
+"""
+Alta masiva de usuarios desde un CSV (`db_tool.py import-users`).
+
+Columnas: email, name, password, role (sólo email es obligatoria; sin
+password se usa la contraseña por defecto del comando). Las filas se leen
+en streaming y se procesan por bloques:
+
+- se descartan las inválidas, las repetidas en el archivo y los emails que
+  ya tienen cuenta, antes de gastar CPU en hashear;
+- las contraseñas del bloque se hashean en un pool de procesos (como
+  `migrate-passwords`), fuera de cualquier transacción;
+- usuarios, onboarding_status y hábitos iniciales se insertan con
+  executemany en una transacción corta por bloque.
+"""
+import csv
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .auth import is_valid_email, is_valid_password
+from .cache import invalidate
+from . import models
+from .models import Database, _hash_password, normalize_email
+
+IMPORT_USERS_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+ROLES = ("user", "admin")
+
+
+def iter_user_rows(stream: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Filas del CSV con las cabeceras normalizadas (minúsculas, sin espacios)."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+
+
+def import_users(
+    rows: Iterable[Dict[str, Any]],
+    *,
+    default_password: Optional[str] = None,
+    onboarding: bool = False,
+    starter_habits: Sequence[Dict[str, Any]] = (),
+    workers: Optional[int] = None,
+    chunk_size: int = IMPORT_USERS_CHUNK_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Da de alta los usuarios de `rows`. workers=0 hashea en este proceso.
+
+    starter_habits son dicts con name y, opcionales, short_desc,
+    category_id e icon (p. ej. entradas del catálogo de explore).
+    Retorna un resumen: rows, created, existing, rejected, onboarding,
+    habits, workers, seconds, per_second y los primeros errores.
+    """
+    start = time.perf_counter()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    hash_one = functools.partial(_hash_password, algo=models.PASSWORD_ALGO, params=models.PASSWORD_PARAMS)
+    summary = {"rows": 0, "created": 0, "existing": 0, "rejected": 0, "onboarding": 0,
+               "habits": 0, "workers": workers, "seconds": 0.0, "per_second": 0.0, "errors": []}
+    seen = set()
+    executor = None
+
+    db = Database()
+    conn = db.get_connection()
+    legacy = "password" in db._get_table_columns(conn, "users")
+
+    def reject(line_no: int, reason: str) -> None:
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append(f"fila {line_no}: {reason}")
+
+    def flush(batch: List[tuple]) -> None:
+        nonlocal executor
+        if not batch:
+            return
+        placeholders = ",".join("?" for _ in batch)
+        existing = {normalize_email(r[0]) for r in conn.execute(
+            f"SELECT email FROM users WHERE email COLLATE NOCASE IN ({placeholders})",
+            [email for email, _, _, _ in batch],
+        )}
+        batch = [b for b in batch if b[0] not in existing]
+        summary["existing"] += len(existing)
+        if not batch:
+            return
+
+        # Hash antes de abrir la transacción: no retener el lock de escritura
+        passwords = [password for _, _, password, _ in batch]
+        if workers > 0:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            packs = list(executor.map(hash_one, passwords, chunksize=max(1, len(batch) // (workers * 4))))
+        else:
+            packs = [hash_one(p) for p in passwords]
+
+        cur = conn.cursor()
+        sql = f"""
+            INSERT OR IGNORE INTO users (email, name, {"password, " if legacy else ""}password_hash, password_salt,
+                                         password_algo, password_params, role)
+            VALUES (?, ?, {"'changeme', " if legacy else ""}?, ?, ?, ?, ?)
+            """
+        # Fila por fila: un alta concurrente del mismo email se ignora y a ese
+        # usuario no se le crean onboarding ni hábitos
+        ids = {}
+        for (email, name, _, role), p in zip(batch, packs):
+            cur.execute(sql, (email, name, p["hash"], p["salt"], p["algo"], p["params"], role))
+            if cur.rowcount == 1:
+                ids[email] = cur.lastrowid
+        created = len(ids)
+        emails = list(ids)
+        if onboarding:
+            cur.executemany(
+                """
+                INSERT OR IGNORE INTO onboarding_status
+                (user_email, user_id, completed, current_step, skipped, steps_completed)
+                VALUES (?, ?, 0, 0, 0, '')
+                """,
+                [(email, ids[email]) for email in emails],
+            )
+            summary["onboarding"] += cur.rowcount
+        if starter_habits:
+            cur.executemany(
+                """
+                INSERT INTO habits
+                (owner_email, user_id, name, active, short_desc, category_id, frequency, frequency_detail,
+                 long_desc, why_works, icon)
+                VALUES (?, ?, ?, 1, ?, ?, 'daily', '', '', '', ?)
+                """,
+                [(email, ids[email], h["name"], h.get("short_desc") or "", h.get("category_id") or 1,
+                  h.get("icon") or "🎯")
+                 for email in emails for h in starter_habits],
+            )
+            summary["habits"] += cur.rowcount
+        conn.commit()  # una transacción corta por bloque
+        summary["created"] += created
+        summary["existing"] += len(batch) - created  # altas concurrentes del mismo email
+        invalidate(*emails, *(f"role:{email}" for email in emails))
+
+        if progress is not None:
+            summary["seconds"] = round(time.perf_counter() - start, 3)
+            progress(dict(summary))
+
+    try:
+        batch: List[tuple] = []
+        for line_no, row in enumerate(rows, start=2):  # la fila 1 es la cabecera
+            summary["rows"] += 1
+            email = normalize_email(row.get("email"))
+            if not is_valid_email(email):
+                reject(line_no, "email inválido")
+                continue
+            if email in seen:
+                reject(line_no, "email repetido en el archivo")
+                continue
+            password = row.get("password") or default_password
+            if not password or not is_valid_password(password):
+                reject(line_no, "contraseña faltante o de menos de 6 caracteres")
+                continue
+            role = (row.get("role") or "user").lower()
+            if role not in ROLES:
+                reject(line_no, f"rol inválido: {role}")
+                continue
+            seen.add(email)
+            batch.append((email, row.get("name") or email.split("@")[0], password, role))
+            if len(batch) >= chunk_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        conn.close()
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary["per_second"] = round(summary["created"] / summary["seconds"], 1) if summary["seconds"] else 0.0
+    return summary
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import uuid
+import pytest
+from habitgain import create_app
+from habitgain import models
+from habitgain.models import Database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_db(tmp_path_factory):
+    """BD temporal para toda la sesión: los tests no tocan habitgain.db."""
+    path = str(tmp_path_factory.mktemp("db") / "habitgain-test.db")
+    saved = models.DB_NAME, os.environ.get("HABITGAIN_DB"), Database._wal_enabled
+    models.DB_NAME = path
+    os.environ["HABITGAIN_DB"] = path
+    Database._wal_enabled = False  # WAL también en la BD nueva
+    yield path
+    models.DB_NAME, env, Database._wal_enabled = saved
+    if env is None:
+        os.environ.pop("HABITGAIN_DB", None)
+    else:
+        os.environ["HABITGAIN_DB"] = env
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = create_app()
+    app.config.update({"TESTING": True})
+    db = Database()
+    db.init_db()
+    db.seed_data()
+    return app
+
+
+@pytest.fixture
+def cheap_policy(monkeypatch):
+    """Pocas iteraciones de PBKDF2: se prueba la lógica, no el coste del hash.
+
+    Se activa por módulo con `pytestmark = pytest.mark.usefixtures("cheap_policy")`.
+    """
+    monkeypatch.setattr(models, "PASSWORD_PARAMS", "i=1000")
+
+
+@pytest.fixture
+def email(app, request):
+    """Email único por test, con el nombre del módulo como prefijo (test_cache -> cache_...)."""
+    prefix = request.module.__name__.rpartition(".")[2].replace("test_", "", 1)
+    return f"{prefix}_{uuid.uuid4().hex[:10]}@example.com"
+
+
+@pytest.fixture
+def owner(email):
+    """Alias de `email` para los tests de datos de un dueño (hábitos, completados)."""
+    return email
+
+
+@pytest.fixture
+def logged_in_client(app, email):
+    """Cliente con `email` ya en la sesión, sin pasar por el formulario de login."""
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["user"] = {"email": email, "name": "Tester"}
+        yield client
+
+
+def _login(client, email, password="secreto123", remember=False):
+    data = {"email": email, "password": password}
+    if remember:
+        data["remember"] = "1"
+    return client.post("/auth/login", data=data)
+
+
+@pytest.fixture
+def login():
+    """POST a /auth/login: `login(client, email, password="secreto123", remember=False)`."""
+    return _login
@@ -0,0 +1,101 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gzip
+import shutil
+import pytest
+from habitgain.assets import STATIC_DIR, build_assets, load_manifest
+
+
+@pytest.fixture(scope="module")
+def static_copy(tmp_path_factory):
+    """Copia de habitgain/static con su dist generado (no toca el árbol real)."""
+    target = tmp_path_factory.mktemp("static") / "static"
+    shutil.copytree(STATIC_DIR, target, ignore=shutil.ignore_patterns("dist"))
+    build_assets(str(target))
+    return str(target)
+
+
+@pytest.fixture(scope="module")
+def app(app, static_copy):
+    app.static_folder = static_copy
+    app.extensions["asset_manifest"] = load_manifest(static_copy)
+    return app
+
+
+def test_build_writes_hashed_copies_and_manifest(static_copy):
+    """Cada archivo debe tener su copia con hash; los compresibles, su .gz válido."""
+    manifest = load_manifest(static_copy)
+    assert "css/styles.css" in manifest and "js/main.js" in manifest
+    hashed = manifest["css/styles.css"]
+    assert hashed.startswith("css/styles.") and hashed.endswith(".css")
+    dist = os.path.join(static_copy, "dist")
+    with open(os.path.join(static_copy, "css", "styles.css"), "rb") as fh:
+        original = fh.read()
+    with gzip.open(os.path.join(dist, hashed + ".gz")) as fh:
+        assert fh.read() == original
+    # Mismo contenido -> mismos nombres (builds reproducibles)
+    assert build_assets(static_copy) == manifest
+
+
+def test_templates_use_fingerprinted_urls(app):
+    """Las páginas deben enlazar a /assets con el nombre con hash."""
+    manifest = app.extensions["asset_manifest"]
+    html = app.test_client().get("/auth/login").get_data(as_text=True)
+    assert f"/assets/{manifest['css/styles.css']}" in html
+    assert "/static/css/styles.css" not in html
+
+
+def test_serves_precompressed_with_immutable_cache(app):
+    """Con Accept-Encoding gzip se sirve el .gz; sin él, el original. Ambos immutable."""
+    hashed = app.extensions["asset_manifest"]["js/main.js"]
+    client = app.test_client()
+
+    zipped = client.get(f"/assets/{hashed}", headers={"Accept-Encoding": "gzip, br"})
+    assert zipped.status_code == 200
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.mimetype in ("text/javascript", "application/javascript")
+    assert "immutable" in zipped.headers["Cache-Control"]
+    assert "max-age=31536000" in zipped.headers["Cache-Control"]
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+
+    plain = client.get(f"/assets/{hashed}")
+    assert "Content-Encoding" not in plain.headers
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+
+
+def test_static_url_falls_back_without_manifest(app):
+    """Sin manifest (dev sin build) debe caer a /static."""
+    with app.test_request_context():
+        saved = app.extensions["asset_manifest"]
+        app.extensions["asset_manifest"] = {}
+        try:
+            from habitgain.assets import static_url
+            assert static_url("js/main.js") == "/static/js/main.js"
+        finally:
+            app.extensions["asset_manifest"] = saved
+
+
+def test_explore_etag_changes_when_assets_are_rebuilt(app, tmp_path):
+    """Un deploy que sólo cambia CSS debe invalidar el ETag del catálogo (URLs con hash nuevas)."""
+    target = tmp_path / "static"
+    shutil.copytree(STATIC_DIR, target, ignore=shutil.ignore_patterns("dist"))
+    saved = app.static_folder, app.extensions["asset_manifest"]
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"email": "assets_etag@example.com", "name": "Tester"}
+    try:
+        app.static_folder = str(target)
+        app.extensions["asset_manifest"] = build_assets(str(target))
+        etag = client.get("/explore/").headers["ETag"]
+        assert client.get("/explore/", headers={"If-None-Match": etag}).status_code == 304
+
+        with open(target / "css" / "styles.css", "a", encoding="utf-8") as fh:
+            fh.write("\n.deploy-nuevo { color: red; }\n")
+        app.extensions["asset_manifest"] = build_assets(str(target))
+        response = client.get("/explore/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert f"/assets/{app.extensions['asset_manifest']['css/styles.css']}" in response.get_data(as_text=True)
+    finally:
+        app.static_folder, app.extensions["asset_manifest"] = saved
@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import uuid
+from habitgain.cache import LRUCache, read_cache
+from habitgain.models import Database, Habit, Completion, OnboardingStatus, User
+
+
+# ---------------------------
+# TEST: LRU acotado con TTL
+# ---------------------------
+def test_lru_evicts_least_recently_used():
+    """Al superar maxsize debe expulsar la entrada menos usada y contarlo."""
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b", None) is None
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_lru_expires_entries():
+    """Las entradas vencidas cuentan como miss."""
+    cache = LRUCache(maxsize=4, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a", None) is None
+    assert cache.stats()["expirations"] == 1
+
+
+# ---------------------------
+# TEST: invalidación por versión de usuario
+# ---------------------------
+def test_habit_writes_invalidate_owner_reads(owner):
+    """Crear, desactivar o editar un hábito debe verse en la siguiente lectura."""
+    hid = Habit.create(owner, "Leer", "", 1)
+    assert [h["id"] for h in Habit.list_active_by_owner(owner)] == [hid]
+    hits = read_cache.hits
+    Habit.list_active_by_owner(owner)
+    assert read_cache.hits == hits + 1
+
+    Habit.set_active(hid, False)
+    assert Habit.list_active_by_owner(owner) == []
+    assert Habit.get_by_id(hid)["active"] == 0
+
+    Habit.update(owner, hid, name="Leer más", short_desc="", frequency="daily", category_id=1)
+    assert Habit.get_by_id(hid)["name"] == "Leer más"
+    assert Habit.list_by_owner(owner)[0]["name"] == "Leer más"
+
+
+def test_get_by_id_follows_admin_owner_change(owner):
+    """Mover un hábito de dueño invalida las lecturas de ambos usuarios."""
+    other = "otro_" + owner
+    hid = Habit.create(owner, "Correr", "", 1)
+    assert len(Habit.list_by_owner(owner)) == 1
+    assert Habit.list_by_owner(other) == []
+    Habit.admin_update_habit(hid, "Correr", "", other, True)
+    assert Habit.list_by_owner(owner) == []
+    assert [h["id"] for h in Habit.list_by_owner(other)] == [hid]
+    assert Habit.get_by_id(hid)["owner_email"] == other
+
+
+def test_completion_and_onboarding_reads_are_invalidated(owner):
+    hid = Habit.create(owner, "Agua", "", 1)
+    assert Completion.completed_today_ids(owner) == []
+    Completion.mark_completed(hid, owner)
+    assert Completion.completed_today_ids(owner) == [hid]
+    Completion.unmark(hid, owner)
+    assert Completion.completed_today_ids(owner) == []
+
+    assert OnboardingStatus.get_status(owner) is None
+    OnboardingStatus.mark_step_complete(owner, 0)
+    assert OnboardingStatus.get_status(owner)["steps_completed"] == ["0"]
+    OnboardingStatus.mark_step_complete(owner, 1)
+    assert OnboardingStatus.get_status(owner)["steps_completed"] == ["0", "1"]
+
+
+def test_cached_results_are_copies(owner):
+    """Mutar lo devuelto no debe alterar la caché."""
+    User.ensure_exists(owner, "Tester")
+    user = User.get_by_email(owner)
+    user["role"] = "admin"
+    assert User.get_by_email(owner)["role"] == "user"
+    User.update_name(owner, "Nuevo")
+    assert User.get_by_email(owner)["name"] == "Nuevo"
+
+
+# ---------------------------
+# TEST: invalidación entre procesos
+# ---------------------------
+def _create_in_other_process(owner, name):
+    import subprocess
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    code = f"from habitgain.models import Habit; print(Habit.create({owner!r}, {name!r}, '', 1))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, env=os.environ.copy(),
+                         capture_output=True, text=True, check=True)
+    return int(out.stdout.strip().splitlines()[-1])
+
+
+def test_write_in_other_process_invalidates_after_sync(owner):
+    """Una escritura de otro worker se ve tras el chequeo de data_version."""
+    from habitgain.cache import sync_versions
+    sync_versions()
+    assert Habit.list_active_by_owner(owner) == []
+    hid = _create_in_other_process(owner, "Leer")
+    sync_versions()
+    assert [h["id"] for h in Habit.list_active_by_owner(owner)] == [hid]
+
+
+def test_request_syncs_versions(app, owner):
+    """Cada petición aplica las invalidaciones publicadas por otros procesos."""
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["user"] = {"email": owner, "name": "Tester"}
+        client.get("/")
+        assert Habit.list_active_by_owner(owner) == []
+        hid = _create_in_other_process(owner, "Correr")
+        client.get("/")
+        assert [h["id"] for h in Habit.list_active_by_owner(owner)] == [hid]
+
+
+# ---------------------------
+# TEST: catálogo de categorías
+# ---------------------------
+def test_category_snapshot_serves_reads_without_queries(app, monkeypatch):
+    """Con la foto cargada, las lecturas de categorías no tocan SQLite."""
+    from habitgain.models import Category
+    cats = Category.all()
+    assert cats
+    first = cats[0]
+
+    def no_db(*args, **kwargs):
+        raise AssertionError("consulta inesperada")
+    monkeypatch.setattr(Database, "get_connection", no_db)
+
+    assert Category.get_by_id(first["id"]) == first
+    assert Category.id_by_name("  " + first["name"].upper()) == first["id"]
+    assert Category.id_by_name("No existe") is None
+    Category.all()[0]["name"] = "mutado"
+    assert Category.all()[0]["name"] == first["name"]
+
+
+def test_category_writes_refresh_snapshot(app):
+    from habitgain.models import Category
+    name = f"Cat {uuid.uuid4().hex[:6]}"
+    assert Category.id_by_name(name) is None
+    cid = Category.create(name, "🧪")
+    assert Category.id_by_name(name) == cid
+    Category.delete(cid)
+    assert Category.get_by_id(cid) is None
@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gzip
+import json
+import pytest
+from habitgain.models import User
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture
+def admin_client(app, email):
+    User.create_user(email, "Admin", "secret123", role="admin")
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["user"] = {"email": email, "name": "Admin"}
+        yield client
+
+
+def test_admin_html_is_gzipped_when_accepted(admin_client):
+    """El listado de usuarios debe ir comprimido y descomprimir al mismo HTML."""
+    plain = admin_client.get("/admin/users")
+    zipped = admin_client.get("/admin/users", headers=GZIP)
+    assert plain.status_code == zipped.status_code == 200
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert len(zipped.data) < len(plain.data)
+    assert gzip.decompress(zipped.data) == plain.data
+
+
+def test_json_endpoint_is_gzipped(admin_client, app):
+    app.config["COMPRESS_MIN_SIZE"], saved = 1, app.config["COMPRESS_MIN_SIZE"]
+    try:
+        response = admin_client.get("/admin/cache-stats", headers=GZIP)
+    finally:
+        app.config["COMPRESS_MIN_SIZE"] = saved
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "hits" in json.loads(gzip.decompress(response.data))
+
+
+def test_small_responses_are_left_alone(admin_client):
+    """Por debajo del umbral no vale la pena comprimir."""
+    response = admin_client.get("/admin/cache-stats", headers=GZIP)
+    assert len(response.data) < 1024
+    assert "Content-Encoding" not in response.headers
+
+
+def test_static_files_are_not_recompressed(app):
+    response = app.test_client().get("/static/js/main.js", headers=GZIP)
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    response.close()
+
+
+def test_weak_etag_still_revalidates(admin_client):
+    """El ETag de una página comprimida pasa a débil y sigue dando 304."""
+    first = admin_client.get("/explore/", headers=GZIP)
+    assert first.headers["Content-Encoding"] == "gzip"
+    etag = first.headers["ETag"]
+    assert etag.startswith("W/")
+    second = admin_client.get("/explore/", headers={**GZIP, "If-None-Match": etag})
+    assert second.status_code == 304
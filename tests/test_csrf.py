@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import re
+import pytest
+from habitgain import csrf
+from habitgain.models import User
+
+
+@pytest.fixture
+def client(app, email, login):
+    User.create_user(email, "Tester", "secreto123")
+    with app.test_client() as client:
+        login(client, email)
+        client.get("/explore/")  # consume el flash del login
+        yield client
+
+
+def _profile_token(client):
+    html = client.get("/profile/edit").get_data(as_text=True)
+    return re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+
+
+def test_get_pages_do_not_rewrite_session(client):
+    """Con la sesión ya iniciada, los GET con formularios no emiten Set-Cookie."""
+    for url in ("/progress/panel", "/profile/edit"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "Set-Cookie" not in response.headers
+
+
+def test_token_works_across_tabs(client):
+    """Dos pestañas abiertas: ambos tokens siguen siendo válidos tras usar uno."""
+    first = _profile_token(client)
+    second = _profile_token(client)
+    for token in (first, second):
+        response = client.post("/profile/edit", data={"csrf_token": token, "name": "Nombre"},
+                               follow_redirects=True)
+        assert "Profile updated successfully!" in response.get_data(as_text=True)
+
+
+def test_token_is_bound_to_purpose_and_session(app, client):
+    token = _profile_token(client)
+    response = client.post("/progress/uncomplete/1", headers={"X-CSRF-Token": token})
+    assert response.get_json()["error"] == "invalid_csrf"
+
+    with client.session_transaction() as sess:
+        sess["sid"] = "otra-sesion"
+    response = client.post("/profile/edit", data={"csrf_token": token, "name": "X"},
+                           follow_redirects=True)
+    assert "Invalid or missing CSRF token." in response.get_data(as_text=True)
+
+
+def test_expired_token_is_rejected(app):
+    old = csrf.token_for(app.config["SECRET_KEY"], "sid", "profile", now=0)
+    with app.test_request_context():
+        from flask import session
+        session["sid"] = "sid"
+        assert not csrf.validate_token(old, "profile")
+        assert csrf.validate_token(csrf.generate_token("profile"), "profile")
@@ -0,0 +1,144 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime as _dt
+import io
+import json
+from habitgain.csrf import token_for
+from habitgain.models import Habit, Completion
+from habitgain.importer import iter_csv_rows, iter_ndjson_rows, import_completions
+
+
+def _days_ago(n: int) -> str:
+    return (_dt.date.today() - _dt.timedelta(days=n)).isoformat()
+
+
+# ---------------------------
+# TEST: importación masiva
+# ---------------------------
+def test_import_csv_by_name_and_id(owner):
+    """Debe resolver hábitos por nombre o id, contar duplicados y rechazar filas inválidas."""
+    h1 = Habit.create(owner, "Leer", "", 1)
+    h2 = Habit.create(owner, "Correr", "", 1)
+    csv_text = "\n".join([
+        "habit,habit_id,date",
+        f"leer,,{_days_ago(2)}",
+        f",{h2},{_days_ago(1)}",
+        f"Leer,,{_days_ago(1)}",
+        f"Leer,,{_days_ago(1)}",          # duplicado
+        f"Nadar,,{_days_ago(1)}",         # hábito inexistente
+        "Leer,,no-es-fecha",
+        f"Leer,,{_days_ago(-3)}",         # futura
+    ])
+    summary = import_completions(owner, iter_csv_rows(io.StringIO(csv_text)), chunk_size=2)
+    assert summary["rows"] == 7
+    assert summary["inserted"] == 3
+    assert summary["duplicates"] == 1
+    assert summary["rejected"] == 3
+    assert summary["habits"] == 2
+    assert Completion.get_best_streak(h1, owner) == 2
+    assert Completion.streaks_by_owner(owner)[h1]["best"] == 2
+
+
+def test_import_ndjson_creates_missing_and_rebuilds_streaks(owner):
+    """Con create_missing crea los hábitos y deja las rachas materializadas al día."""
+    lines = [json.dumps({"habit": "Meditar", "date": _days_ago(n)}) for n in range(0, 30)]
+    lines.append("{no es json")
+    summary = import_completions(
+        owner, iter_ndjson_rows(io.StringIO("\n".join(lines))), create_missing=True, chunk_size=7
+    )
+    assert summary["created_habits"] == 1
+    assert summary["inserted"] == 30
+    assert summary["rejected"] == 1
+    hid = Habit.list_by_owner(owner)[0]["id"]
+    assert Completion.streaks_by_owner(owner)[hid] == {
+        "current": Completion.get_current_streak(hid, owner),
+        "best": Completion.get_best_streak(hid, owner),
+    }
+    assert Completion.get_current_streak(hid, owner) == 30
+
+
+def test_import_route_requires_csrf(logged_in_client, owner):
+    """Sin token CSRF la subida no debe importar nada."""
+    Habit.create(owner, "Agua", "", 1)
+    data = {"file": (io.BytesIO(f"habit,date\nAgua,{_days_ago(0)}\n".encode()), "h.csv")}
+    response = logged_in_client.post("/profile/import", data=data, content_type="multipart/form-data")
+    assert response.status_code == 302
+    assert Completion.completed_today_ids(owner) == []
+
+
+def test_import_route_uploads_csv(logged_in_client, owner):
+    """La ruta autenticada debe importar el archivo subido (con BOM UTF-8)."""
+    hid = Habit.create(owner, "Agua", "", 1)
+    with logged_in_client.session_transaction() as sess:
+        sess["sid"] = "sid-test"
+    token = token_for(logged_in_client.application.config["SECRET_KEY"], "sid-test", "profile")
+    payload = ("﻿habit,date\n" + f"Agua,{_days_ago(0)}\nAgua,{_days_ago(1)}\n").encode("utf-8")
+    response = logged_in_client.post(
+        "/profile/import",
+        data={"csrf_token": token, "file": (io.BytesIO(payload), "historial.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    assert Completion.completed_today_ids(owner) == [hid]
+    assert Completion.get_current_streak(hid, owner) == 2
+
+
+def test_import_route_rejects_malformed_csv(logged_in_client, owner):
+    """Un CSV que el módulo csv no puede leer debe volver al perfil con un aviso, no un 500."""
+    with logged_in_client.session_transaction() as sess:
+        sess["sid"] = "sid-test"
+    token = token_for(logged_in_client.application.config["SECRET_KEY"], "sid-test", "profile")
+    payload = ('habit,date\n"' + "x" * 200_000 + f'",{_days_ago(0)}\n').encode("utf-8")
+    response = logged_in_client.post(
+        "/profile/import",
+        data={"csrf_token": token, "file": (io.BytesIO(payload), "roto.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    with logged_in_client.session_transaction() as sess:
+        assert ("danger", "The file could not be read. Check its encoding and format.") in sess["_flashes"]
+
+
+# ---------------------------
+# TEST: exportación en streaming
+# ---------------------------
+def test_export_ndjson_streams_all_record_types(logged_in_client, owner):
+    """Debe emitir sólo los hábitos y completados del usuario."""
+    hid = Habit.create(owner, "Leer", "", 1)
+    for n in range(3):
+        Completion.mark_completed(hid, owner, _days_ago(n))
+    Habit.create("otro_" + owner, "Ajeno", "", 1)
+
+    response = logged_in_client.get("/profile/export?format=ndjson")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r["name"] for r in records if r["type"] == "habit"] == ["Leer"]
+    assert sorted(r["date"] for r in records if r["type"] == "completion") == [_days_ago(n) for n in (2, 1, 0)]
+
+
+def test_export_csv_round_trips_through_import(logged_in_client, owner):
+    """El CSV exportado debe poder importarse en otra cuenta."""
+    hid = Habit.create(owner, "Correr", "", 1)
+    for n in range(5):
+        Completion.mark_completed(hid, owner, _days_ago(n))
+
+    response = logged_in_client.get("/profile/export?format=csv")
+    assert response.status_code == 200
+    assert "attachment" in response.headers["Content-Disposition"]
+
+    other = "copia_" + owner
+    summary = import_completions(
+        other, iter_csv_rows(io.StringIO(response.get_data(as_text=True))), create_missing=True
+    )
+    assert summary["inserted"] == 5
+    assert summary["rejected"] == 0
+    new_id = Habit.list_by_owner(other)[0]["id"]
+    assert Completion.get_current_streak(new_id, other) == 5
+
+
+def test_export_rejects_unknown_format(logged_in_client):
+    response = logged_in_client.get("/profile/export?format=xml")
+    assert response.status_code == 302
@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from habitgain.models import Database, DuplicateEmailError, User, normalize_email
+
+pytestmark = pytest.mark.usefixtures("cheap_policy")
+
+
+def test_normalize_email():
+    assert normalize_email("  Foo.Bar@Example.COM ") == "foo.bar@example.com"
+    assert normalize_email(None) == ""
+
+
+def test_lookups_ignore_case(app, email):
+    User.create_user(email.upper(), "Mayúsculas", "secret123")
+    user = User.get_by_email(email)
+    assert user is not None and user["email"] == email  # se guarda normalizado
+    assert User.get_by_email(email.upper())["id"] == user["id"]
+    assert User.verify_password(email.title(), "secret123") is not None
+
+
+def test_case_variants_cannot_coexist(app, email):
+    """El índice UNIQUE NOCASE rechaza Foo@x aunque exista foo@x (también por SQL directo)."""
+    User.register(email, "Primera", "secret123")
+    with pytest.raises(DuplicateEmailError):
+        User.register(email.upper(), "Segunda", "secret123")
+    conn = Database().get_connection()
+    try:
+        with pytest.raises(Exception, match="UNIQUE"):
+            # Renombrar otra fila a una variante en mayúsculas del mismo email
+            conn.execute("UPDATE users SET email=? WHERE email=?", (email.upper(), "demo@habitgain.local"))
+    finally:
+        conn.close()
+
+
+def test_email_lookup_is_a_single_index_probe(app):
+    conn = Database().get_connection()
+    try:
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM users WHERE email=? COLLATE NOCASE", ("a@b.c",)
+        ).fetchall())
+    finally:
+        conn.close()
+    assert "USING INDEX idx_users_email_nocase (email=?)" in plan
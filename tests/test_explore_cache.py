@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import uuid
+from habitgain.models import Habit, Category
+
+
+def test_home_sends_etag_and_304(logged_in_client):
+    """Con If-None-Match igual al ETag no se vuelve a renderizar el catálogo."""
+    first = logged_in_client.get("/explore/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    second = logged_in_client.get("/explore/", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.data == b""
+    assert second.headers["ETag"] == etag
+
+
+def test_category_etag_changes_with_catalog(logged_in_client):
+    cat_id = Category.all()[0]["id"]
+    etag = logged_in_client.get(f"/explore/category/{cat_id}").headers["ETag"]
+    assert logged_in_client.get(f"/explore/category/{cat_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    new_id = Category.create(f"Cat {uuid.uuid4().hex[:6]}", "🧪")
+    try:
+        response = logged_in_client.get(f"/explore/category/{cat_id}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+    finally:
+        Category.delete(new_id)
+
+
+def test_category_etag_changes_with_user_habits(logged_in_client, email):
+    cat_id = Category.all()[0]["id"]
+    etag = logged_in_client.get(f"/explore/category/{cat_id}").headers["ETag"]
+    Habit.create(email, "Nuevo", "", cat_id)
+    response = logged_in_client.get(f"/explore/category/{cat_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_pending_flash_skips_conditional(logged_in_client):
+    etag = logged_in_client.get("/explore/").headers["ETag"]
+    with logged_in_client.session_transaction() as sess:
+        sess["_flashes"] = [("info", "Hola")]
+    response = logged_in_client.get("/explore/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Hola" in response.get_data(as_text=True)
@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+import uuid
+import pytest
+from habitgain import models
+from habitgain.hashpool import HashPool, HashPoolSaturated
+from habitgain.models import User, _hash_password, _verify_password
+
+
+def test_pool_hashes_in_another_process():
+    """El hash se calcula en un proceso del pool y es verificable en el hilo."""
+    pool = HashPool(workers=1, queue_limit=1)
+    try:
+        assert pool.run(os.getpid) != os.getpid()
+        pack = pool.run(_hash_password, "secreto")
+        assert _verify_password("secreto", pack["salt"], pack["hash"])
+        assert pool.run(_verify_password, "otro", pack["salt"], pack["hash"]) is False
+        assert pool.stats()["completed"] == 3
+    finally:
+        pool.shutdown()
+
+
+def test_pool_rejects_fast_when_saturated():
+    """Con todos los cupos ocupados, la siguiente llamada falla sin esperar."""
+    pool = HashPool(workers=0, queue_limit=1)  # 2 cupos, ejecución en el hilo
+    release = threading.Event()
+    started = threading.Barrier(3)
+
+    def slow():
+        started.wait()
+        release.wait(5)
+        return True
+
+    threads = [threading.Thread(target=pool.run, args=(slow,)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    started.wait()
+    try:
+        with pytest.raises(HashPoolSaturated):
+            pool.run(slow)
+        assert pool.stats()["rejected"] == 1
+        assert pool.stats()["in_flight"] == 2
+    finally:
+        release.set()
+        for t in threads:
+            t.join()
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes():
+    """Un hash que venció el timeout sigue corriendo: su cupo no se libera hasta que termina."""
+    pool = HashPool(workers=1, queue_limit=0, timeout=0.2)  # un solo cupo
+    try:
+        pool.warm_up()
+        with pytest.raises(HashPoolSaturated):
+            pool.run(time.sleep, 1.0)
+        assert pool.stats()["timeouts"] == 1
+        with pytest.raises(HashPoolSaturated):
+            pool.run(os.getpid)  # el sleep todavía ocupa el proceso
+        assert pool.stats() == {**pool.stats(), "rejected": 1, "in_flight": 1}
+
+        deadline = time.monotonic() + 5
+        while pool.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.stats()["in_flight"] == 0
+        assert pool.run(os.getpid) != os.getpid()
+    finally:
+        pool.shutdown()
+
+
+def test_login_returns_503_when_pool_is_saturated(app, monkeypatch):
+    email = f"pool_{uuid.uuid4().hex[:10]}@example.com"
+    User.create_user(email, "Pool", "secret123")
+
+    def saturated(*args):
+        raise HashPoolSaturated("full")
+
+    monkeypatch.setattr(models.hash_pool, "run", saturated)
+    response = app.test_client().post("/auth/login", data={"email": email, "password": "secret123"})
+    assert response.status_code == 503
+    with app.test_client() as client:
+        client.post("/auth/login", data={"email": email, "password": "secret123"})
+        with client.session_transaction() as sess:
+            assert "user" not in sess
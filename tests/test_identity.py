@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from habitgain.models import User
+
+
+@pytest.fixture
+def admin(app, email):
+    user_id = User.create_user(email, "Admin", "secreto123", role="admin")
+    return user_id, email
+
+
+def test_panel_url_resolved_at_startup(app):
+    assert app.config["PANEL_ENDPOINT"] == "progress.panel"
+
+
+def test_renders_do_not_query_user_role(app, admin, monkeypatch, login):
+    """Tras el login, las páginas no vuelven a leer el usuario para saber si es admin."""
+    _, email = admin
+    with app.test_client() as client:
+        login(client, email)
+        calls = []
+        original = User.get_by_email
+        monkeypatch.setattr(User, "get_by_email", staticmethod(lambda e: calls.append(e) or original(e)))
+        response = client.get("/admin/")
+        assert response.status_code == 200
+        client.get("/explore/")
+        assert calls == []
+
+
+def test_role_change_applies_on_next_request(app, admin, login):
+    """Quitar el rol admin publica una versión nueva y la sesión se refresca."""
+    user_id, email = admin
+    with app.test_client() as client:
+        login(client, email)
+        assert client.get("/admin/").status_code == 200
+        User.update_user(user_id, email, "Admin", "user")
+        response = client.get("/admin/")
+        assert response.status_code == 302
+        with client.session_transaction() as sess:
+            assert sess["role"] == "user"
+
+
+def test_role_is_not_reused_for_another_user(app, admin, login):
+    """El rol guardado en sesión sólo vale para el email con el que se leyó."""
+    _, email = admin
+    with app.test_client() as client:
+        login(client, email)
+        with client.session_transaction() as sess:
+            sess["user"] = {"email": "otro_" + email, "name": "Otro"}
+        assert client.get("/admin/").status_code == 302
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import uuid
+import pytest
+from habitgain.models import Database, User
+from habitgain.password_migration import _legacy_column, migrate_passwords, pending_count
+
+pytestmark = pytest.mark.usefixtures("cheap_policy")
+
+
+def _legacy_users(count):
+    """Inserta usuarios sin hash, con la contraseña en una columna legacy."""
+    conn = Database().get_connection()
+    try:
+        legacy = _legacy_column(conn)
+        if legacy is None:
+            conn.execute("ALTER TABLE users ADD COLUMN passwd TEXT")
+            legacy = "passwd"
+        tag = uuid.uuid4().hex[:8]
+        users = [(f"legacy_{tag}_{i}@example.com", f"pw-{tag}-{i}") for i in range(count)]
+        conn.executemany(
+            f"INSERT INTO users (email, name, {legacy}, role) VALUES (?, 'Legacy', ?, 'user')", users
+        )
+        conn.commit()
+        return users
+    finally:
+        conn.close()
+
+
+def _pending():
+    conn = Database().get_connection()
+    try:
+        return pending_count(conn)
+    finally:
+        conn.close()
+
+
+def test_migration_hashes_legacy_passwords_in_a_process_pool(app):
+    users = _legacy_users(12)
+    summary = migrate_passwords(workers=2, chunk_size=5)
+    assert summary["migrated"] >= 12
+    assert summary["chunks"] >= 3
+    assert _pending() == 0
+    email, password = users[7]
+    assert User.verify_password(email, password) is not None
+    assert User.verify_password(email, "otra") is None
+
+
+def test_migration_is_resumable_after_interruption(app):
+    """Un corte a mitad deja escritos los lotes completos; la segunda pasada termina."""
+    users = _legacy_users(6)
+    assert User.verify_password(*users[0]) is None  # sin hash todavía: no entra
+
+    def crash(progress):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        migrate_passwords(workers=0, chunk_size=2, progress=crash)
+    assert _pending() == 4
+    assert User.verify_password(*users[0]) is not None
+
+    summary = migrate_passwords(workers=0, chunk_size=2)
+    assert summary["migrated"] == 4
+    assert User.verify_password(*users[5]) is not None
+
+
+def test_init_db_leaves_large_backlogs_to_the_job(app, monkeypatch):
+    from habitgain import password_migration
+    monkeypatch.setattr(password_migration, "INLINE_MIGRATION_LIMIT", 2)
+    _legacy_users(3)
+    Database().init_db()
+    assert _pending() == 3
+    migrate_passwords(workers=0)
+    assert _pending() == 0
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from habitgain import models
+from habitgain.models import Database, User, _hash_password, _needs_rehash, _verify_password
+
+
+def _row(email):
+    conn = Database().get_connection()
+    try:
+        return dict(conn.execute(
+            "SELECT password_hash, password_algo, password_params FROM users WHERE email=?", (email,)
+        ).fetchone())
+    finally:
+        conn.close()
+
+
+def test_scrypt_and_pbkdf2_round_trip():
+    for algo, params in (("scrypt", "n=1024,r=8,p=1"), ("pbkdf2_sha256", "i=1000")):
+        pack = _hash_password("clave", algo=algo, params=params)
+        assert pack["algo"] == algo and pack["params"] == params
+        assert _verify_password("clave", pack["salt"], pack["hash"], algo, params)
+        assert not _verify_password("otra", pack["salt"], pack["hash"], algo, params)
+
+
+def test_rows_without_metadata_are_legacy_pbkdf2():
+    """Las filas viejas (sin algo/params) se verifican con las 200k iteraciones de siempre."""
+    pack = _hash_password("clave", algo="pbkdf2_sha256", params="i=200000")
+    assert _verify_password("clave", pack["salt"], pack["hash"], None, None)
+    assert not _needs_rehash(None, None)
+
+
+def test_new_users_store_current_policy(app, email):
+    User.create_user(email, "Nuevo", "secret123")
+    row = _row(email)
+    assert (row["password_algo"], row["password_params"]) == (models.PASSWORD_ALGO, models.PASSWORD_PARAMS)
+
+
+def test_login_rehashes_outdated_rows(app, email, monkeypatch):
+    """Tras cambiar la política, el siguiente login correcto migra la fila."""
+    User.create_user(email, "Viejo", "secret123")
+    old_hash = _row(email)["password_hash"]
+
+    monkeypatch.setattr(models, "PASSWORD_ALGO", "scrypt")
+    monkeypatch.setattr(models, "PASSWORD_PARAMS", "n=1024,r=8,p=1")
+
+    assert User.verify_password(email, "mala") is None
+    assert _row(email)["password_hash"] == old_hash  # un login fallido no toca nada
+
+    response = app.test_client().post("/auth/login", data={"email": email, "password": "secret123"})
+    assert response.status_code == 302
+    row = _row(email)
+    assert row["password_algo"] == "scrypt" and row["password_params"] == "n=1024,r=8,p=1"
+    assert row["password_hash"] != old_hash
+    assert User.verify_password(email, "secret123") is not None
+    assert not _needs_rehash(row["password_algo"], row["password_params"])
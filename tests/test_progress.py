@@ -0,0 +1,208 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime as _dt
+from habitgain.csrf import token_for
+from habitgain.models import Habit, Completion
+
+
+def _days_ago(n: int) -> str:
+    return (_dt.date.today() - _dt.timedelta(days=n)).isoformat()
+
+
+# ---------------------------
+# TEST: estadísticas agrupadas
+# ---------------------------
+def test_streaks_by_owner_matches_per_habit_streaks(owner):
+    """Las rachas agrupadas deben coincidir con el cálculo por hábito."""
+    h1 = Habit.create(owner, "Leer", "", 1)
+    h2 = Habit.create(owner, "Correr", "", 1)
+    for n in (0, 1, 2, 5, 6, 7, 8):
+        Completion.mark_completed(h1, owner, _days_ago(n))
+    for n in (1, 2):
+        Completion.mark_completed(h2, owner, _days_ago(n))
+
+    streaks = Completion.streaks_by_owner(owner)
+    for hid in (h1, h2):
+        assert streaks[hid]["current"] == Completion.get_current_streak(hid, owner)
+        assert streaks[hid]["best"] == Completion.get_best_streak(hid, owner)
+    assert streaks[h1] == {"current": 3, "best": 4}
+    assert streaks[h2] == {"current": 0, "best": 2}
+
+
+def test_stats_by_habit_counts_and_weekdays(owner):
+    """Debe contar completados por hábito y repartirlos por día de la semana."""
+    hid = Habit.create(owner, "Meditar", "", 1)
+    monday = _dt.date(2024, 1, 1)  # lunes
+    for n in range(10):
+        Completion.mark_completed(hid, owner, (monday + _dt.timedelta(days=n)).isoformat())
+
+    stats = Completion.stats_by_habit(owner, "2024-01-01", "2024-01-07")
+    assert stats[hid]["completions"] == 7
+    assert stats[hid]["weekdays"] == [1, 1, 1, 1, 1, 1, 1]
+
+    stats = Completion.stats_by_habit(owner, "2024-01-01", "2024-01-10")
+    assert stats[hid]["weekdays"] == [2, 2, 2, 1, 1, 1, 1]
+
+
+def test_stats_json_range(logged_in_client, owner):
+    """La variante JSON debe devolver el desglose del rango solicitado."""
+    hid = Habit.create(owner, "Agua", "", 1)
+    Completion.mark_completed(hid, owner, "2023-03-01")
+    Completion.mark_completed(hid, owner, "2023-03-02")
+
+    response = logged_in_client.get("/progress/stats.json?from=2023-03-01&to=2023-03-10")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["days"] == 10
+    assert data["days_with_completion"] == 2
+    row = next(r for r in data["habits"] if r["habit_id"] == hid)
+    assert row["completions"] == 2
+    assert row["compliance"] == 20
+
+
+def test_stats_json_rejects_oversized_range(logged_in_client):
+    """Rangos mayores al máximo permitido deben rechazarse."""
+    response = logged_in_client.get("/progress/stats.json?from=2000-01-01&to=2020-01-01")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "range_too_large"
+
+
+def test_stats_page_renders_breakdown(logged_in_client, owner):
+    """La página de estadísticas debe incluir el desglose por hábito."""
+    Habit.create(owner, "Estirar", "", 1)
+    response = logged_in_client.get("/progress/stats?from=2024-01-01&to=2024-12-31")
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert "Desglose por hábito" in html
+    assert "Estirar" in html
+
+
+# ---------------------------
+# TEST: completado por lotes
+# ---------------------------
+def _csrf(client):
+    with client.session_transaction() as sess:
+        sess["sid"] = "sid-test"
+    token = token_for(client.application.config["SECRET_KEY"], "sid-test", "progress")
+    return {"X-CSRF-Token": token}
+
+
+def test_complete_batch_marks_owned_habits_only(logged_in_client, owner):
+    """Debe completar los hábitos propios y rechazar los ajenos en un solo POST."""
+    h1 = Habit.create(owner, "Agua", "", 1)
+    h2 = Habit.create(owner, "Leer", "", 1)
+    foreign = Habit.create("otro_" + owner, "Ajeno", "", 1)
+
+    response = logged_in_client.post(
+        "/progress/complete-batch",
+        json={"habit_ids": [h1, h2, foreign, h1]},
+        headers=_csrf(logged_in_client),
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["completed"] == [h1, h2]
+    assert data["rejected"] == [foreign]
+    assert data["strengths"][str(h1)]["streak"] == 1
+    assert set(Completion.completed_today_ids(owner)) == {h1, h2}
+    assert Completion.completed_today_ids("otro_" + owner) == []
+
+
+def test_complete_batch_with_dates(logged_in_client, owner):
+    """Debe aceptar fechas pasadas por elemento y rechazar fechas futuras."""
+    hid = Habit.create(owner, "Correr", "", 1)
+    items = [{"habit_id": hid, "date": _days_ago(n)} for n in (0, 1, 2)]
+    response = logged_in_client.post("/progress/complete-batch", json={"items": items}, headers=_csrf(logged_in_client))
+    assert response.get_json()["strengths"][str(hid)]["streak"] == 3
+
+    future = (_dt.date.today() + _dt.timedelta(days=1)).isoformat()
+    response = logged_in_client.post(
+        "/progress/complete-batch",
+        json={"items": [{"habit_id": hid, "date": future}]},
+        headers=_csrf(logged_in_client),
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "future_date"
+
+
+def test_complete_batch_requires_csrf(logged_in_client, owner):
+    """Sin token CSRF válido no debe registrar nada."""
+    hid = Habit.create(owner, "Meditar", "", 1)
+    response = logged_in_client.post("/progress/complete-batch", json={"habit_ids": [hid]})
+    assert response.status_code == 400
+    assert Completion.completed_today_ids(owner) == []
+
+
+# ---------------------------
+# TEST: deshacer completado
+# ---------------------------
+def _assert_rollup_matches_history(hid, owner):
+    streaks = Completion.streaks_by_owner(owner).get(hid, {"current": 0, "best": 0})
+    assert streaks["current"] == Completion.get_current_streak(hid, owner)
+    assert streaks["best"] == Completion.get_best_streak(hid, owner)
+
+
+def test_unmark_keeps_streaks_consistent(owner):
+    """Marcar/desmarcar en cualquier orden debe dejar la racha igual al recálculo completo."""
+    import random
+    rng = random.Random(1234)
+    hid = Habit.create(owner, "Leer", "", 1)
+    marked = set()
+    for _ in range(120):
+        n = rng.randrange(0, 15)
+        if n in marked and rng.random() < 0.5:
+            assert Completion.unmark(hid, owner, _days_ago(n)) is True
+            marked.discard(n)
+        else:
+            Completion.mark_completed(hid, owner, _days_ago(n))
+            marked.add(n)
+        _assert_rollup_matches_history(hid, owner)
+
+
+def test_batch_mark_keeps_streaks_consistent(owner):
+    """Días contiguos marcados en lote no deben contarse dos veces en la racha."""
+    hid = Habit.create(owner, "Leer", "", 1)
+    Completion.mark_completed_many(owner, [(hid, _days_ago(2)), (hid, _days_ago(1)), (hid, _days_ago(2))])
+    _assert_rollup_matches_history(hid, owner)
+    assert Completion.unmark(hid, owner, _days_ago(1)) is True
+    _assert_rollup_matches_history(hid, owner)
+    Completion.mark_completed_many(owner, [(hid, _days_ago(0)), (hid, _days_ago(1)), (hid, _days_ago(3))])
+    _assert_rollup_matches_history(hid, owner)
+    assert Completion.streaks_by_owner(owner)[hid] == {"current": 4, "best": 4}
+
+
+def test_unmark_missing_returns_false(owner):
+    """Deshacer algo que no estaba completado no debe fallar."""
+    hid = Habit.create(owner, "Agua", "", 1)
+    assert Completion.unmark(hid, owner) is False
+
+
+def test_uncomplete_endpoint(logged_in_client, owner):
+    """Debe deshacer el completado de hoy y devolver la racha actualizada."""
+    hid = Habit.create(owner, "Correr", "", 1)
+    Completion.mark_completed(hid, owner, _days_ago(1))
+    Completion.mark_completed(hid, owner)
+
+    response = logged_in_client.post(f"/progress/uncomplete/{hid}", headers=_csrf(logged_in_client))
+    assert response.status_code == 200
+    assert response.get_json()["streak"] == 0
+    assert Completion.completed_today_ids(owner) == []
+
+    response = logged_in_client.post(f"/progress/uncomplete/{hid}", headers=_csrf(logged_in_client))
+    assert response.status_code == 404
+
+
+def test_complete_rejects_foreign_habit(logged_in_client, owner):
+    """Marcar un hábito ajeno no debe tocar la racha ni bloquear el completado del dueño."""
+    other = "otro_" + owner
+    hid = Habit.create(other, "Ajeno", "", 1)
+    Completion.mark_completed(hid, other, _days_ago(1))
+
+    assert Completion.mark_completed(hid, owner) is False
+    response = logged_in_client.post(f"/progress/complete/{hid}", headers=_csrf(logged_in_client))
+    assert response.status_code == 404
+    assert Completion.streaks_by_owner(other)[hid] == {"current": 0, "best": 1}
+
+    assert Completion.mark_completed(hid, other) is True
+    assert Completion.completed_today_ids(other) == [hid]
+    assert Completion.streaks_by_owner(other)[hid] == {"current": 2, "best": 2}
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import pytest
+from habitgain import models
+from habitgain.hashpool import HashPool
+from habitgain.models import Database, DuplicateEmailError, OnboardingStatus, User
+
+pytestmark = pytest.mark.usefixtures("cheap_policy")
+
+
+def _count(table, column, email):
+    conn = Database().get_connection()
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column}=?", (email,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_register_creates_user_and_onboarding_together(app, email):
+    user_id = User.register(email, "Nueva", "secret123")
+    assert User.get_by_email(email)["id"] == user_id
+    assert OnboardingStatus.get_status(email)["current_step"] == 0
+    assert User.verify_password(email, "secret123") is not None
+
+
+def test_duplicate_register_raises_structured_error(app, email):
+    User.register(email, "Primera", "secret123")
+    with pytest.raises(DuplicateEmailError) as exc:
+        User.register(email, "Segunda", "otra-clave")
+    assert exc.value.email == email
+    assert exc.value.code == "duplicate_email"
+    assert User.get_by_email(email)["name"] == "Primera"
+    assert _count("onboarding_status", "user_email", email) == 1
+
+
+def test_concurrent_duplicate_signups_create_one_user(app, email, monkeypatch):
+    """Altas simultáneas del mismo email: exactamente una gana, el resto recibe el error."""
+    threads_n = 8
+    # Cola amplia: aquí se prueba la carrera en la BD, no la saturación del pool
+    monkeypatch.setattr(models, "hash_pool", HashPool(workers=0, queue_limit=threads_n))
+    barrier = threading.Barrier(threads_n)
+    results = []
+
+    def signup(i):
+        barrier.wait()
+        try:
+            User.register(email, f"Hilo {i}", "secret123")
+            results.append("ok")
+        except DuplicateEmailError:
+            results.append("duplicate")
+
+    threads = [threading.Thread(target=signup, args=(i,)) for i in range(threads_n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(results) == ["duplicate"] * (threads_n - 1) + ["ok"]
+    assert _count("users", "email", email) == 1
+    assert _count("onboarding_status", "user_email", email) == 1
+
+
+def test_register_route_reports_duplicate(app, email):
+    User.register(email, "Existente", "secret123")
+    client = app.test_client()
+    response = client.post(
+        "/auth/register",
+        data={"name": "Otra", "email": email, "password": "secret123", "confirm_password": "secret123"},
+        environ_base={"REMOTE_ADDR": "10.45.0.1"},
+    )
+    assert response.status_code == 200
+    assert "ya está registrado" in response.get_data(as_text=True)
+    with client.session_transaction() as sess:
+        assert "user" not in sess
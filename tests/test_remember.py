@@ -0,0 +1,132 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import re
+import pytest
+from habitgain import models, remember
+from habitgain.models import Database, User
+from habitgain.remember import REMEMBER_COOKIE, consume_token, issue_token, list_tokens
+
+pytestmark = pytest.mark.usefixtures("cheap_policy")
+
+
+@pytest.fixture
+def user(email):
+    user_id = User.create_user(email, "Recordado", "secreto123")
+    return {"id": user_id, "email": email}
+
+
+def _returning_client(app, cookie):
+    """Cliente sin sesión, sólo con la cookie "recordarme"."""
+    client = app.test_client()
+    client.set_cookie(REMEMBER_COOKIE, cookie)
+    return client
+
+
+def _csrf(client):
+    html = client.get("/profile/edit").get_data(as_text=True)
+    return re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+
+
+def test_login_without_remember_sets_no_cookie(app, user, login):
+    with app.test_client() as client:
+        login(client, user["email"])
+        assert client.get_cookie(REMEMBER_COOKIE) is None
+    assert list_tokens(user["id"]) == []
+
+
+def test_returning_user_is_restored_without_pbkdf2(app, user, monkeypatch, login):
+    """La sesión se restaura con SHA-256 y el validador rota en cada uso."""
+    with app.test_client() as client:
+        login(client, user["email"], remember=True)
+        cookie = client.get_cookie(REMEMBER_COOKIE).value
+    conn = Database().get_connection()
+    try:
+        stored = conn.execute("SELECT validator_hash FROM remember_tokens WHERE user_id=?", (user["id"],)).fetchone()
+    finally:
+        conn.close()
+    assert cookie.split(".")[1] not in stored["validator_hash"]
+
+    def no_pbkdf2(*args, **kwargs):
+        raise AssertionError("no debería verificar la contraseña")
+    monkeypatch.setattr(models, "_pooled_verify_password", no_pbkdf2)
+
+    client = _returning_client(app, cookie)
+    assert client.get("/progress/panel").status_code == 200
+    rotated = client.get_cookie(REMEMBER_COOKIE).value
+    assert rotated != cookie and rotated.split(".")[0] == cookie.split(".")[0]
+    with client.session_transaction() as sess:
+        assert sess["user"]["email"] == user["email"]
+
+    # La cookie rotada vuelve a servir en otro navegador sin sesión
+    assert _returning_client(app, rotated).get("/progress/panel").status_code == 200
+
+
+def test_reused_validator_revokes_the_token(app, user, monkeypatch):
+    """La cookie anterior vale en el período de gracia; después se trata como robada."""
+    cookie = issue_token(user["id"], "pytest")
+    _, rotated = consume_token(cookie)
+    assert consume_token(cookie) == ({"id": user["id"], "email": user["email"], "name": "Recordado",
+                                      "role": "user"}, None)
+
+    monkeypatch.setattr(remember, "ROTATION_GRACE_SECONDS", -1)
+    assert consume_token(cookie) is None
+    assert consume_token(rotated) is None  # también la legítima
+    assert list_tokens(user["id"]) == []
+
+    client = _returning_client(app, rotated)
+    assert client.get("/progress/panel").status_code == 302
+    assert client.get_cookie(REMEMBER_COOKIE) is None
+
+
+def test_profile_lists_and_revokes_devices(app, user, login):
+    other = issue_token(user["id"], "Otro navegador")
+    with app.test_client() as client:
+        login(client, user["email"], remember=True)
+        html = client.get("/profile/edit").get_data(as_text=True)
+        assert "Otro navegador" in html and "This device" in html
+
+        selector = other.split(".")[0]
+        client.post(f"/profile/devices/{selector}/revoke", data={"csrf_token": _csrf(client)})
+        assert consume_token(other) is None
+        assert len(list_tokens(user["id"])) == 1
+
+        client.post("/profile/devices/revoke-all", data={"csrf_token": _csrf(client)})
+        assert list_tokens(user["id"]) == []
+
+
+def test_password_change_keeps_only_this_device(app, user, login):
+    other = issue_token(user["id"], "Otro navegador")
+    with app.test_client() as client:
+        login(client, user["email"], remember=True)
+        mine = client.get_cookie(REMEMBER_COOKIE).value
+        client.post("/profile/edit", data={"csrf_token": _csrf(client), "name": "Recordado",
+                                           "new_password": "otra-clave-1", "confirm_password": "otra-clave-1"})
+    assert consume_token(other) is None
+    assert [t["selector"] for t in list_tokens(user["id"])] == [mine.split(".")[0]]
+
+
+def test_logout_and_user_deletion_revoke_tokens(app, user, login):
+    with app.test_client() as client:
+        login(client, user["email"], remember=True)
+        cookie = client.get_cookie(REMEMBER_COOKIE).value
+        client.get("/auth/logout")
+        assert client.get_cookie(REMEMBER_COOKIE) is None
+    assert consume_token(cookie) is None
+
+    cookie = issue_token(user["id"])
+    User.delete_user(user["id"])
+    assert list_tokens(user["id"]) == []
+    assert consume_token(cookie) is None
+
+
+def test_assets_do_not_consume_the_token(app, user):
+    """Los assets y las rutas inexistentes no rotan el validador (se piden en paralelo)."""
+    cookie = issue_token(user["id"])
+    client = _returning_client(app, cookie)
+    for path in ("/static/css/styles.css", "/assets/css/no-existe.css", "/healthz", "/no-existe"):
+        client.get(path)
+        assert client.get_cookie(REMEMBER_COOKIE).value == cookie
+    assert list_tokens(user["id"])[0]["last_used_at"] == list_tokens(user["id"])[0]["created_at"]
+    assert client.get("/progress/panel").status_code == 200
+    assert client.get_cookie(REMEMBER_COOKIE).value != cookie
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import uuid
+import pytest
+from habitgain.models import Database, User
+from habitgain.sessions import SqliteSessionInterface, revoke_user_sessions, sweep_expired
+
+
+@pytest.fixture(scope="module")
+def app(app):
+    app.session_interface = SqliteSessionInterface()
+    return app
+
+
+@pytest.fixture
+def email(email):
+    User.create_user(email, "Tester", "secreto123")
+    return email
+
+
+def _session_row(sid):
+    conn = Database().get_connection()
+    try:
+        return conn.execute("SELECT * FROM sessions WHERE id=?", (sid,)).fetchone()
+    finally:
+        conn.close()
+
+
+def test_cookie_only_carries_session_id(app, email, login):
+    """La cookie lleva sólo el id; los datos quedan en la tabla sessions."""
+    with app.test_client() as client:
+        response = login(client, email)
+        cookie = client.get_cookie(app.config["SESSION_COOKIE_NAME"])
+        assert cookie is not None and len(cookie.value) < 64
+        assert email not in response.headers["Set-Cookie"]
+        row = _session_row(cookie.value)
+        assert row["user_email"] == email
+        assert client.get("/progress/panel").status_code == 200
+
+
+def test_unchanged_session_is_not_rewritten(app, email, login):
+    with app.test_client() as client:
+        login(client, email)
+        client.get("/explore/")  # consume el flash del login
+        response = client.get("/profile/edit")
+        assert response.status_code == 200
+        assert "Set-Cookie" not in response.headers
+
+
+def test_revoke_logs_user_out(app, email, login):
+    """Revocar borra la sesión en la BD y la siguiente petición ya no está autenticada."""
+    with app.test_client() as client:
+        login(client, email)
+        assert client.get("/progress/panel").status_code == 200
+        assert revoke_user_sessions(email) == 1
+        response = client.get("/progress/panel")
+        assert response.status_code == 302
+
+
+def test_logout_deletes_row(app, email, login):
+    with app.test_client() as client:
+        login(client, email)
+        sid = client.get_cookie(app.config["SESSION_COOKIE_NAME"]).value
+        client.get("/auth/logout")
+        # El flash del logout crea una sesión nueva; la anterior ya no existe
+        assert _session_row(sid) is None
+
+
+def test_sweep_removes_expired_in_batches(app):
+    conn = Database().get_connection()
+    try:
+        past = int(time.time()) - 10
+        conn.executemany(
+            "INSERT INTO sessions (id, data, user_email, expires_at) VALUES (?, '{}', NULL, ?)",
+            [(f"old-{uuid.uuid4().hex}", past) for _ in range(25)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    assert sweep_expired(batch_size=10) >= 25
+    conn = Database().get_connection()
+    try:
+        left = conn.execute("SELECT COUNT(*) FROM sessions WHERE expires_at <= ?", (int(time.time()),)).fetchone()[0]
+    finally:
+        conn.close()
+    assert left == 0
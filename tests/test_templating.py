@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from habitgain import create_app
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("HABITGAIN_TEMPLATE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("HABITGAIN_TEMPLATE_WARMUP", "1")
+    monkeypatch.delenv("HABITGAIN_TEMPLATES_AUTO_RELOAD", raising=False)
+    return tmp_path
+
+
+def test_warmup_compiles_blueprint_templates_into_bytecode_cache(cache_dir):
+    """create_app debe compilar todas las plantillas y dejarlas en la caché de disco."""
+    app = create_app()
+    stats = app.extensions["template_warmup"]
+    names = app.jinja_env.list_templates(extensions=("html",))
+    assert "base.html" in names and "progress/panel.html" in names
+    assert stats["templates"] >= len(names)
+    assert len(list(cache_dir.glob("habitgain-*.cache"))) >= len(names)
+
+
+def test_templates_do_not_auto_reload_outside_debug(cache_dir):
+    app = create_app()
+    assert app.jinja_env.auto_reload is False
+
+
+def test_bytecode_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("HABITGAIN_TEMPLATE_CACHE_DIR", "")
+    monkeypatch.setenv("HABITGAIN_TEMPLATE_WARMUP", "0")
+    app = create_app()
+    assert app.jinja_env.bytecode_cache is None
+    assert "template_warmup" not in app.extensions
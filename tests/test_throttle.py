@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import uuid
+import pytest
+from habitgain import create_app
+from habitgain import auth as auth_module
+from habitgain.models import User
+from habitgain.throttle import LoginThrottle
+
+
+@pytest.fixture
+def ip():
+    return f"10.{uuid.uuid4().int % 250}.{uuid.uuid4().int % 250}.{uuid.uuid4().int % 250}"
+
+
+def test_email_bucket_blocks_after_capacity(app, email, ip):
+    throttle = LoginThrottle(email_limit="3/300", ip_limit="100/60", enabled=True)
+    assert [throttle.check(email, ip)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = throttle.check(email, ip)
+    assert not allowed
+    assert 90 <= retry_after <= 101  # +1 token cada 100s
+    assert throttle.stats()["blocked_email"] == 1
+    # Un reintento durante el bloqueo se corta en memoria, sin ir a la BD
+    assert throttle.check(email, ip)[0] is False
+    assert throttle.stats()["local_blocks"] == 1
+
+
+def test_ip_bucket_blocks_credential_stuffing(app, ip):
+    """Muchos emails distintos desde la misma IP agotan el cubo de la IP."""
+    throttle = LoginThrottle(email_limit="10/300", ip_limit="5/60", enabled=True)
+    results = [throttle.check(f"victim{i}_{uuid.uuid4().hex[:6]}@example.com", ip)[0] for i in range(7)]
+    assert results == [True] * 5 + [False] * 2
+    assert throttle.stats()["blocked_ip"] == 1
+
+
+def test_buckets_are_shared_between_workers(app, email, ip):
+    """Dos instancias (como dos workers) descuentan del mismo saldo en SQLite."""
+    worker_a = LoginThrottle(email_limit="3/300", ip_limit="100/60", enabled=True)
+    worker_b = LoginThrottle(email_limit="3/300", ip_limit="100/60", enabled=True)
+    assert worker_a.check(email, ip)[0] and worker_a.check(email, ip)[0]
+    assert worker_b.check(email, ip)[0]
+    assert worker_b.check(email, ip)[0] is False
+
+
+def test_blocked_login_returns_429_without_hashing(app, email, monkeypatch):
+    User.create_user(email, "Throttle", "secret123")
+    monkeypatch.setattr(auth_module, "login_throttle",
+                        LoginThrottle(email_limit="2/300", ip_limit="100/60", enabled=True))
+    calls = []
+    real_verify = User.verify_password
+
+    def counting_verify(*args):
+        calls.append(args)
+        return real_verify(*args)
+
+    monkeypatch.setattr(User, "verify_password", staticmethod(counting_verify))
+    client = app.test_client()
+    for _ in range(2):
+        assert client.post("/auth/login", data={"email": email, "password": "mala"}).status_code == 200
+    response = client.post("/auth/login", data={"email": email, "password": "secret123"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("trusted, expected", [("0", "127.0.0.1"), ("1", "203.0.113.7")])
+def test_ip_bucket_uses_forwarded_ip_only_behind_trusted_proxy(app, email, monkeypatch, trusted, expected):
+    """Con HABITGAIN_TRUSTED_PROXIES el cubo de IP es el del cliente, no el del proxy."""
+    monkeypatch.setenv("HABITGAIN_TRUSTED_PROXIES", trusted)
+    proxied = create_app()
+    seen = []
+
+    class Recorder:
+        def check(self, email=None, ip=None):
+            seen.append(ip)
+            return True, 0
+
+    monkeypatch.setattr(auth_module, "login_throttle", Recorder())
+    proxied.test_client().post("/auth/login", data={"email": email, "password": "mala"},
+                               headers={"X-Forwarded-For": "203.0.113.7"},
+                               environ_base={"REMOTE_ADDR": "127.0.0.1"})
+    assert seen == [expected]
@@ -0,0 +1,138 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import datetime as _dt
+import pytest
+from habitgain import models
+from habitgain.models import USER_ID_MIGRATION, Completion, Database, Habit, OnboardingStatus, User, _owner_filter
+from habitgain.user_id_migration import SUPERSEDED_INDEXES, backfill_user_ids, pending_count
+
+pytestmark = pytest.mark.usefixtures("cheap_policy")
+
+
+def _user_ids(table, column, value):
+    conn = Database().get_connection()
+    try:
+        return [r[0] for r in conn.execute(f"SELECT user_id FROM {table} WHERE {column}=?", (value,))]
+    finally:
+        conn.close()
+
+
+def test_inserts_get_user_id_from_trigger(app, email):
+    """Las filas nuevas traen user_id sin que el código que inserta lo pase."""
+    user_id = User.register(email, "Ids", "secret123")
+    hid = Habit.create(email, "Leer", "", 1)
+    Completion.mark_completed(hid, email)
+    assert _user_ids("habits", "owner_email", email) == [user_id]
+    assert _user_ids("habit_completions", "owner_email", email) == [user_id]
+    assert _user_ids("onboarding_status", "user_email", email) == [user_id]
+    assert _owner_filter(email) == ("user_id = ?", user_id)
+
+
+def test_email_change_keeps_the_users_data(app, email):
+    """Cambiar el email ya no deja huérfanos los hábitos ni los completados."""
+    user_id = User.create_user(email, "Cambia", "secret123")
+    hid = Habit.create(email, "Correr", "", 1)
+    Completion.mark_completed(hid, email)
+    today = _dt.date.today().isoformat()
+
+    new_email = f"new_{email}"
+    User.update_user(user_id, new_email, "Cambia", "user")
+    assert [h["id"] for h in Habit.list_by_owner(new_email)] == [hid]
+    assert Habit.list_by_owner(new_email)[0]["owner_email"] == new_email
+    assert Completion.count_completed_in_range(new_email, today, today) == 1
+    assert Habit.list_by_owner(email) == []
+
+
+def test_habits_without_account_are_adopted(app, email):
+    """Hábitos de un email sin cuenta se consultan por email y pasan al usuario al crearlo."""
+    hid = Habit.create(email, "Meditar", "", 1)
+    assert _owner_filter(email) == ("user_id IS NULL AND owner_email = ?", email)
+    assert [h["id"] for h in Habit.list_by_owner(email)] == [hid]
+
+    user_id = User.create_user(email, "Tarde", "secret123")
+    assert _user_ids("habits", "owner_email", email) == [user_id]
+    assert [h["id"] for h in Habit.list_by_owner(email)] == [hid]
+
+    User.delete_user(user_id)
+    assert _user_ids("habits", "owner_email", email) == [None]
+    assert [h["id"] for h in Habit.list_by_owner(email)] == [hid]
+
+
+def test_backfill_fills_rows_in_chunks(app, email):
+    """El job rellena las filas viejas por lotes, registra la migración y borra los índices por email."""
+    user_id = User.register(email, "Legacy", "secret123")
+    hids = [Habit.create(email, f"Hábito {i}", "", 1) for i in range(3)]
+    for hid in hids:
+        Completion.mark_completed(hid, email)
+    conn = Database().get_connection()
+    try:
+        for table, column in models.USER_ID_TABLES.items():
+            conn.execute(f"UPDATE {table} SET user_id = NULL WHERE {column} = ?", (email,))
+        conn.execute("DELETE FROM schema_migrations WHERE name=?", (USER_ID_MIGRATION,))
+        conn.commit()
+        Database._migration_checks.clear()
+        assert pending_count(conn) >= 7
+    finally:
+        conn.close()
+
+    # A medio migrar las lecturas siguen yendo por email
+    assert not Database().migration_done(USER_ID_MIGRATION)
+    assert _owner_filter(email) == ("owner_email = ?", email)
+    assert len(Habit.list_by_owner(email)) == 3
+
+    summary = backfill_user_ids(chunk_size=2)
+    assert summary["updated"] >= 7 and summary["chunks"] > 4
+    assert set(_user_ids("habits", "owner_email", email)) == {user_id}
+    assert set(_user_ids("habit_completions", "owner_email", email)) == {user_id}
+    assert Database().migration_done(USER_ID_MIGRATION)
+    assert OnboardingStatus.get_status(email) is not None
+
+    conn = Database().get_connection()
+    try:
+        assert pending_count(conn) == 0
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        assert not indexes & set(SUPERSEDED_INDEXES)
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("email_only", [False, True])
+def test_range_queries_use_the_integer_index(app, email, email_only):
+    """Con y sin cuenta, el rango de fechas se resuelve con idx_hc_user_day."""
+    if not email_only:
+        User.create_user(email, "Plan", "secret123")
+    owner, key = _owner_filter(email)
+    conn = Database().get_connection()
+    try:
+        plan = " ".join(r[-1] for r in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM habit_completions WHERE {owner} AND date BETWEEN ? AND ?",
+            (key, "2024-01-01", "2024-12-31"),
+        ))
+    finally:
+        conn.close()
+    assert "idx_hc_user_day (user_id=? AND date>? AND date<?)" in plan
+
+
+def test_onboarding_updates_follow_the_user_id(app, email):
+    """Tras cambiar el email, los pasos se guardan en la fila del usuario y no en otra con ese email."""
+    user_id = User.register(email, "Onboarding", "secret123")
+    new_email = f"new_{email}"
+    OnboardingStatus.create_status(new_email)  # fila previa sin cuenta: el cambio de email no puede renombrar
+    User.update_user(user_id, new_email, "Onboarding", "user")
+    assert _user_ids("onboarding_status", "user_email", email) == [user_id]
+
+    OnboardingStatus.create_status(new_email)
+    OnboardingStatus.mark_step_complete(new_email, 0)
+    assert OnboardingStatus.get_status(new_email)["steps_completed"] == ["0"]
+    assert OnboardingStatus.get_status(new_email)["user_email"] == email
+
+    OnboardingStatus.mark_skipped(new_email)
+    assert OnboardingStatus.get_status(new_email)["skipped"] is True
+    OnboardingStatus.mark_completed(new_email)
+    assert OnboardingStatus.get_status(new_email)["completed"] is True
+    assert _user_ids("onboarding_status", "user_email", new_email) == [None]
+
+    OnboardingStatus.reset_status(new_email)
+    assert OnboardingStatus.get_status(new_email) is None
+    assert _user_ids("onboarding_status", "user_email", email) == []
@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import uuid
+import pytest
+from habitgain.models import Habit, OnboardingStatus, User
+from habitgain import user_import
+from habitgain.user_import import import_users, iter_user_rows
+
+pytestmark = pytest.mark.usefixtures("cheap_policy")
+
+
+@pytest.fixture
+def tag():
+    return uuid.uuid4().hex[:8]
+
+
+def _csv(lines):
+    return iter_user_rows(io.StringIO("\n".join(["Email, Name ,password,role", *lines])))
+
+
+def test_import_creates_users_and_reports_rejections(app, tag):
+    """Valida cada fila, descarta repetidos y da de alta el resto por bloques."""
+    existing = f"ya_{tag}@example.com"
+    User.create_user(existing, "Ya existe", "secret123")
+    rows = _csv([
+        f"Ana_{tag}@Example.com,Ana,clave-ana,",
+        f"beto_{tag}@example.com,,clave-beto,admin",
+        f"ana_{tag}@example.com,Otra Ana,clave-otra,",   # repetido en el archivo
+        f"{existing},Ya,clave-ya,user",                    # ya tiene cuenta
+        "no-es-email,X,clave-x,user",
+        f"corta_{tag}@example.com,Corta,123,user",
+        f"rol_{tag}@example.com,Rol,clave-rol,root",
+        f"sin_{tag}@example.com,Sin clave,,user",
+    ])
+    summary = import_users(rows, workers=0, chunk_size=2)
+    assert summary["rows"] == 8
+    assert summary["created"] == 2
+    assert summary["existing"] == 1
+    assert summary["rejected"] == 5
+    assert len(summary["errors"]) == 5
+
+    ana = User.verify_password(f"ana_{tag}@example.com", "clave-ana")
+    assert ana is not None and ana["name"] == "Ana" and ana["role"] == "user"
+    beto = User.get_by_email(f"beto_{tag}@example.com")
+    assert beto["name"] == f"beto_{tag}" and beto["role"] == "admin"
+
+
+def test_import_with_default_password_onboarding_and_starter_habits(app, tag):
+    starters = [{"name": "Beber agua", "category_id": 1, "icon": "💧"}, {"name": "Planificar el día"}]
+    rows = _csv([f"persona{i}_{tag}@example.com,Persona {i},," for i in range(5)])
+    summary = import_users(rows, default_password="provisoria", onboarding=True,
+                           starter_habits=starters, workers=0, chunk_size=2)
+    assert summary["created"] == 5 and summary["onboarding"] == 5 and summary["habits"] == 10
+
+    email = f"persona3_{tag}@example.com"
+    assert User.check_password(email, "provisoria")
+    assert OnboardingStatus.get_status(email)["current_step"] == 0
+    habits = Habit.list_by_owner(email)
+    assert sorted(h["name"] for h in habits) == ["Beber agua", "Planificar el día"]
+
+    # Reimportar el mismo archivo no duplica nada
+    again = import_users(_csv([f"persona{i}_{tag}@example.com,Persona {i},," for i in range(5)]),
+                         default_password="provisoria", onboarding=True, starter_habits=starters, workers=0)
+    assert again["created"] == 0 and again["existing"] == 5 and again["habits"] == 0
+    assert len(Habit.list_by_owner(email)) == 2
+
+
+def test_import_hashes_in_a_process_pool(app, tag):
+    rows = _csv([f"pool{i}_{tag}@example.com,Pool {i},clave-{i:04d},user" for i in range(6)])
+    summary = import_users(rows, workers=2, chunk_size=4)
+    assert summary["created"] == 6 and summary["workers"] == 2
+    assert User.check_password(f"pool5_{tag}@example.com", "clave-0005")
+
+
+def test_concurrent_signup_gets_no_starter_habits(app, tag, monkeypatch):
+    """Un alta que llega entre la consulta de existentes y el INSERT no recibe nada del import."""
+    racer = f"carrera_{tag}@example.com"
+    real_hash = user_import._hash_password
+
+    def hash_during_signup(password, *args, **kwargs):
+        if User.get_by_email(racer) is None:
+            User.create_user(racer, "Se adelantó", "clave-propia")
+        return real_hash(password, *args, **kwargs)
+    monkeypatch.setattr(user_import, "_hash_password", hash_during_signup)
+
+    rows = _csv([f"{racer},Carrera,,", f"normal_{tag}@example.com,Normal,,"])
+    summary = import_users(rows, default_password="provisoria", onboarding=True,
+                           starter_habits=[{"name": "Beber agua"}], workers=0)
+    assert summary["created"] == 1 and summary["existing"] == 1
+    assert summary["onboarding"] == 1 and summary["habits"] == 1
+    assert Habit.list_by_owner(racer) == []
+    assert User.check_password(racer, "clave-propia")
+    assert len(Habit.list_by_owner(f"normal_{tag}@example.com")) == 1